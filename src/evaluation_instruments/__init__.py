@@ -1,9 +1,15 @@
 import logging
 
+from ._budget import Budget
+from ._cascade import Cascade
+from ._dataset import read_parquet_batches
+from ._ensemble import Ensemble
 from ._evaluation import Evaluation
+from ._grid import Grid
+from ._router import Router
 from .model import TokenUsage
-from .post import frame_from_evals
-from .prep import OutputMode
+from .post import frame_from_evals, frame_from_judges
+from .prep import OutputMode, PromptLayout, TokenCounter
 
 logging.basicConfig()
 logger = logging.getLogger("evaluation")
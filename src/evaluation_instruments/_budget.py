@@ -0,0 +1,282 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional, Union
+
+from evaluation_instruments.model import TokenUsage
+
+logger = logging.getLogger("evaluation")
+
+WINDOW_SECONDS = 60.0
+
+
+def _as_usage(value: Union[None, int, dict, TokenUsage]) -> Optional[TokenUsage]:
+    """Normalizes an int (total tokens), usage dict, or TokenUsage into a TokenUsage."""
+    if value is None or isinstance(value, TokenUsage):
+        return value
+    if isinstance(value, dict):
+        return TokenUsage(**value)
+    return TokenUsage(None, None, value)
+
+
+class Budget:
+    """
+    A node in a hierarchical token accounting tree.
+
+    Budgets let several Evaluation instances, and any concurrent workers they spawn, draw from shared limits.
+    A typical tree has a run-wide root, with children per model and grandchildren per instrument; each Evaluation
+    then adds a transient leaf for the individual run_dataset call.
+
+    Every request is admitted before dispatch by walking from the leaf to the root, and is only admitted if
+    no level has exceeded its capacity and every level's per-minute window has room. Usage is then charged to
+    every level once the response is known.
+
+    Capacity follows the same semantics as Evaluation: without an estimate, a request is only refused once a
+    level's accumulated usage is greater than its capacity, so the request that crosses the limit still completes.
+    When an estimate is given, it is reserved until charged so that concurrent requests cannot jointly overrun.
+
+    Parameters
+    ----------
+    capacity : int | TokenUsage, optional
+        The token limit for this level, by default None (unlimited).
+        An int is treated as a limit on total_tokens.
+    tokens_per_minute : int, optional
+        A limit on total tokens charged in any trailing 60 second window, by default None (unlimited).
+    requests_per_minute : int, optional
+        A limit on requests admitted in any trailing 60 second window, by default None (unlimited).
+    parent : Budget, optional
+        The enclosing level of the tree, by default None for a root.
+    name : str, optional
+        A label for logging and reporting, by default "root".
+    clock : callable, optional
+        A monotonic clock returning seconds, by default time.monotonic. Primarily for testing.
+    """
+
+    def __init__(
+        self,
+        capacity: Union[None, int, TokenUsage] = None,
+        tokens_per_minute: Optional[int] = None,
+        requests_per_minute: Optional[int] = None,
+        parent: Optional["Budget"] = None,
+        name: str = "root",
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.capacity: Optional[TokenUsage] = _as_usage(capacity)
+        self.tokens_per_minute = tokens_per_minute
+        self.requests_per_minute = requests_per_minute
+        self.parent = parent
+        self.name = name
+        self.children: dict[str, "Budget"] = {}
+
+        self.usage = TokenUsage(0, 0, 0)
+        self._reserved = 0
+        self._window: deque = deque()  # (timestamp, tokens, requests)
+
+        # All levels of a tree share one condition so waits and charges are consistent across the tree
+        self._clock = clock if parent is None else parent._clock
+        self._cond = threading.Condition(threading.RLock()) if parent is None else parent._cond
+
+    def __repr__(self):
+        return f"Budget(name={self.name!r}, usage={self.usage!r}, capacity={self.capacity!r})"
+
+    @property
+    def path(self) -> str:
+        """The slash-delimited names from the root to this level."""
+        return self.name if self.parent is None else f"{self.parent.path}/{self.name}"
+
+    def child(
+        self,
+        name: str,
+        capacity: Union[None, int, TokenUsage] = None,
+        tokens_per_minute: Optional[int] = None,
+        requests_per_minute: Optional[int] = None,
+    ) -> "Budget":
+        """
+        Gets or creates a named child level.
+
+        Requesting an existing name returns the same child, so separate callers can share a level by name.
+        Limits are only applied when the child is first created.
+
+        Parameters
+        ----------
+        name : str
+            The name of the child level.
+        capacity : int | TokenUsage, optional
+            The token limit for the child, by default None (unlimited).
+        tokens_per_minute : int, optional
+            The trailing-minute token limit for the child, by default None (unlimited).
+        requests_per_minute : int, optional
+            The trailing-minute request limit for the child, by default None (unlimited).
+
+        Returns
+        -------
+        Budget
+            The child level.
+        """
+        with self._cond:
+            if name not in self.children:
+                self.children[name] = Budget(capacity, tokens_per_minute, requests_per_minute, parent=self, name=name)
+            return self.children[name]
+
+    def lineage(self) -> list["Budget"]:
+        """The levels from this node up to and including the root."""
+        node, levels = self, []
+        while node is not None:
+            levels.append(node)
+            node = node.parent
+        return levels
+
+    @property
+    def exceeded(self) -> bool:
+        """True when this level, or any enclosing level, has accumulated usage beyond its capacity."""
+        with self._cond:
+            return self._blocking_level() is not None
+
+    def admit(self, estimate: Union[None, int, TokenUsage] = None, wait: bool = True, timeout: float = None) -> bool:
+        """
+        Decides whether a request may be dispatched, reserving its estimated tokens at every level if so.
+
+        Capacity is a hard limit: once any level is exceeded the request is refused immediately.
+        Per-minute quotas are soft: when wait is set the call blocks until the trailing window has room.
+
+        Parameters
+        ----------
+        estimate : int | TokenUsage, optional
+            The expected total tokens of the request, by default None (0).
+            Used both for the per-minute window and to hold back capacity for in-flight requests.
+        wait : bool, optional
+            Whether to block for per-minute windows to free up, by default True.
+        timeout : float, optional
+            The maximum seconds to wait for a window, by default None (no limit).
+
+        Returns
+        -------
+        bool
+            True if admitted; the caller must follow with charge() or release().
+        """
+        tokens = (_as_usage(estimate).total_tokens or 0) if estimate is not None else 0
+        deadline = None if timeout is None else self._clock() + timeout
+
+        with self._cond:
+            while True:
+                if (blocked := self._blocking_level(tokens)) is not None:
+                    logger.info(f"Budget {blocked.path} refused request: {blocked.usage} > {blocked.capacity}")
+                    return False
+
+                wait_for = max((level._window_wait(tokens) for level in self.lineage()), default=0)
+                if wait_for <= 0:
+                    break
+                if not wait:
+                    return False
+
+                if deadline is not None:
+                    remaining = deadline - self._clock()
+                    if remaining <= 0:
+                        return False
+                    wait_for = min(wait_for, remaining)
+                logger.debug(f"Budget {self.path} waiting {wait_for:.2f}s for per-minute quota")
+                self._cond.wait(wait_for)
+
+            now = self._clock()
+            for level in self.lineage():
+                level._reserved += tokens
+                level._window.append((now, tokens, 1))
+            return True
+
+    def charge(self, usage: Union[dict, TokenUsage], estimate: Union[None, int, TokenUsage] = None) -> None:
+        """
+        Records the actual usage of an admitted request at every level, releasing its reservation.
+
+        Parameters
+        ----------
+        usage : dict | TokenUsage
+            The usage reported for the request.
+        estimate : int | TokenUsage, optional
+            The estimate passed to admit(), by default None (0).
+        """
+        usage = _as_usage(usage)
+        tokens = (_as_usage(estimate).total_tokens or 0) if estimate is not None else 0
+        delta = (usage.total_tokens or 0) - tokens
+
+        with self._cond:
+            now = self._clock()
+            for level in self.lineage():
+                level.usage += usage
+                level._reserved = max(0, level._reserved - tokens)
+                if delta:
+                    level._window.append((now, delta, 0))
+            self._cond.notify_all()
+
+    def release(self, estimate: Union[None, int, TokenUsage] = None) -> None:
+        """
+        Releases the reservation of an admitted request that was never completed.
+
+        Parameters
+        ----------
+        estimate : int | TokenUsage, optional
+            The estimate passed to admit(), by default None (0).
+        """
+        self.charge(TokenUsage(0, 0, 0), estimate)
+
+    def remaining(self) -> Optional[int]:
+        """The smallest number of total tokens left before any level reaches capacity, None if unlimited."""
+        with self._cond:
+            left = [
+                level.capacity.total_tokens - (level.usage.total_tokens or 0) - level._reserved
+                for level in self.lineage()
+                if level.capacity is not None and level.capacity.total_tokens is not None
+            ]
+            return min(left) if left else None
+
+    def _blocking_level(self, tokens: int = 0) -> Optional["Budget"]:
+        """Returns the first level that cannot admit the tokens, if any."""
+        for level in self.lineage():
+            if level.capacity is None:
+                continue
+            if level.usage > level.capacity:
+                return level
+            # Tokens reserved for requests in flight, plus those to admit, count as used; with none pending this
+            # is the check above, so it is skipped
+            pending = level._reserved + tokens
+            if pending and level.usage + TokenUsage(None, None, pending) > level.capacity:
+                return level
+        return None
+
+    def _window_wait(self, tokens: int) -> float:
+        """Seconds until this level's trailing window can fit the request, 0 if it fits now."""
+        if self.tokens_per_minute is None and self.requests_per_minute is None:
+            return 0
+
+        now = self._clock()
+        while self._window and now - self._window[0][0] >= WINDOW_SECONDS:
+            self._window.popleft()
+        if not self._window:
+            return 0
+
+        used_tokens = sum(entry[1] for entry in self._window)
+        used_requests = sum(entry[2] for entry in self._window)
+        over_tokens = self.tokens_per_minute is not None and used_tokens + tokens > self.tokens_per_minute
+        over_requests = self.requests_per_minute is not None and used_requests + 1 > self.requests_per_minute
+        if not (over_tokens or over_requests):
+            return 0
+
+        return max(self._window[0][0] + WINDOW_SECONDS - now, 1e-3)
+
+    def report(self) -> dict:
+        """
+        Summarizes usage for this level and all descendants.
+
+        Returns
+        -------
+        dict
+            A mapping of level path to a dict of usage and capacity.
+        """
+        with self._cond:
+            summary = {self.path: {"usage": self.usage, "capacity": self.capacity}}
+            for child in self.children.values():
+                summary.update(child.report())
+            return summary
+
+
+__all__ = ["Budget"]
@@ -0,0 +1,181 @@
+import logging
+from collections import Counter
+from typing import Any, Callable, Optional
+
+from evaluation_instruments._budget import Budget
+from evaluation_instruments._dataset import Dataset, iter_samples
+from evaluation_instruments._evaluation import Evaluation, _score_of
+from evaluation_instruments.model import TokenUsage
+
+logger = logging.getLogger("evaluation")
+
+
+def uncertainty(responses: list[dict], borderline: Optional[Callable[[str, Any], bool]] = None) -> Optional[str]:
+    """
+    Returns why a set of responses for the same sample is uncertain, or None if it can be accepted.
+
+    Parameters
+    ----------
+    responses : list[dict]
+        The parsed responses for one sample, one per repeated sample of the model.
+    borderline : Callable[[str, Any], bool], optional
+        Called with a criterion and its score, returning True if the score is too close to call,
+        by default None to not check scores.
+
+    Returns
+    -------
+    Optional[str]
+        'unanswered' if any response is missing, such as from a sample that stopped at its capacity,
+        'parse_failure' if any response is empty, 'disagreement' if the responses score any criterion
+        differently, 'borderline' if any score is borderline, or None.
+    """
+    if any(response is None for response in responses):
+        return "unanswered"
+    if not responses or not all(responses):
+        return "parse_failure"
+
+    criteria = dict.fromkeys(key for response in responses for key in response)
+    for key in criteria:
+        if len({repr(_score_of(response.get(key))) for response in responses}) > 1:
+            return "disagreement"
+
+    if borderline is not None and any(borderline(key, _score_of(value)) for key, value in responses[0].items()):
+        return "borderline"
+    return None
+
+
+class Cascade:
+    """
+    Evaluates with a sequence of increasingly capable judges, escalating only the rows a judge is unsure of.
+
+    Every row is first run with the first tier. Rows whose responses fail to parse, have borderline scores,
+    or disagree across repeated samples are re-run with the next tier, and so on; the last tier's responses
+    are always accepted. Since a cheap judge usually agrees with an expensive one, most rows never reach
+    the expensive tiers.
+
+    Rows a tier returned no response for, such as after its capacity or deadline was reached, are escalated
+    as 'unanswered', and any the last tier leaves are listed in the report.
+
+    Escalated rows are found by iterating the dataset again, so it must be re-iterable, such as a DataFrame
+    or a list of records.
+
+    Parameters
+    ----------
+    tiers : list[tuple[Evaluation, str]]
+        The evaluation and model of each tier, cheapest first. The evaluations may be the same object when
+        the completion function serves every model.
+    borderline : Callable[[str, Any], bool], optional
+        Called with a criterion and its score, returning True if the score should be escalated,
+        by default None to only escalate parse failures and disagreement.
+    samples : int, optional
+        The number of times each row is run on every tier but the last, by default 1
+        With more than one sample, rows whose samples disagree on any criterion are escalated. The samples of a
+        tier share one budget level with the evaluation's capacity, so sampling does not multiply the capacity.
+    """
+
+    def __init__(
+        self,
+        tiers: list[tuple[Evaluation, str]],
+        borderline: Optional[Callable[[str, Any], bool]] = None,
+        samples: int = 1,
+    ):
+        if not tiers:
+            raise ValueError("At least one tier is required")
+        self.tiers = tiers
+        self.borderline = borderline
+        self.samples = max(1, samples)
+        self.report: dict = {}
+
+    def run_dataset(self, df: Dataset) -> tuple[dict, TokenUsage]:
+        """
+        Runs the cascade on a dataset, returning a dictionary of responses and the combined TokenUsage.
+
+        Parameters
+        ----------
+        df : pd.DataFrame | Iterable
+            The dataset to evaluate; must be re-iterable.
+
+        Returns
+        -------
+        tuple[dict, TokenUsage]
+            The accepted response for each row, and the usage summed across all tiers.
+            Per-tier usage, the tier that answered each row, the escalation rate, and the rows no tier answered
+            are stored in report.
+        """
+        outputs = {}
+        total_usage = TokenUsage(0, 0, 0)
+        tier_reports = []
+        answered_by = {}
+        reasons = Counter()
+
+        order = [sample.Index for sample in iter_samples(df)]
+        pending = None  # None for all rows
+        for level, (evaluation, model) in enumerate(self.tiers):
+            last = level == len(self.tiers) - 1
+            rows = df if pending is None else [sample for sample in iter_samples(df) if sample.Index in pending]
+
+            sample_count = 1 if last else self.samples
+            if sample_count > 1:
+                # the samples draw from one level with the capacity of a single run, beneath any shared budget
+                evaluation = evaluation._copy()
+                evaluation.budget = Budget(evaluation.capacity, parent=evaluation.budget, name=f"tier {level}")
+
+            runs = []
+            tier_usage = TokenUsage(0, 0, 0)
+            for _ in range(sample_count):
+                run_outputs, usage = evaluation.run_dataset(rows, model=model)
+                runs.append(run_outputs)
+                tier_usage = tier_usage + usage
+            total_usage = total_usage + tier_usage
+
+            tier_rows = order if pending is None else [sample_ix for sample_ix in order if sample_ix in pending]
+            escalate = set()
+            unanswered = []
+            for sample_ix in tier_rows:
+                # a row missing from a run was never answered, ex. the tier's capacity or deadline was reached
+                if sample_ix not in runs[0]:
+                    unanswered.append(sample_ix)
+                    reason = "unanswered"
+                elif last:
+                    reason = None
+                else:
+                    reason = uncertainty([run.get(sample_ix) for run in runs], self.borderline)
+
+                if reason is None:
+                    outputs[sample_ix] = runs[0][sample_ix]
+                    answered_by[sample_ix] = model
+                elif not last:
+                    escalate.add(sample_ix)
+                    reasons[reason] += 1
+
+            tier_reports.append(
+                {
+                    "model": model,
+                    "rows": len(tier_rows),
+                    "escalated": len(escalate),
+                    "unanswered": len(unanswered),
+                    "usage": tier_usage,
+                }
+            )
+            logger.info(f"Tier {level} ({model}) escalated {len(escalate)} of {len(tier_rows)} rows")
+            if not escalate:
+                break
+            pending = escalate
+
+        # restore the order of the dataset, as escalated rows are answered later
+        outputs = {sample_ix: outputs[sample_ix] for sample_ix in order if sample_ix in outputs}
+
+        evaluated = tier_reports[0]["rows"]
+        self.report = {
+            "tiers": tier_reports,
+            "escalation_rate": tier_reports[0]["escalated"] / evaluated if evaluated else 0.0,
+            "reasons": dict(reasons),
+            "answered_by": answered_by,
+            "unanswered": [sample_ix for sample_ix in order if sample_ix not in outputs],
+        }
+        if self.report["unanswered"]:
+            logger.warning(f"{len(self.report['unanswered'])} rows were not answered by any tier")
+        return outputs, total_usage
+
+
+__all__ = ["Cascade", "uncertainty"]
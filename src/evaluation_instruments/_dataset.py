@@ -0,0 +1,142 @@
+import logging
+from collections import namedtuple
+from collections.abc import Mapping
+from functools import lru_cache
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Union
+
+import pandas as pd
+
+logger = logging.getLogger("evaluation")
+
+Dataset = Union[pd.DataFrame, Iterable[pd.DataFrame], Iterable[Mapping], Iterable[tuple]]
+
+
+def iter_samples(data: Dataset) -> Iterator[tuple]:
+    """
+    Lazily yields the rows of a dataset as namedtuples with an Index field, as DataFrame.itertuples does.
+
+    Supported inputs are:
+    - a DataFrame
+    - an iterable of DataFrames, such as pd.read_csv(..., chunksize=n) or read_parquet_batches
+    - an iterable of mappings (ex. dicts); an 'Index' key is used as the index, otherwise the position is used
+    - an iterable of namedtuples that already have an Index field
+
+    Only one chunk is held in memory at a time, so large inputs can be evaluated in bounded memory.
+
+    Parameters
+    ----------
+    data : Dataset
+        The dataset to iterate.
+
+    Yields
+    ------
+    namedtuple
+        The next row, with its index in the Index field.
+    """
+    if isinstance(data, pd.DataFrame):
+        yield from data.itertuples()
+        return
+
+    for position, item in enumerate(data):
+        if isinstance(item, pd.DataFrame):
+            yield from item.itertuples()
+        elif isinstance(item, Mapping):
+            yield _record_to_sample(item, position)
+        elif hasattr(item, "Index"):
+            yield item
+        else:
+            raise TypeError(f"Unsupported dataset item of type {type(item)}; expected a DataFrame, mapping, or row")
+
+
+def is_empty(data: Optional[Dataset]) -> bool:
+    """Returns True for None or a materialized dataset with no rows; lazy inputs are never known to be empty."""
+    if data is None:
+        return True
+    if isinstance(data, (pd.DataFrame, list, tuple)):
+        return len(data) == 0
+    return False
+
+
+def indices_after(data: Dataset, count: int) -> Optional[list]:
+    """
+    Returns the indices of the rows after the first count rows of a materialized dataset, without reading any
+    input; None for a lazy input, whose remaining rows are not known without reading them.
+    """
+    if isinstance(data, pd.DataFrame):
+        return list(data.index[count:])
+    if isinstance(data, (list, tuple)):
+        return [sample.Index for sample in islice(iter_samples(data), count, None)]
+    return None
+
+
+@lru_cache(maxsize=32)
+def _sample_type(fields: tuple[str, ...]) -> type:
+    return namedtuple("Sample", ("Index",) + fields, rename=True)
+
+
+def _record_to_sample(record: Mapping, position: int) -> tuple:
+    fields = tuple(str(key) for key in record if key != "Index")
+    index = record.get("Index", position)
+    return _sample_type(fields)(index, *(value for key, value in record.items() if key != "Index"))
+
+
+def read_parquet_batches(
+    path: Union[str, Path], columns: Optional[list[str]] = None, batch_size: Optional[int] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Lazily reads a Parquet file as a series of DataFrames, one per row group or batch.
+
+    Requires the optional pyarrow dependency. A stored pandas index is restored, with a stored RangeIndex
+    continued across the chunks; otherwise each chunk's index continues from the previous chunk so that
+    indices are unique across the file.
+
+    Parameters
+    ----------
+    path : str | Path
+        The Parquet file to read.
+    columns : list[str], optional
+        The subset of columns to read, by default None for all columns.
+    batch_size : int, optional
+        The maximum rows per chunk, by default None to read one row group at a time.
+
+    Yields
+    ------
+    pd.DataFrame
+        The next chunk of rows.
+    """
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise ImportError("Reading Parquet datasets requires pyarrow; install it with `pip install pyarrow`.") from exc
+
+    parquet_file = pq.ParquetFile(path)
+    if batch_size is None:
+        tables = (parquet_file.read_row_group(i, columns=columns) for i in range(parquet_file.num_row_groups))
+    else:
+        tables = parquet_file.iter_batches(batch_size=batch_size, columns=columns)
+
+    stored_range = _stored_range(parquet_file.schema_arrow.pandas_metadata)
+    offset = 0
+    for table in tables:
+        chunk = table.to_pandas()
+        # a stored column index is restored by to_pandas, but a RangeIndex is only metadata, rebuilt per chunk
+        if isinstance(chunk.index, pd.RangeIndex):
+            chunk.index = _chunk_range(stored_range, offset, len(chunk))
+        offset += len(chunk)
+        yield chunk
+
+
+def _stored_range(pandas_metadata: Optional[dict]) -> Optional[dict]:
+    """Returns the RangeIndex stored in a Parquet file's pandas metadata, or None if none was stored."""
+    index_columns = (pandas_metadata or {}).get("index_columns", [])
+    return next((index for index in index_columns if isinstance(index, dict) and index.get("kind") == "range"), None)
+
+
+def _chunk_range(stored_range: Optional[dict], offset: int, length: int) -> pd.RangeIndex:
+    """Returns the index of the chunk of rows from offset, continuing the stored range or else numbering rows."""
+    if stored_range is None:
+        return pd.RangeIndex(offset, offset + length)
+    start, step = stored_range["start"], stored_range["step"]
+    return pd.RangeIndex(start + offset * step, start + (offset + length) * step, step, name=stored_range.get("name"))
@@ -0,0 +1,81 @@
+import hashlib
+import json
+import threading
+from concurrent.futures import Future
+from typing import Callable, Hashable, Optional
+
+
+def prompt_key(prompt, model: Optional[str] = None) -> str:
+    """
+    Returns a stable hash identifying a resolved prompt, so identical requests can be recognized.
+
+    Parameters
+    ----------
+    prompt : list[dict] | str
+        The message array, or raw prompt, as returned by a prep_fn.
+    model : str, optional
+        The model the prompt is sent to, by default None
+
+    Returns
+    -------
+    str
+        The hex digest of the model and prompt.
+    """
+    payload = json.dumps([model, prompt], sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """
+    Coalesces calls by key, so each distinct key is computed once and every caller shares the result.
+
+    A call for a key that is already in flight waits for it rather than starting another, and a call for a
+    key that has completed returns the stored result. Failures are not stored, so a later call retries.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, Future] = {}
+
+    def __len__(self):
+        return len(self._calls)
+
+    def done(self, key: Hashable) -> bool:
+        """Returns True if a result for key has already been computed."""
+        with self._lock:
+            future = self._calls.get(key)
+        return future is not None and future.done()
+
+    def do(self, key: Hashable, fn: Callable):
+        """
+        Returns the result of fn for key, computing it only if no other call has.
+
+        Parameters
+        ----------
+        key : Hashable
+            Identifies calls that share a result.
+        fn : Callable
+            Computes the result, called with no arguments.
+
+        Returns
+        -------
+        tuple[Any, bool]
+            The result, and whether it was shared from another call rather than computed by this one.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+
+        if not leader:
+            return future.result(), True
+
+        try:
+            future.set_result(fn())
+        except BaseException as exc:
+            with self._lock:
+                self._calls.pop(key, None)
+            future.set_exception(exc)
+            raise
+        return future.result(), False
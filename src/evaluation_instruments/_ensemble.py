@@ -0,0 +1,153 @@
+import logging
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Optional
+
+from evaluation_instruments._budget import Budget
+from evaluation_instruments._dataset import Dataset, is_empty
+from evaluation_instruments._evaluation import Evaluation
+from evaluation_instruments.model import TokenUsage
+
+logger = logging.getLogger("evaluation")
+
+
+class Ensemble:
+    """
+    Evaluates a dataset with several judge models at once, sharing one bounded pool of concurrent requests.
+
+    Each row is prepared once with the evaluation's prep_fn, and a request per judge is queued to the pool, so
+    the judges' requests are interleaved and the total wall time approaches that of the slowest judge rather
+    than the sum of all judges. Each judge draws from its own run budget with the evaluation's capacity,
+    beneath the evaluation's shared budget when one is set; a judge that exceeds its capacity stops receiving
+    requests while the others continue.
+
+    Each judge runs on its own copy of the evaluation, kept in runs after a run, so that its per-run state, such
+    as unfinished, schema_violations, choice_dispersion, stream_stats, and prompt_metadata, can be inspected.
+
+    Parameters
+    ----------
+    evaluation : Evaluation
+        The evaluation providing the prep_fn, post-processing, model_args, capacity, and budget.
+    judges : list[tuple[str, Callable]]
+        The (model, completion_fn) of each judge; the model name identifies the judge in the outputs.
+        A completion_fn of None uses the evaluation's completion_fn.
+    max_workers : int, optional
+        The maximum requests in flight across all judges, by default 8
+    """
+
+    def __init__(self, evaluation: Evaluation, judges: list[tuple[str, Optional[Callable]]], max_workers: int = 8):
+        models = [model for model, _ in judges]
+        if not judges:
+            raise ValueError("At least one judge is required")
+        if len(set(models)) < len(models):
+            raise ValueError(f"Judge models must be unique: {', '.join(models)}")
+
+        self.evaluation = evaluation
+        self.judges = judges
+        self.max_workers = max(1, max_workers)
+        self.runs: dict[str, Evaluation] = {}
+
+    def run_dataset(self, df: Dataset, capacity: int = None) -> tuple[dict[str, dict], dict[str, TokenUsage]]:
+        """
+        Runs every judge on a dataset, returning the responses and usage of each judge.
+
+        Parameters
+        ----------
+        df : pd.DataFrame | Iterable
+            The dataset to evaluate, as for Evaluation.run_dataset.
+        capacity : int, optional
+            The maximum token capacity for each judge, by default None to use the evaluation's capacity.
+
+        Returns
+        -------
+        tuple[dict[str, dict], dict[str, TokenUsage]]
+            The responses of each judge keyed by model then sample index, and the usage of each judge.
+            Use post.frame_from_judges to combine the responses into one frame.
+        """
+        self.runs = {}
+        if is_empty(df):
+            logger.warning("Empty DataFrame provided for evaluation.")
+            return {model: {} for model, _ in self.judges}, {model: TokenUsage(0, 0, 0) for model, _ in self.judges}
+
+        max_usage = self.evaluation.capacity if not capacity else TokenUsage(None, None, capacity)
+        judges = {model: self._judge(completion_fn) for model, completion_fn in self.judges}
+        self.runs = judges
+        budgets = {model: Budget(max_usage, parent=self.evaluation.budget, name=model) for model in judges}
+        for judge in judges.values():
+            judge._start_hedging(max_usage)
+        outputs = {model: {} for model in judges}
+        order = []
+        stopped = set()
+
+        def request(model: str, sample_ix, prompt, estimate):
+            try:
+                # namespaced by judge, as the judges' logs and statistics would otherwise collide
+                response, usage = judges[model]._complete(f"{sample_ix}-{model}", prompt, model)
+            except TimeoutError as exc:
+                budgets[model].release(estimate)
+                logger.warning(f"{sample_ix}-Unfinished by {model}: {exc}")
+                with judges[model]._stats_lock:
+                    judges[model].unfinished.append(sample_ix)
+                return
+            budgets[model].charge(usage, estimate)
+            outputs[model][sample_ix] = response
+            logger.debug(f"{sample_ix}-Completed evaluation by {model}")
+
+        in_flight: set[Future] = set()
+        with ThreadPoolExecutor(self.max_workers, thread_name_prefix="evaluation-ensemble") as executor:
+            for sample in self.evaluation._iter_samples(df):
+                for model, judge in judges.items():
+                    judge._settle_hedges(budgets[model])
+                    judge._settle_abandoned(budgets[model])
+                stopped.update(model for model in judges if budgets[model].exceeded)
+                if len(stopped) == len(judges):
+                    logger.warning(f"Aborting run before {sample.Index}. Capacity exceeded for every judge.")
+                    break
+
+                prompt = self.evaluation.prep_fn(sample)
+                estimate = self.evaluation.estimate_usage(prompt)
+                order.append(sample.Index)
+
+                for model in judges:
+                    if model in stopped:
+                        continue
+                    # bound the queue so rows are only prepared as the pool drains
+                    while len(in_flight) >= self.max_workers:
+                        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        _raise_failures(done)
+
+                    if not budgets[model].admit(estimate):
+                        logger.warning(
+                            f"Stopping {model} before {sample.Index}. Estimated {estimate} exceeds capacity."
+                        )
+                        stopped.add(model)
+                        continue
+                    judges[model]._record_metadata(sample.Index, prompt)
+                    in_flight.add(executor.submit(request, model, sample.Index, prompt, estimate))
+
+            done, _ = wait(in_flight)
+            _raise_failures(done)
+        for model, judge in judges.items():
+            judge._settle_hedges(budgets[model], wait_all=True)
+            judge._settle_abandoned(budgets[model], final=True)
+
+        # restore the row order, as requests complete out of order
+        outputs = {
+            model: {sample_ix: responses[sample_ix] for sample_ix in order if sample_ix in responses}
+            for model, responses in outputs.items()
+        }
+        return outputs, {model: budget.usage for model, budget in budgets.items()}
+
+    def _judge(self, completion_fn: Optional[Callable]) -> Evaluation:
+        """Returns a copy of the evaluation that sends requests with the judge's completion function."""
+        judge = self.evaluation._copy()
+        if completion_fn is not None:
+            judge.completion_fn = completion_fn
+        return judge
+
+
+def _raise_failures(done: set[Future]) -> None:
+    for future in done:
+        future.result()
+
+
+__all__ = ["Ensemble"]
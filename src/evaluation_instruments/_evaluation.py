@@ -1,11 +1,38 @@
+import copy
 import json
 import logging
+import statistics
 import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
+from functools import reduce
+from itertools import islice
+from operator import add
 from pathlib import Path
-from typing import Optional
+from typing import Any, Callable, Iterator, Optional
 
-from evaluation_instruments.model import TokenUsage
+import pandas as pd
+
+from evaluation_instruments._budget import Budget
+from evaluation_instruments._dataset import Dataset, indices_after, is_empty, iter_samples
+from evaluation_instruments._dedup import SingleFlight, prompt_key
+from evaluation_instruments._hedge import Hedger
+from evaluation_instruments._streaming import consume_stream
+from evaluation_instruments._timeout import call_with_timeout
+from evaluation_instruments.model import PromptSet, TokenUsage
+from evaluation_instruments.post import aggregate_choices
+from evaluation_instruments.prep.batching import split_packed_response
+from evaluation_instruments.prep.reader import read_ahead
+from evaluation_instruments.prep.schema import (
+    SCHEMA_METADATA_KEY,
+    response_format,
+    schema_max_tokens,
+    validate_response,
+)
+from evaluation_instruments.prep.tokens import TokenCounter
 
 logger = logging.getLogger("evaluation")
 
@@ -29,6 +56,46 @@ class Evaluation:
     It will also parse response['usage'] into a TokenUsage object which will be used to abort a run after the
     first request exceeding the capacity specified (default 10_000 tokens).
 
+    When the prep_fn returns a PromptMessages, its metadata (such as which inputs were truncated to fit the
+    context window) is collected per sample in prompt_metadata for the most recent run.
+
+    When the prep_fn returns a PromptSet, such as one prompt per chunk of an input too long for the context
+    window, its prompts are sent concurrently and their parsed responses combined by the set's reduce_fn
+    into the single output for the sample.
+
+    With deduplicate enabled, identical prompts within a run are sent once: later samples with the same
+    message array reuse the parsed response, and concurrent identical requests wait on the one in flight.
+    The requests and tokens saved are reported in dedup_stats for the most recent run.
+
+    With a batch_prep_fn and cases_per_request above one, rows are packed several to a request so that static
+    content such as the rubric is sent once per batch. The response is split back into one output per row,
+    and any row missing from it is re-evaluated on its own with the prep_fn; counts are in packing_stats.
+
+    With a hedge_percentile, a request still outstanding after that percentile of observed latencies is sent
+    again, to the hedge_completion_fn if set, and the first response is kept. The losing request still
+    completes, and its usage is charged to the run; hedging stops once that usage reaches hedge_fraction of
+    the run's capacity. Counts and the hedging usage are in hedge_stats for the most recent run.
+
+    With a request_timeout, a request that has not completed in time is abandoned, even when the completion_fn
+    has no timeout of its own, and its row is left unevaluated. An abandoned request is still billed, so its
+    usage is charged to the budget once it completes, even after the run has returned. Rows left unevaluated by
+    a timeout or by the deadline of run_dataset are listed in unfinished for the most recent run (for a lazy
+    input, rows not yet read when the deadline is reached are not listed), and stop_reason is 'capacity' or
+    'deadline' when the most recent run stopped before reaching the end of its dataset.
+
+    With stream enabled, the completion_fn is called with stream=True and the chunks are read only until a
+    complete JSON object with every expected key has arrived; the stream is then closed, so any text the model
+    would generate after the result is never waited for. The chunks are assembled into an OpenAI-style response
+    for the post_process_fn, and the time to first token and to the result are kept per sample in stream_stats.
+
+    With a response_schema, such as one from an instrument's response_schema helper, each request asks for
+    structured output with the schema as its response_format, and is limited to max_tokens sized from the schema
+    unless model_args sets a limit. The default post-processing then parses the content as-is and validates it
+    against the schema, without searching the text for an object; a response that does not conform is recorded
+    in schema_violations for the most recent run and left empty. A prompt whose response differs from the others,
+    such as one part of a PromptSet, carries its own schema as 'response_schema' metadata (see
+    prep.with_response_schema), which is used in place of the response_schema; a PromptSet part, a packed prompt,
+    or an explain prompt of run_two_phase without one is rejected with a ValueError.
 
     Parameters
     ----------
@@ -52,6 +119,48 @@ class Evaluation:
     log_prefix : Optional[str], optional
         An optional prefix for the log directory within the temporary logging path, by default None.
         Useful for organizing logs from different evaluation runs.
+    budget : Optional[Budget], optional
+        A shared Budget level to draw from, by default None.
+        Each run adds a child level enforcing its capacity, so limits on this level and all of its ancestors
+        (ex. per-model or run-wide totals and per-minute quotas) are checked before every request is dispatched.
+    token_counter : Optional[TokenCounter], optional
+        Estimates each prompt before it is dispatched, by default None
+        When set, the estimate (plus any max_tokens in model_args) is reserved against the budget at admission,
+        so a request that would overrun capacity or a per-minute quota is held back before it is sent.
+    fanout_workers : int, optional
+        The maximum concurrent requests for the prompts of a single PromptSet, by default 8
+    deduplicate : bool, optional
+        A flag when true will send each distinct prompt only once per run, by default False
+    batch_prep_fn : callable, optional
+        This function resolves one prompt for a list of rows, by default None
+        The response must be keyed by case id ('case_1', 'case_2', ...) in row order, see prep.wrap_cases.
+    cases_per_request : int, optional
+        The number of rows packed into each request when a batch_prep_fn is set, by default 1
+    choice_aggregation : str, optional
+        How the default post-processing combines several choices, ex. with n > 1 in model_args,
+        one of "majority", "median", or "mean", by default "majority"
+    hedge_percentile : float, optional
+        The latency percentile, from 0 to 100, after which an outstanding request is hedged, by default None
+        to not hedge. Requests are only hedged once a few latencies have been observed in the run.
+    hedge_fraction : float, optional
+        The share of the run's total token capacity that losing hedged requests may use, by default 0.1
+    hedge_completion_fn : callable, optional
+        An alternate completion function for the duplicate requests, such as another endpoint for the same
+        model, by default None to use the completion_fn.
+    request_timeout : float, optional
+        The seconds to wait for each request before abandoning it, by default None (no limit).
+    stream : bool, optional
+        A flag when true will stream each completion and stop reading once its JSON object is complete,
+        by default False
+    expected_keys : list[str], optional
+        The keys, such as the rubric criteria, a streamed JSON object must contain to be complete,
+        by default None to accept the first complete object.
+        When a stream is cancelled before the provider reports usage, usage is estimated with the token_counter,
+        or a character heuristic if none is set.
+    response_schema : dict, optional
+        The JSON schema of a response, ex. from prep.rubric_schema, by default None for free-text JSON.
+        Sent as the response_format of each request, unless one is set in model_args, and used to size
+        max_tokens, to complete streamed objects, and to validate responses in the default post-processing.
     """
 
     def __init__(
@@ -63,6 +172,20 @@ class Evaluation:
         model_args: dict = {},
         max_tokens: int = 10_000,
         log_prefix: Optional[str] = None,
+        budget: Optional[Budget] = None,
+        token_counter: Optional[TokenCounter] = None,
+        fanout_workers: int = 8,
+        deduplicate: bool = False,
+        batch_prep_fn: callable = None,
+        cases_per_request: int = 1,
+        choice_aggregation: str = "majority",
+        hedge_percentile: Optional[float] = None,
+        hedge_fraction: float = 0.1,
+        hedge_completion_fn: callable = None,
+        request_timeout: Optional[float] = None,
+        stream: bool = False,
+        expected_keys: Optional[list[str]] = None,
+        response_schema: Optional[dict] = None,
     ):
         self.prep_fn = prep_fn
         self.completion_fn = completion_fn
@@ -71,9 +194,37 @@ class Evaluation:
         self.log_enabled = log_enabled
         self._model_args = model_args or {}
         self._log_prefix = log_prefix
-        
+        self.budget = budget
+        self.token_counter = token_counter
+        self.fanout_workers = fanout_workers
+        self.deduplicate = deduplicate
+        self.batch_prep_fn = batch_prep_fn
+        self.cases_per_request = cases_per_request
+        self.choice_aggregation = choice_aggregation
+        self.hedge_percentile = hedge_percentile
+        self.hedge_fraction = hedge_fraction
+        self.hedge_completion_fn = hedge_completion_fn
+        self.request_timeout = request_timeout
+        self.stream = stream
+        self.expected_keys = expected_keys
+        self.response_schema = response_schema
 
         self.tmp_dir: Optional[Path] = None
+        self.prompt_metadata: dict = {}
+        self.dedup_stats: dict = {}
+        self.packing_stats: dict = {}
+        self.choice_dispersion: dict = {}
+        self.hedge_stats: dict = {}
+        self.unfinished: list = []
+        self.stop_reason: Optional[str] = None
+        self.stream_stats: dict = {}
+        self.schema_violations: dict = {}
+        self._flight: Optional[SingleFlight] = None
+        self._hedger: Optional[Hedger] = None
+        self._abandoned: list[Future] = []
+        self._deadline: Optional[float] = None
+        self._request_seconds: deque = deque(maxlen=50)
+        self._stats_lock = threading.Lock()
         self.capacity: TokenUsage = TokenUsage(None, None, max_tokens)
 
         logger.debug(f"Set up with {log_enabled=} and capacity {max_tokens}")
@@ -113,55 +264,714 @@ class Evaluation:
     def toggle_logging(self):
         self._log_enabled = not self._log_enabled
 
-    def run_dataset(self, df: "pd.DataFrame", model: str = None, capacity: int = None) -> tuple[dict, TokenUsage]:
+    def run_dataset(
+        self, df: Dataset, model: str = None, capacity: int = None, deadline: Optional[float] = None
+    ) -> tuple[dict, TokenUsage]:
         """
         Run the evaluation on a dataset, returning a dictionary of responses and a TokenUsage object.
 
         Parameters
         ----------
-        df : pd.DataFrame
-            The dataset to evaluate, expected to be a DataFrame.
+        df : pd.DataFrame | Iterable
+            The dataset to evaluate, typically a DataFrame.
             Individual rows will be passed to the prep_fn in the evaluation loop.
+            May also be a lazy input, such as an iterable of records, a chunked CSV reader
+            (pd.read_csv(..., chunksize=n)), or read_parquet_batches; rows are then read as they are evaluated.
         model : str, optional
             The model to use for evaluation, by default None
             Passed as the first argument to the completion function.
         capacity : int, optional
             The maximum token capacity for the evaluation, by default None
             If not provided, will use the default capacity set in the class.
+        deadline : float, optional
+            The wall-clock seconds the run may take, by default None (no limit).
+            No request is dispatched once the time left is less than a typical request of the run, and requests
+            in flight are abandoned at the deadline. The outputs and usage so far are returned, and the rows
+            that were not evaluated are listed in unfinished; for a lazy input, only the rows already read are
+            listed, as the rest are not read.
         """
-        if df is None or len(df) == 0:
+        self.unfinished = []
+        self.stop_reason = None
+        if is_empty(df):
             logger.warning("Empty DataFrame provided for evaluation.")
             return {}, TokenUsage(0, 0, 0)
 
         tmp_dir = None
         outputs = {}
-        accumulated_usage = TokenUsage(0, 0, 0)
+        self.prompt_metadata = {}
+        self.choice_dispersion = {}
+        self.stream_stats = {}
+        self.schema_violations = {}
+        self._start_dedup()
+        self.packing_stats = {"packed_requests": 0, "packed_cases": 0, "fallbacks": 0}
+        max_usage = self.capacity if not capacity else TokenUsage(None, None, capacity)
+        run_budget = self._run_budget(max_usage)
+        self._start_hedging(max_usage)
+        self._abandoned = []
+        self._deadline = None if deadline is None else time.monotonic() + deadline
+        self._request_seconds = deque(maxlen=50)
+
+        samples = self._iter_samples(df)
+        read = 0
+        for batch in self._iter_batches(samples):
+            read += len(batch)
+            self._settle_hedges(run_budget)
+            self._settle_abandoned(run_budget)
+            # abort if beyond capacity at any level
+            if run_budget.exceeded:
+                logger.warning(f"Aborting run before {batch[0].Index}. Capacity exceeded: {run_budget.report()}")
+                self.stop_reason = "capacity"
+                break
+            if not self._time_for_request():
+                logger.warning(f"Stopping run before {batch[0].Index}. Deadline of {deadline}s reached.")
+                self.stop_reason = "deadline"
+                self.unfinished.extend(sample.Index for sample in batch)
+                # the rest of a lazy input is left unread, and so unlisted
+                self.unfinished.extend(indices_after(df, read) or [])
+                break
+
+            if len(batch) == 1:
+                completed = self._run_sample(batch[0], model, run_budget, outputs)
+            else:
+                completed = self._run_packed(batch, model, run_budget, outputs)
+            if not completed:
+                self.stop_reason = "capacity"
+                break
+
+        self._settle_hedges(run_budget, wait_all=True)
+        self._settle_abandoned(run_budget, final=True)
+        self._deadline = None
+        if self.unfinished:
+            logger.warning(f"{len(self.unfinished)} rows unfinished")
+        accumulated_usage = run_budget.usage
+        if accumulated_usage.cache_hit_rate is not None:
+            logger.info(f"Prompt cache hit rate {accumulated_usage.cache_hit_rate:.1%} of prompt tokens")
+        if self.deduplicate:
+            stats = self.dedup_stats
+            logger.info(
+                f"Deduplicated {stats['duplicates']} of {stats['requests']} requests, saving {stats['saved_usage']}"
+            )
+
+        if self.tmp_dir is not None:
+            logger.info(f"Dumped raw content to {tmp_dir}")
+
+        return outputs, accumulated_usage
+
+    def run_two_phase(
+        self,
+        df: Dataset,
+        explain_prep_fn: Callable,
+        predicate: Callable[[str, Any], bool],
+        model: str = None,
+        capacity: int = None,
+    ) -> tuple[dict, TokenUsage]:
+        """
+        Scores every row, then requests explanations only for the rows and criteria that need them.
+
+        Phase one is a normal run_dataset with the prep_fn, which should request scores only
+        (ex. OutputMode.SCORE). Each criterion of the responses is checked with the predicate, such as a low
+        score, and phase two re-runs only the flagged rows with explain_prep_fn, asking for explanations of
+        only the flagged criteria. The results are merged into nested {criterion: {"score": ...}} outputs, where
+        flagged criteria take the explained response and include its explanation.
+
+        Phase two iterates the dataset again, so df must be re-iterable, such as a DataFrame or a list of records.
+
+        Parameters
+        ----------
+        df : pd.DataFrame | Iterable
+            The dataset to evaluate.
+        explain_prep_fn : callable
+            Resolves a prompt for a row, accepting a rubric_keys keyword argument with the criteria to explain,
+            ex. resolving with OutputMode.EXPLAINED_SCORE.
+        predicate : callable
+            Called with a criterion name and its phase one score; returns True if it should be explained.
+        model : str, optional
+            The model to use for evaluation, by default None
+        capacity : int, optional
+            The maximum token capacity across both phases, by default None to use the class capacity.
+
+        Returns
+        -------
+        tuple[dict, TokenUsage]
+            The merged nested outputs and the combined usage of both phases.
+        """
+        outputs, usage = self.run_dataset(df, model=model, capacity=capacity)
+
+        flagged = {}
+        for sample_ix, response in outputs.items():
+            criteria = [key for key, value in response.items() if predicate(key, _score_of(value))]
+            if criteria:
+                flagged[sample_ix] = criteria
+        explain_count = sum(map(len, flagged.values()))
+        logger.info(f"Explaining {explain_count} criteria across {len(flagged)} of {len(outputs)} rows")
+
+        merged = {
+            sample_ix: {key: value if isinstance(value, dict) else {"score": value} for key, value in response.items()}
+            for sample_ix, response in outputs.items()
+        }
+        if not flagged:
+            return merged, usage
+
+        total_capacity = capacity or self.capacity.total_tokens
+        remaining = None if total_capacity is None else total_capacity - (usage.total_tokens or 0)
+        if remaining is not None and remaining <= 0:
+            logger.warning(f"Skipping explanations, capacity exhausted by scoring: {usage}")
+            return merged, usage
+
+        phase_two = self._copy(log_tag="explain")
+
+        def explain(sample):
+            prompt = explain_prep_fn(sample, rubric_keys=flagged[sample.Index])
+            # each explain prompt asks for its own criteria, so the response_schema of the scores does not apply
+            phase_two._require_prompt_schema(prompt, "the explain prompts of run_two_phase")
+            return prompt
+
+        phase_two.prep_fn = explain
+        flagged_rows = [sample for sample in iter_samples(df) if sample.Index in flagged]
+        explained, explained_usage = phase_two.run_dataset(flagged_rows, model=model, capacity=remaining)
+
+        for sample_ix, response in explained.items():
+            for key in flagged[sample_ix]:
+                if isinstance(response.get(key), dict):
+                    merged[sample_ix][key] = response[key]
+        return merged, usage + explained_usage
+
+    def _run_sample(self, sample, model: str, run_budget: Budget, outputs: dict) -> bool:
+        """Evaluates a single row into outputs, returning False if the budget refused the request."""
+        sample_ix = sample.Index
+
+        # Resolve prompt
+        prompt = self.prep_fn(sample)
+        self._record_metadata(sample_ix, prompt)
+
+        # a repeated prompt is answered from the earlier response, so reserves nothing
+        estimate = None if self._is_duplicate(prompt, model) else self.estimate_usage(prompt)
+        if not run_budget.admit(estimate):
+            logger.warning(f"Aborting run before {sample_ix}. Estimated {estimate} would exceed capacity.")
+            return False
+
+        try:
+            response, usage = self._complete(sample_ix, prompt, model)
+        except TimeoutError as exc:
+            # releases the reservation, charging any usage of the parts of a PromptSet that did complete
+            run_budget.charge(getattr(exc, "partial_usage", TokenUsage(0, 0, 0)), estimate)
+            logger.warning(f"{sample_ix}-Unfinished: {exc}")
+            self.unfinished.append(sample_ix)
+            return True
+        run_budget.charge(usage, estimate)
+
+        outputs[sample_ix] = response
+        logger.debug(f"{sample_ix}-Completed evaluation")
+        return True
+
+    def _run_packed(self, batch: list, model: str, run_budget: Budget, outputs: dict) -> bool:
+        """
+        Evaluates several rows with one packed request, retrying individually any case missing from the response.
+        Returns False if the budget refused a request.
+        """
+        first_ix = batch[0].Index
+        prompt = self.batch_prep_fn(batch)
+        self._require_prompt_schema(prompt, "a packed prompt")
+
+        estimate = None if self._is_duplicate(prompt, model) else self.estimate_usage(prompt)
+        if not run_budget.admit(estimate):
+            logger.warning(f"Aborting run before {first_ix}. Estimated {estimate} would exceed capacity.")
+            return False
+
+        try:
+            response, usage = self._complete(f"{first_ix}-packed", prompt, model)
+        except TimeoutError as exc:
+            run_budget.release(estimate)
+            logger.warning(f"{first_ix}-Unfinished packed request: {exc}")
+            self.unfinished.extend(sample.Index for sample in batch)
+            return True
+        run_budget.charge(usage, estimate)
+        self.packing_stats["packed_requests"] += 1
+
+        for sample, case_response in zip(batch, split_packed_response(response, len(batch))):
+            if case_response is not None:
+                self.packing_stats["packed_cases"] += 1
+                outputs[sample.Index] = case_response
+                continue
+
+            logger.info(f"{sample.Index}-Missing from the packed response, retrying on its own")
+            self.packing_stats["fallbacks"] += 1
+            if run_budget.exceeded or not self._run_sample(sample, model, run_budget, outputs):
+                return False
+
+        logger.debug(f"{first_ix}-Completed packed evaluation of {len(batch)} cases")
+        return True
+
+    def _iter_batches(self, samples) -> Iterator[list]:
+        """Groups rows for packed requests when a batch_prep_fn is set, otherwise yields rows one at a time."""
+        size = self.cases_per_request if self.batch_prep_fn is not None else 1
+        while batch := list(islice(samples, max(1, size))):
+            yield batch
+
+    def dry_run(
+        self,
+        df: Dataset,
+        capacity: int = None,
+        concurrency: int = 1,
+        prep_workers: int = 8,
+        seconds_per_request: float = 10.0,
+        completion_tokens: Optional[int] = None,
+        context_window: Optional[int] = None,
+        prompt_price: float = 0.0,
+        completion_price: float = 0.0,
+    ) -> tuple[pd.DataFrame, dict]:
+        """
+        Plans a run without calling the model, resolving every prompt and estimating its usage.
+
+        The prep_fn (or the batch_prep_fn for packed rows) is run on a thread pool and the prompts are measured
+        with the token_counter (the character heuristic when none is set); the completion_fn is never called and
+        no budget is drawn. Rows are read a bounded window at a time, so a lazy input is not read ahead of the
+        planning.
+
+        Parameters
+        ----------
+        df : pd.DataFrame | Iterable
+            The dataset that would be evaluated, as for run_dataset.
+        capacity : int, optional
+            The token capacity to plan against, by default None to use the capacity set in the class.
+        concurrency : int, optional
+            The number of requests assumed in flight at once for the wall time projection, by default 1
+        prep_workers : int, optional
+            The number of threads resolving prompts, by default 8
+        seconds_per_request : float, optional
+            The assumed latency of a single request for the wall time projection, by default 10.0
+        completion_tokens : int, optional
+            The expected completion tokens per request, by default None to use any max_tokens in model_args,
+            or the limit sized from the request's response schema.
+            Since max_tokens is an upper bound, a typical response size gives a closer cost projection.
+        context_window : int, optional
+            The model's context size in tokens, by default None
+            Rows whose prompt plus completion would exceed it are flagged as overflowing.
+        prompt_price : float, optional
+            The price per million prompt tokens, by default 0.0
+        completion_price : float, optional
+            The price per million completion tokens, by default 0.0
+
+        Returns
+        -------
+        tuple[pd.DataFrame, dict]
+            The per-row estimates, indexed by sample index, with prompt, completion, and total tokens, the
+            number of requests, and whether the row would overflow the context window; and a summary of the
+            totals, the rows that fit within capacity, the projected cost and wall time, and the overflowing
+            and largest rows.
+            Rows packed into one request share its tokens evenly, and the request is counted on the first row.
+            The rows within capacity are those run_dataset would reach, admitting each request as its budget
+            does: with a token_counter, a request whose estimate would overrun capacity is refused before it is
+            sent, otherwise the request crossing capacity still completes.
+        """
+        counter = self.token_counter or TokenCounter()
         max_usage = self.capacity if not capacity else TokenUsage(None, None, capacity)
 
-        for sample in df.itertuples():
-            sample_ix = sample.Index
+        def plan_request(batch):
+            prompt = self.prep_fn(batch[0]) if len(batch) == 1 else self.batch_prep_fn(batch)
+            parts = prompt if isinstance(prompt, PromptSet) else [prompt]
+            completions = [
+                completion_tokens if completion_tokens is not None else self._max_completion_tokens(part)
+                for part in parts
+            ]
+            usage = reduce(add, map(counter.estimate, parts, completions), TokenUsage(0, 0, 0))
+            # the largest context any one request needs, for the overflow check
+            context = max(map(lambda part, limit: counter.count_messages(part) + limit, parts, completions), default=0)
+            # the reservation run_dataset would make, None without a token_counter
+            return batch, usage, len(parts), context, self.estimate_usage(prompt)
+
+        rows = {}
+        within_capacity = 0
+        admitting = True
+        plan_budget = Budget(max_usage, name="dry_run")
+        if not is_empty(df):
+            workers = max(1, prep_workers)
+            batches = self._iter_batches(self._iter_samples(df))
+            with ThreadPoolExecutor(workers, thread_name_prefix="evaluation-plan") as executor:
+                while window := list(islice(batches, 2 * workers)):
+                    for batch, usage, requests, context, estimate in executor.map(plan_request, window):
+                        # as in run_dataset, the run stops at the first request its budget refuses
+                        admitting = admitting and plan_budget.admit(estimate, wait=False)
+                        if admitting:
+                            plan_budget.charge(usage, estimate)
+                            within_capacity += len(batch)
+
+                        overflow = context_window is not None and context > context_window
+                        shares = zip(
+                            _shares(usage.prompt_tokens, len(batch)), _shares(usage.completion_tokens, len(batch))
+                        )
+                        for position, (sample, (prompt_tokens, completion)) in enumerate(zip(batch, shares)):
+                            rows[sample.Index] = {
+                                "prompt_tokens": prompt_tokens,
+                                "completion_tokens": completion,
+                                "total_tokens": prompt_tokens + completion,
+                                "requests": requests if position == 0 else 0,
+                                "overflow": overflow,
+                            }
+
+        columns = ["prompt_tokens", "completion_tokens", "total_tokens", "requests", "overflow"]
+        estimates = pd.DataFrame.from_dict(rows, orient="index", columns=columns).astype(
+            {"prompt_tokens": int, "completion_tokens": int, "total_tokens": int, "requests": int, "overflow": bool}
+        )
+
+        total = TokenUsage(
+            int(estimates["prompt_tokens"].sum()),
+            int(estimates["completion_tokens"].sum()),
+            int(estimates["total_tokens"].sum()),
+        )
+        requests = int(estimates["requests"].sum())
+
+        summary = {
+            "rows": len(estimates),
+            "requests": requests,
+            "estimated_usage": total,
+            "capacity": max_usage,
+            "exceeds_capacity": total > max_usage,
+            "rows_within_capacity": within_capacity,
+            "projected_cost": (total.prompt_tokens * prompt_price + total.completion_tokens * completion_price) / 1e6,
+            "projected_seconds": -(-requests // max(1, concurrency)) * seconds_per_request,
+            "overflow_rows": estimates.index[estimates["overflow"]].tolist(),
+            "largest_rows": estimates["total_tokens"].nlargest(10).index.tolist(),
+        }
+        logger.info(
+            f"Dry run of {summary['rows']} rows: estimated {total}, {len(summary['overflow_rows'])} overflowing"
+        )
+        return estimates, summary
+
+    def _iter_samples(self, df: Dataset):
+        """Iterates the rows of the dataset, prefetching upcoming rows when the prep_fn supports it."""
+        rows = iter_samples(df)
+        depth = getattr(self.prep_fn, "read_ahead", None)
+        if not isinstance(depth, int) or depth <= 0:
+            return rows
+        return read_ahead(rows, self.prep_fn.prefetch, depth)
+
+    def _run_budget(self, max_usage: TokenUsage) -> Budget:
+        """Creates the transient budget level for a single run, beneath the shared budget if one is set."""
+        if self.budget is None:
+            return Budget(max_usage, name="run")
+        return Budget(max_usage, parent=self.budget, name="run")
+
+    def _record_metadata(self, sample_ix, prompt) -> None:
+        """Keeps any metadata the prep_fn attached to the prompt, ex. a PromptMessages packing report."""
+        if metadata := getattr(prompt, "metadata", None):
+            self.prompt_metadata[sample_ix] = metadata
+
+    def _complete(self, sample_ix, prompt: list[dict], model: str = None) -> tuple[dict, TokenUsage]:
+        """Sends a resolved prompt to the completion function and post-processes the response."""
+        if isinstance(prompt, PromptSet):
+            return self._complete_set(sample_ix, prompt, model)
+        if self._flight is not None:
+            return self._complete_once(sample_ix, prompt, model)
 
-            # Resolve prompt
-            prompt = self.prep_fn(sample)
+        return self._send(sample_ix, prompt, model)
 
-            # Delegate
-            raw_output = self.completion_fn(model=model, messages=prompt, **self._model_args)
+    def _send(self, sample_ix, prompt: list[dict], model: str = None) -> tuple[dict, TokenUsage]:
+        """Calls the completion function for a single prompt and post-processes the response."""
+        timeout = self._request_timeout()
+        schema = self._prompt_schema(prompt)
 
+        def request(completion_fn):
+            if self.stream:
+                abandon = threading.Event()
+
+                def abandoned(future: Future) -> None:
+                    abandon.set()
+                    self._abandon(future)
+
+                return call_with_timeout(
+                    lambda: self._stream(sample_ix, completion_fn, prompt, model, abandon, schema), timeout, abandoned
+                )
+            args = self._request_args(schema)
+            return call_with_timeout(
+                lambda: completion_fn(model=model, messages=prompt, **args), timeout, self._abandon
+            )
+
+        # Delegate
+        start = time.monotonic()
+        if self._hedger is None:
+            raw_output = request(self.completion_fn)
+        else:
+            # the losing response is only charged, so its usage is read without post-processing it
+            estimate = self.estimate_usage(prompt)
+            raw_output = self._hedger.call(
+                lambda: request(self.completion_fn),
+                lambda: request(self.hedge_completion_fn or self.completion_fn),
+                _usage_of,
+                reserve=None if estimate is None else estimate.total_tokens,
+            )
+        self._request_seconds.append(time.monotonic() - start)
+
+        if self._post_fn == self.post_process_default:
+            response, usage = self.post_process_default(sample_ix, raw_output, response_schema=schema)
+        else:
             response, usage = self._post_fn(sample_ix, raw_output)
-            accumulated_usage += TokenUsage(**usage)
+        return response, TokenUsage(**usage)
 
-            outputs[sample_ix] = response
-            logger.debug(f"{sample_ix}-Completed evaluation")
+    def _stream(
+        self,
+        sample_ix,
+        completion_fn: Callable,
+        prompt: list[dict],
+        model: str = None,
+        abandon: Optional[threading.Event] = None,
+        response_schema: Optional[dict] = None,
+    ) -> dict:
+        """
+        Streams a completion until its JSON object is complete, returning an OpenAI-style response.
+        The stream is closed early once abandon is set, ex. when the request times out.
+        """
+        start = time.monotonic()
+        args = dict(self._request_args(response_schema))
+        # providers only report the usage of a stream in its final chunk when asked
+        args.setdefault("stream_options", {"include_usage": True})
+        chunks = completion_fn(model=model, messages=prompt, stream=True, **args)
+        expected_keys = self.expected_keys
+        if expected_keys is None and response_schema is not None:
+            expected_keys = response_schema.get("required")
+        result = consume_stream(chunks, expected_keys, start, abandon=abandon)
 
-            # abort if beyond capacity
-            if accumulated_usage > max_usage:
-                logger.warning(f"Aborting run after {sample_ix}. Capacity exceeded: {accumulated_usage} > {max_usage}")
-                break
+        usage = result.usage
+        if usage is None:
+            # cancelled before the final chunk, which is where providers report usage
+            counter = self.token_counter or TokenCounter()
+            prompt_tokens, completion_tokens = counter.count_messages(prompt), counter.count(result.text)
+            usage = {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            }
 
-        if self.tmp_dir is not None:
-            logger.info(f"Dumped raw content to {tmp_dir}")
+        with self._stats_lock:
+            self.stream_stats[sample_ix] = {
+                "time_to_first_token": result.time_to_first_token,
+                "time_to_result": result.time_to_result,
+                "cancelled": result.cancelled,
+                "estimated_usage": result.usage is None,
+            }
+        return {"choices": [{"message": {"role": "assistant", "content": result.content}}], "usage": usage}
 
-        return outputs, accumulated_usage
+    def _time_left(self) -> Optional[float]:
+        """The seconds until the run's deadline, or None without a deadline."""
+        return None if self._deadline is None else self._deadline - time.monotonic()
+
+    def _time_for_request(self) -> bool:
+        """Returns True if a typical request of the run can complete before the deadline."""
+        time_left = self._time_left()
+        if time_left is None:
+            return True
+        typical = statistics.median(self._request_seconds) if self._request_seconds else 0.0
+        return time_left > typical
+
+    def _request_timeout(self) -> Optional[float]:
+        """The seconds to wait for a request: the request_timeout, cut short by any deadline."""
+        limits = [limit for limit in (self.request_timeout, self._time_left()) if limit is not None]
+        return max(0.0, min(limits)) if limits else None
+
+    def _start_hedging(self, max_usage: TokenUsage) -> None:
+        """Starts tracking latencies for a new run, capping hedging usage at a fraction of its capacity."""
+        self.hedge_stats = {}
+        self._hedger = None
+        if self.hedge_percentile is None:
+            return
+
+        cap = None if max_usage.total_tokens is None else int(max_usage.total_tokens * self.hedge_fraction)
+        self._hedger = Hedger(self.hedge_percentile, cap)
+        self.hedge_stats = self._hedger.stats
+
+    def _settle_hedges(self, budget: Budget, wait_all: bool = False) -> None:
+        """Charges the usage of completed losing hedged requests, and ends hedging for the run once wait_all."""
+        if self._hedger is None:
+            return
+
+        usage = self._hedger.settle(wait_all)
+        if usage.total_tokens:
+            budget.charge(usage)
+        if wait_all:
+            logger.info(
+                f"Hedged {self.hedge_stats['hedged']} of {self.hedge_stats['requests']} requests, "
+                f"{self.hedge_stats['hedge_wins']} won by the hedge, costing {self.hedge_stats['usage']}"
+            )
+            self._hedger = None
+
+    def _abandon(self, future: Future) -> None:
+        """Keeps a timed-out request that is still in flight, so that its usage can be charged once it completes."""
+        with self._stats_lock:
+            self._abandoned.append(future)
+
+    def _settle_abandoned(self, budget: Budget, final: bool = False) -> None:
+        """
+        Charges the usage of abandoned requests that have completed since the last call. Once final, those still
+        in flight are charged to the budget whenever they complete, as the run will not wait for them.
+        """
+        with self._stats_lock:
+            ready = [future for future in self._abandoned if final or future.done()]
+            self._abandoned = [future for future in self._abandoned if future not in ready]
+
+        def charge(future: Future) -> None:
+            if future.exception() is None:
+                budget.charge(_usage_of(future.result()))
+
+        pending = [future for future in ready if not future.done()]
+        if pending:
+            logger.warning(f"{len(pending)} abandoned requests are still in flight; charging them as they complete")
+        for future in ready:
+            # runs immediately for a completed request
+            future.add_done_callback(charge)
+
+    def _copy(self, log_tag: Optional[str] = None) -> "Evaluation":
+        """
+        Returns a shallow copy for a concurrent or nested run, with its own per-run state.
+
+        The default post-processing is rebound to the copy, so that its statistics are recorded on the copy rather
+        than the original. With a log_tag, raw responses are logged to a separate directory named with the tag.
+        """
+        clone = copy.copy(self)
+        if self._post_fn == self.post_process_default:
+            clone.post_fn = clone.post_process_default
+        if log_tag is not None:
+            clone._log_prefix = "_".join(filter(None, [self._log_prefix, log_tag]))
+            clone.tmp_dir = None
+
+        clone.prompt_metadata = {}
+        clone.packing_stats = {}
+        clone.choice_dispersion = {}
+        clone.hedge_stats = {}
+        clone.unfinished = []
+        clone.stop_reason = None
+        clone.stream_stats = {}
+        clone.schema_violations = {}
+        clone._stats_lock = threading.Lock()
+        clone._abandoned = []
+        clone._deadline = None
+        clone._request_seconds = deque(maxlen=50)
+        clone._start_dedup()
+        return clone
+
+    def _start_dedup(self) -> None:
+        """Resets the shared responses and savings for a new run."""
+        self._flight = SingleFlight() if self.deduplicate else None
+        self.dedup_stats = {"requests": 0, "unique": 0, "duplicates": 0, "saved_usage": TokenUsage(0, 0, 0)}
+
+    def _is_duplicate(self, prompt, model: str = None) -> bool:
+        """Returns True if an identical prompt has already been answered in this run."""
+        if self._flight is None or isinstance(prompt, PromptSet):
+            return False
+        return self._flight.done(prompt_key(prompt, model))
+
+    def _complete_once(self, sample_ix, prompt: list[dict], model: str = None) -> tuple[dict, TokenUsage]:
+        """Sends a prompt unless an identical one has been or is being sent, sharing its parsed response."""
+        (response, usage), shared = self._flight.do(
+            prompt_key(prompt, model), lambda: self._send(sample_ix, prompt, model)
+        )
+
+        with self._stats_lock:
+            self.dedup_stats["requests"] += 1
+            if shared:
+                self.dedup_stats["duplicates"] += 1
+                self.dedup_stats["saved_usage"] = self.dedup_stats["saved_usage"] + usage
+            else:
+                self.dedup_stats["unique"] += 1
+
+        if not shared:
+            return response, usage
+        logger.debug(f"{sample_ix}-Reused the response to an identical prompt")
+        # copied so that edits to one sample's output do not leak into another's
+        return copy.deepcopy(response), TokenUsage(0, 0, 0)
+
+    def _complete_set(self, sample_ix, prompt_set: PromptSet, model: str = None) -> tuple[dict, TokenUsage]:
+        """Sends each prompt of a set concurrently, reducing the parsed responses and summing their usage."""
+        if not prompt_set:
+            return {}, TokenUsage(0, 0, 0)
+        for prompt in prompt_set:
+            self._require_prompt_schema(prompt, "each prompt of a PromptSet")
+
+        workers = max(1, min(len(prompt_set), self.fanout_workers))
+        with ThreadPoolExecutor(workers, thread_name_prefix="evaluation-fanout") as executor:
+            futures = [
+                executor.submit(self._complete, f"{sample_ix}-{part_ix}", prompt, model)
+                for part_ix, prompt in enumerate(prompt_set)
+            ]
+        # the executor has waited for every part, so a timed out part leaves the others' results to collect
+        failed = next((future.exception() for future in futures if future.exception() is not None), None)
+        if isinstance(failed, TimeoutError):
+            completed = [future.result()[1] for future in futures if future.exception() is None]
+            # the parts that completed were billed, so their usage travels with the error to be charged
+            failed.partial_usage = reduce(add, completed, getattr(failed, "partial_usage", TokenUsage(0, 0, 0)))
+        results = [future.result() for future in futures]
+
+        responses = [response for response, _ in results]
+        usage = reduce(add, (usage for _, usage in results))
+        logger.debug(f"{sample_ix}-Reducing {len(responses)} responses")
+        return prompt_set.reduce_fn(responses), usage
+
+    def estimate_usage(self, prompt: list[dict]) -> Optional[TokenUsage]:
+        """
+        Estimates the usage of a resolved prompt with the token_counter, without calling the model.
+
+        Parameters
+        ----------
+        prompt : list[dict]
+            The message array returned by the prep_fn, or a PromptSet whose estimates are summed.
+
+        Returns
+        -------
+        Optional[TokenUsage]
+            The estimated usage, taking completion tokens from any max_tokens in model_args,
+            or None when no token_counter is set.
+        """
+        if self.token_counter is None:
+            return None
+        if isinstance(prompt, PromptSet):
+            estimates = (self.token_counter.estimate(part, self._max_completion_tokens(part)) for part in prompt)
+            return reduce(add, estimates, TokenUsage(0, 0, 0))
+        return self.token_counter.estimate(prompt, self._max_completion_tokens(prompt))
+
+    def _max_completion_tokens(self, prompt: Optional[list[dict]] = None) -> int:
+        """
+        The completion token limit set in model_args, else sized from the response schema of the prompt,
+        or of any prompt without one of its own; 0 for neither.
+        """
+        limit = self._model_args.get("max_completion_tokens") or self._model_args.get("max_tokens")
+        if limit:
+            return limit
+        schema = self._prompt_schema(prompt)
+        if schema is not None:
+            return schema_max_tokens(schema, counter=self.token_counter)
+        return 0
+
+    def _prompt_schema(self, prompt) -> Optional[dict]:
+        """
+        The response schema of a prompt: its own, from its metadata, else the response_schema.
+        None when no response_schema is set, as structured output is then off.
+        """
+        if self.response_schema is None:
+            return None
+        return (getattr(prompt, "metadata", None) or {}).get(SCHEMA_METADATA_KEY) or self.response_schema
+
+    def _require_prompt_schema(self, prompt, kind: str) -> None:
+        """Raises ValueError if structured output is on, but a prompt with a different response has no own schema."""
+        if self.response_schema is None or (getattr(prompt, "metadata", None) or {}).get(SCHEMA_METADATA_KEY):
+            return
+        raise ValueError(
+            f"The response_schema does not describe the response to {kind}; attach each prompt's own schema as "
+            f"'{SCHEMA_METADATA_KEY}' metadata, ex. with prep.with_response_schema"
+        )
+
+    def _request_args(self, response_schema: Optional[dict] = None) -> dict:
+        """
+        The kwargs for the completion function: the model_args, plus the format and limit of the request's
+        response schema, by default the response_schema.
+        """
+        schema = response_schema or self.response_schema
+        if schema is None:
+            return self._model_args
+
+        args = dict(self._model_args)
+        args.setdefault("response_format", response_format(schema))
+        if not (args.get("max_completion_tokens") or args.get("max_tokens")):
+            args["max_tokens"] = schema_max_tokens(schema, counter=self.token_counter)
+        return args
 
     def _dump_to_temp(self, sample_ix, raw_content) -> Optional[Path]:
         """
@@ -204,12 +1014,43 @@ class Evaluation:
             else:
                 f.write(str(raw_content))
 
-    def post_process_default(self, sample_ix, openai_json: dict) -> tuple[dict, TokenUsage]:
+    @staticmethod
+    def _parse_choice(sample_ix, choice: dict) -> dict:
+        """Parses the JSON object within a choice's message content, or an empty dict if it cannot be parsed."""
+        try:
+            raw_content = choice["message"]["content"]
+            return json.loads(raw_content[raw_content.find("{") : raw_content.rfind("}") + 1])  # noqa: E203
+        except Exception:
+            logger.info(f"Failed to parse {sample_ix} response content as JSON.")
+            return {}
+
+    def _parse_structured(self, sample_ix, choice: dict, schema: dict) -> dict:
+        """Parses a choice's content as exactly the schema, or an empty dict if it does not conform."""
+        try:
+            response = json.loads(choice["message"]["content"])
+        except Exception:
+            errors = ["$: content is not valid JSON"]
+        else:
+            errors = validate_response(response, schema)
+        if not errors:
+            return response
+
+        logger.info(f"{sample_ix} response does not conform to the response_schema: {errors[:3]}")
+        with self._stats_lock:
+            self.schema_violations.setdefault(sample_ix, []).extend(errors)
+        return {}
+
+    def post_process_default(
+        self, sample_ix, openai_json: dict, response_schema: Optional[dict] = None
+    ) -> tuple[dict, TokenUsage]:
         """
         The default post-processing function, assuming OpenAI responses of choices plus a usage node.
 
         This function will extract the first choice's message content and parse it as JSON.
         It will also extract the usage information from the response.
+        When the response has several choices, such as when requesting n > 1 completions, every choice is parsed
+        and the scores are aggregated with choice_aggregation; the per-criterion dispersion across the choices is
+        kept in choice_dispersion.
 
         Parameters
         ----------
@@ -217,15 +1058,16 @@ class Evaluation:
             The index of the sample being processed.
         openai_json : dict
             The JSON response from OpenAI containing choices and usage information.
+        response_schema : dict, optional
+            The schema of this response, by default None to use the response_schema, if any.
 
         Returns
         -------
         tuple[dict, dict]
             deserializes the response['choices'][0]['message']['content'] and returns it as a dict,
-            as well as the usage information from response['usage'].
+            or the aggregate of all choices, as well as the usage information from response['usage'].
         """
-        ix = 0  # assume N=1
-        try: #  Many providers have their own response objects, try to convert
+        try:  # Many providers have their own response objects, try to convert
             openai_json = openai_json.json()
         except AttributeError:
             pass
@@ -233,12 +1075,18 @@ class Evaluation:
         if isinstance(openai_json, str):
             openai_json = json.loads(openai_json)
 
-        try:
-            raw_content = openai_json["choices"][ix]["message"]["content"]
-            response = json.loads(raw_content[raw_content.find("{") : raw_content.rfind("}") + 1])  # noqa: E203
-        except Exception:
-            logger.info(f"Failed to parse {sample_ix} response content as JSON.")
-            response = {}
+        choices = openai_json.get("choices") or [{}]
+        schema = response_schema or self.response_schema
+        if schema is None:
+            responses = [self._parse_choice(sample_ix, choice) for choice in choices]
+        else:
+            responses = [self._parse_structured(sample_ix, choice, schema) for choice in choices]
+        if len(responses) == 1:
+            response = responses[0]
+        else:
+            # n > 1: self-consistency across the choices, billed for the prompt once
+            response, dispersion = aggregate_choices(responses, self.choice_aggregation)
+            self.choice_dispersion[sample_ix] = dispersion
 
         usage = openai_json.get("usage", {"completion_tokens": 0, "prompt_tokens": 0, "total_tokens": 0})
 
@@ -246,4 +1094,33 @@ class Evaluation:
         return response, usage
 
 
+def _usage_of(raw) -> TokenUsage:
+    """Reads the usage of a raw OpenAI-style response, or no usage if it has none, without post-processing it."""
+    try:  # provider response objects, as in post_process_default
+        raw = raw.json()
+    except AttributeError:
+        pass
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except ValueError:
+            return TokenUsage(0, 0, 0)
+
+    usage = raw.get("usage") if isinstance(raw, dict) else None
+    return TokenUsage(**usage) if usage else TokenUsage(0, 0, 0)
+
+
+def _shares(total: int, count: int) -> list[int]:
+    """Splits a token count evenly across count rows, giving any remainder to the first rows."""
+    base, extra = divmod(total or 0, count)
+    return [base + (ix < extra) for ix in range(count)]
+
+
+def _score_of(value):
+    """Returns the score of a criterion, whether given directly or nested as {"score": ...}."""
+    if isinstance(value, dict):
+        return value.get("score")
+    return value
+
+
 __all__ = ["Evaluation"]
@@ -0,0 +1,249 @@
+import json
+import logging
+import os
+import re
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Optional, Union
+
+import pandas as pd
+
+from evaluation_instruments._dataset import Dataset
+from evaluation_instruments._evaluation import Evaluation, _score_of
+from evaluation_instruments.model import TokenUsage
+
+logger = logging.getLogger("evaluation")
+
+RESULT_COLUMNS = ["instrument", "model", "sample", "criterion", "score", "explanation"]
+
+
+class Grid:
+    """
+    Runs every instrument against every model, as for a benchmark sweep, scheduling the cells concurrently.
+
+    Each (instrument, model) cell is one run_dataset call on a copy of the instrument's evaluation. Cells are
+    dispatched to a shared pool as soon as both a global slot and a slot for the cell's model are free, so a
+    slow or rate limited model does not hold up the others. Requests within a cell run as they do for the
+    evaluation alone, including any PromptSet fan-out and its budget.
+
+    When a checkpoint directory is given, each completed cell is written there, and cells that already have
+    a checkpoint are loaded rather than re-run, so an interrupted sweep can be resumed. A cell that raises is
+    logged and left without a checkpoint, so that it is retried on the next run; its error is kept in errors.
+    Likewise, a cell that stopped early at its capacity or deadline, or left rows unevaluated, is returned but
+    not checkpointed, and why is kept in incomplete.
+
+    Parameters
+    ----------
+    instruments : dict[str, tuple[Evaluation, pd.DataFrame | Iterable]]
+        The evaluation and dataset of each instrument, keyed by instrument name.
+        Each dataset is read once per model, so it must be re-iterable.
+    models : list[str]
+        The models to run every instrument against.
+    max_workers : int, optional
+        The maximum cells running at once, by default 4
+    max_per_model : int | dict[str, int], optional
+        The maximum cells running at once for any one model, or a limit per model, by default None (no limit
+        beyond max_workers). Models missing from a dict are not limited.
+    checkpoint_dir : str | Path, optional
+        The directory for per-cell checkpoints, by default None to not checkpoint.
+    """
+
+    def __init__(
+        self,
+        instruments: dict[str, tuple[Evaluation, Dataset]],
+        models: list[str],
+        max_workers: int = 4,
+        max_per_model: Union[None, int, dict[str, int]] = None,
+        checkpoint_dir: Union[None, str, Path] = None,
+    ):
+        if not instruments or not models:
+            raise ValueError("At least one instrument and one model are required")
+        if len(set(models)) < len(models):
+            raise ValueError(f"Models must be unique: {', '.join(models)}")
+        limits = max_per_model.values() if isinstance(max_per_model, dict) else [max_per_model]
+        if any(limit is not None and limit < 1 for limit in limits):
+            raise ValueError("Per-model limits must be at least 1")
+
+        self.instruments = instruments
+        self.models = models
+        self.max_workers = max(1, max_workers)
+        self.max_per_model = max_per_model
+        self.checkpoint_dir = Path(checkpoint_dir) if checkpoint_dir is not None else None
+        self.errors: dict[tuple[str, str], BaseException] = {}
+        self.incomplete: dict[tuple[str, str], str] = {}
+
+    def cells(self) -> list[tuple[str, str]]:
+        """Returns every (instrument, model) work item, in the order they are dispatched."""
+        return [(instrument, model) for instrument in self.instruments for model in self.models]
+
+    def run(self) -> tuple[pd.DataFrame, dict[tuple[str, str], TokenUsage]]:
+        """
+        Runs every cell of the grid, returning a long-format result table and the usage of each cell.
+
+        Returns
+        -------
+        tuple[pd.DataFrame, dict[tuple[str, str], TokenUsage]]
+            One row per instrument, model, sample, and criterion, with the criterion's score and, for nested
+            responses, its explanation; and the usage of each completed cell, keyed by (instrument, model).
+            Cells loaded from a checkpoint report the usage recorded when they were run.
+        """
+        self.errors = {}
+        self.incomplete = {}
+        results: dict[tuple[str, str], dict] = {}
+        usages: dict[tuple[str, str], TokenUsage] = {}
+
+        pending = []
+        for cell in self.cells():
+            checkpoint = self._load_checkpoint(cell)
+            if checkpoint is None:
+                pending.append(cell)
+            else:
+                results[cell], usages[cell] = checkpoint
+                logger.info(f"Loaded {cell[0]} x {cell[1]} from checkpoint")
+
+        running: dict[Future, tuple[str, str]] = {}
+        with ThreadPoolExecutor(self.max_workers, thread_name_prefix="evaluation-grid") as executor:
+            while pending or running:
+                for cell in self._ready(pending, running.values()):
+                    pending.remove(cell)
+                    running[executor.submit(self._run_cell, cell)] = cell
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    cell = running.pop(future)
+                    if (error := future.exception()) is not None:
+                        logger.error(f"Failed {cell[0]} x {cell[1]}: {error!r}")
+                        self.errors[cell] = error
+                        continue
+                    results[cell], usages[cell] = future.result()
+
+        # report cells in grid order, regardless of completion order
+        ordered = [cell for cell in self.cells() if cell in results]
+        return result_frame({cell: results[cell] for cell in ordered}), {cell: usages[cell] for cell in ordered}
+
+    def _ready(self, pending: list, running) -> list[tuple[str, str]]:
+        """Returns the pending cells that can start now, within the global and per-model limits."""
+        in_flight = list(running)
+        ready = []
+        for cell in pending:
+            if len(in_flight) >= self.max_workers:
+                break
+            limit = self._model_limit(cell[1])
+            if limit is not None and sum(model == cell[1] for _, model in in_flight) >= limit:
+                continue
+            in_flight.append(cell)
+            ready.append(cell)
+        return ready
+
+    def _model_limit(self, model: str) -> Optional[int]:
+        if isinstance(self.max_per_model, dict):
+            return self.max_per_model.get(model)
+        return self.max_per_model
+
+    def _run_cell(self, cell: tuple[str, str]) -> tuple[dict, TokenUsage]:
+        instrument, model = cell
+        evaluation, df = self.instruments[instrument]
+        # each cell runs on its own copy, as run_dataset keeps per-run state on the evaluation, and logs to its own
+        # directory, as instruments without a log prefix would otherwise write the same files for a model
+        cell_evaluation = evaluation._copy(log_tag=_cell_name(cell))
+        outputs, usage = cell_evaluation.run_dataset(df, model=model)
+
+        # a cell that stopped early or left rows unevaluated is not checkpointed, so a re-run runs it again
+        if cell_evaluation.stop_reason is not None or cell_evaluation.unfinished:
+            self.incomplete[cell] = cell_evaluation.stop_reason or "unfinished"
+            logger.warning(
+                f"Incomplete {instrument} x {model} ({self.incomplete[cell]}): {len(outputs)} rows, "
+                f"{len(cell_evaluation.unfinished)} unfinished, {usage}"
+            )
+            return outputs, usage
+
+        logger.info(f"Completed {instrument} x {model}: {len(outputs)} rows, {usage}")
+        self._write_checkpoint(cell, outputs, usage)
+        return outputs, usage
+
+    def _checkpoint_path(self, cell: tuple[str, str]) -> Optional[Path]:
+        if self.checkpoint_dir is None:
+            return None
+        return self.checkpoint_dir / f"{_cell_name(cell)}.json"
+
+    def _load_checkpoint(self, cell: tuple[str, str]) -> Optional[tuple[dict, TokenUsage]]:
+        path = self._checkpoint_path(cell)
+        if path is None or not path.exists():
+            return None
+
+        with open(path, "r", encoding="utf-8") as f:
+            checkpoint = json.load(f)
+        # rows are stored as pairs so non-string sample indices survive the round trip
+        outputs = {_as_index(sample_ix): response for sample_ix, response in checkpoint["outputs"]}
+        return outputs, TokenUsage(**checkpoint["usage"])
+
+    def _write_checkpoint(self, cell: tuple[str, str], outputs: dict, usage: TokenUsage) -> None:
+        path = self._checkpoint_path(cell)
+        if path is None:
+            return
+
+        checkpoint = {
+            "instrument": cell[0],
+            "model": cell[1],
+            "outputs": [[sample_ix, response] for sample_ix, response in outputs.items()],
+            "usage": {
+                "prompt_tokens": usage.prompt_tokens,
+                "completion_tokens": usage.completion_tokens,
+                "total_tokens": usage.total_tokens,
+                "cached_tokens": usage.cached_tokens,
+            },
+        }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # write then rename, so an interrupted write never leaves a partial checkpoint
+        partial = path.with_suffix(".json.partial")
+        with open(partial, "w", encoding="utf-8") as f:
+            json.dump(checkpoint, f, default=_to_json)
+        os.replace(partial, path)
+
+
+def result_frame(results: dict[tuple[str, str], dict]) -> pd.DataFrame:
+    """
+    Converts the outputs of several (instrument, model) cells into a long-format table.
+
+    Parameters
+    ----------
+    results : dict[tuple[str, str], dict]
+        The outputs of each cell, as from run_dataset, keyed by (instrument, model).
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per instrument, model, sample, and criterion, with columns instrument, model, sample, criterion,
+        score, and explanation. Explanation is None for criteria that are not nested.
+    """
+    rows = [
+        (instrument, model, sample_ix, criterion, _score_of(value), _explanation_of(value))
+        for (instrument, model), outputs in results.items()
+        for sample_ix, response in outputs.items()
+        for criterion, value in (response or {}).items()
+    ]
+    return pd.DataFrame(rows, columns=RESULT_COLUMNS)
+
+
+def _cell_name(cell: tuple[str, str]) -> str:
+    """Returns a file name for an (instrument, model) cell, as model names may contain path separators."""
+    return "__".join(re.sub(r"[^\w.-]+", "_", part) for part in cell)
+
+
+def _explanation_of(value):
+    if isinstance(value, dict):
+        return value.get("explanation")
+    return None
+
+
+def _to_json(value):
+    """Converts numpy scalars, such as sample indices, to Python values, and anything else to str."""
+    return value.item() if hasattr(value, "item") else str(value)
+
+
+def _as_index(sample_ix):
+    """Restores a sample index read from JSON, where tuples, such as from a MultiIndex, become lists."""
+    return tuple(sample_ix) if isinstance(sample_ix, list) else sample_ix
+
+
+__all__ = ["Grid", "result_frame"]
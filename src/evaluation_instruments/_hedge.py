@@ -0,0 +1,194 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures import wait
+from functools import reduce
+from operator import add
+from typing import Any, Callable, Optional
+
+from evaluation_instruments.model import TokenUsage
+
+logger = logging.getLogger("evaluation")
+
+MIN_SAMPLES = 10  # completed requests observed before any request is hedged
+WINDOW = 200  # the most recent latencies the percentile is computed over
+
+
+class Hedger:
+    """
+    Sends a duplicate of any request still outstanding after a latency percentile, keeping the first response.
+
+    The threshold is the given percentile of recently observed request latencies, so only the slowest
+    requests are hedged; no request is hedged until MIN_SAMPLES latencies have been observed. The losing
+    request cannot be cancelled once sent, so it is left to finish in the background and its usage is
+    collected by settle(). That usage is the cost of hedging, and once it reaches the cap no further
+    requests are hedged. Until a losing request is settled, the tokens reserved for it when it was sent
+    count against the cap, so requests in flight cannot overshoot it.
+
+    Each request runs on its own daemon thread, so slow losing requests never hold up later requests or hedges.
+
+    Parameters
+    ----------
+    percentile : float
+        The latency percentile, from 0 to 100, after which a request is hedged.
+    cap : int, optional
+        The total tokens the losing requests may use before hedging stops, by default None (no cap).
+    clock : callable, optional
+        A monotonic clock returning seconds, by default time.monotonic. Primarily for testing.
+    """
+
+    def __init__(
+        self,
+        percentile: float,
+        cap: Optional[int] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.percentile = percentile
+        self.cap = cap
+        self.stats = {"requests": 0, "hedged": 0, "hedge_wins": 0, "usage": TokenUsage(0, 0, 0)}
+
+        self._latencies: deque = deque(maxlen=WINDOW)
+        self._losers: list[tuple[Future, Callable[[Any], TokenUsage], int]] = []
+        self._reserved = 0  # tokens held for hedges and losing requests not yet settled
+        self._settled = 0  # losing requests settled, for the typical cost of a hedge
+        self._lock = threading.Lock()
+        self._clock = clock
+
+    def threshold(self) -> Optional[float]:
+        """The seconds after which a request is hedged, or None until enough latencies are observed."""
+        with self._lock:
+            if len(self._latencies) < MIN_SAMPLES:
+                return None
+            latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * self.percentile / 100))]
+
+    def call(
+        self,
+        send: Callable[[], Any],
+        send_hedge: Callable[[], Any],
+        usage_of: Callable[[Any], TokenUsage],
+        reserve: Optional[int] = None,
+    ):
+        """
+        Sends a request, hedging it if it is still outstanding after the threshold.
+
+        Parameters
+        ----------
+        send : Callable[[], Any]
+            Sends the request, returning the raw response.
+        send_hedge : Callable[[], Any]
+            Sends the duplicate request, to the same or an alternate backend.
+        usage_of : Callable[[Any], TokenUsage]
+            Returns the usage of a raw response, used to charge the losing request once it completes.
+        reserve : int, optional
+            The estimated total tokens of the request, held against the cap while its losing request is
+            in flight, by default None to hold the average usage of the losing requests settled so far.
+
+        Returns
+        -------
+        Any
+            The raw response of whichever request completed first.
+        """
+        with self._lock:
+            self.stats["requests"] += 1
+        primary = self._start(send)
+
+        threshold = self.threshold()
+        if threshold is None or not self._can_hedge():
+            return primary.result()
+        try:
+            return primary.result(timeout=threshold)
+        except FutureTimeout:
+            pass
+        reserved = self._reserve(reserve)
+        if reserved is None:
+            return primary.result()
+
+        logger.debug(f"Hedging a request outstanding after {threshold:.2f}s")
+        hedge = self._start(send_hedge)
+        with self._lock:
+            self.stats["hedged"] += 1
+
+        done, _ = wait([primary, hedge], return_when=FIRST_COMPLETED)
+        # prefer the primary when both are done, and fall back to the other if the first to finish failed
+        winner, loser = (primary, hedge) if primary in done else (hedge, primary)
+        if winner.exception() is not None:
+            winner, loser = loser, None
+
+        with self._lock:
+            if winner is hedge:
+                self.stats["hedge_wins"] += 1
+            if loser is not None:
+                self._losers.append((loser, usage_of, reserved))
+            else:
+                self._reserved -= reserved
+        return winner.result()
+
+    def settle(self, wait_all: bool = False) -> TokenUsage:
+        """
+        Collects the usage of losing requests that have completed since the last call.
+
+        Parameters
+        ----------
+        wait_all : bool, optional
+            Whether to wait for every losing request still in flight, by default False
+
+        Returns
+        -------
+        TokenUsage
+            The usage of the newly completed losing requests, which is also added to stats.
+        """
+        with self._lock:
+            ready = [loser for loser in self._losers if wait_all or loser[0].done()]
+            self._losers = [loser for loser in self._losers if loser not in ready]
+
+        usages = [TokenUsage(0, 0, 0)]
+        for future, usage_of, _ in ready:
+            if future.exception() is not None:
+                logger.debug(f"Discarded hedged request failed: {future.exception()!r}")
+                continue
+            usages.append(usage_of(future.result()))
+
+        usage = reduce(add, usages)
+        with self._lock:
+            self.stats["usage"] = self.stats["usage"] + usage
+            self._reserved -= sum(reserved for _, _, reserved in ready)
+            self._settled += len(ready)
+        return usage
+
+    def _can_hedge(self) -> bool:
+        with self._lock:
+            return self.cap is None or (self.stats["usage"].total_tokens or 0) + self._reserved < self.cap
+
+    def _reserve(self, reserve: Optional[int]) -> Optional[int]:
+        """Holds tokens for a hedge against the cap, returning the tokens held, or None if the cap is reached."""
+        with self._lock:
+            used = self.stats["usage"].total_tokens or 0
+            if reserve is None:
+                reserve = used // self._settled if self._settled else 0
+            if self.cap is not None and used + self._reserved + reserve >= self.cap:
+                return None
+            self._reserved += reserve
+            return reserve
+
+    def _start(self, send: Callable[[], Any]) -> Future:
+        """Sends a request on its own daemon thread, recording its latency once it completes."""
+        future = Future()
+
+        def target():
+            future.set_running_or_notify_cancel()
+            start = self._clock()
+            try:
+                result = send()
+            except BaseException as exc:
+                future.set_exception(exc)
+                return
+            with self._lock:
+                self._latencies.append(self._clock() - start)
+            future.set_result(result)
+
+        threading.Thread(target=target, name="evaluation-hedge", daemon=True).start()
+        return future
@@ -0,0 +1,253 @@
+import logging
+import threading
+import time
+from typing import Callable, Optional, Union
+
+logger = logging.getLogger("evaluation")
+
+STRATEGIES = ("least_outstanding", "latency")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class _Backend:
+    """The routing state of one completion backend."""
+
+    def __init__(self, name: str, completion_fn: Callable, weight: float):
+        self.name = name
+        self.completion_fn = completion_fn
+        self.weight = weight
+
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.latency: Optional[float] = None  # exponentially weighted, successful requests only
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+
+
+class Router:
+    """
+    A completion function that spreads requests across several equivalent backends, failing over between them.
+
+    Use a Router as the completion_fn of an Evaluation when the same model is deployed behind several
+    endpoints, such as regions or accounts. Each request goes to the healthy backend with the lowest load
+    relative to its weight, and a request that raises is retried on the next best backend until one succeeds
+    or every backend has been tried.
+
+    Each backend has a circuit breaker: after failure_threshold consecutive failures it is ejected for
+    cooldown seconds, then a single trial request is let through and the backend is restored if it succeeds.
+    When every backend is ejected, the one ejected longest ago is tried anyway rather than failing the request;
+    such a fallback request does not restart its cooldown if it fails. A request that has failed on every
+    healthy backend fails rather than falling back to an ejected one.
+
+    Parameters
+    ----------
+    backends : dict[str, Callable]
+        The completion function of each backend, keyed by a name used in logs and reports. Each is called
+        with the same arguments as the Router, ex. model= and messages=.
+    weights : dict[str, float], optional
+        The relative share of requests for each backend, by default None for equal weights.
+        Backends missing from the dict have a weight of 1.
+    strategy : str, optional
+        How to pick a backend, by default "least_outstanding"
+        - "least_outstanding": the fewest in-flight requests per weight, then the fewest requests per weight,
+          so that sequential requests are spread in proportion to the weights
+        - "latency": the lowest average latency of recent successful requests per weight; backends with no
+          successful requests yet are tried first
+    failure_threshold : int, optional
+        The consecutive failures that eject a backend, by default 3
+    cooldown : float, optional
+        The seconds an ejected backend waits before a trial request, by default 30.0
+    retry_on : type | tuple[type, ...], optional
+        The exceptions that fail a request over to another backend, by default Exception.
+        Other exceptions are raised immediately without counting against the backend.
+    latency_smoothing : float, optional
+        The weight of the newest latency in the moving average, by default 0.3
+    clock : callable, optional
+        A monotonic clock returning seconds, by default time.monotonic. Primarily for testing.
+    """
+
+    def __init__(
+        self,
+        backends: dict[str, Callable],
+        weights: Optional[dict[str, float]] = None,
+        strategy: str = "least_outstanding",
+        failure_threshold: int = 3,
+        cooldown: float = 30.0,
+        retry_on: Union[type, tuple[type, ...]] = Exception,
+        latency_smoothing: float = 0.3,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if not backends:
+            raise ValueError("At least one backend is required")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy '{strategy}'; expected one of {', '.join(STRATEGIES)}")
+        weights = weights or {}
+        if any(weight <= 0 for weight in weights.values()):
+            raise ValueError("Backend weights must be positive")
+
+        self.backends = {
+            name: _Backend(name, completion_fn, weights.get(name, 1.0)) for name, completion_fn in backends.items()
+        }
+        self.strategy = strategy
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.retry_on = retry_on
+        self.latency_smoothing = latency_smoothing
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def __call__(self, **kwargs):
+        """
+        Sends a completion request to the best available backend, failing over to others on error.
+
+        Parameters
+        ----------
+        **kwargs
+            The arguments for the completion function, ex. model= and messages=.
+
+        Returns
+        -------
+        Any
+            The response of the first backend to succeed.
+        """
+        tried = set()
+        last_error = None
+        while True:
+            backend, fallback = self._acquire(tried)
+            if backend is None and last_error is None:
+                raise RuntimeError("No completion backend is available: every backend is awaiting a trial request")
+            if backend is None:
+                raise last_error
+
+            start = self._clock()
+            try:
+                response = backend.completion_fn(**kwargs)
+            except self.retry_on as exc:
+                self._record_failure(backend, exc, fallback)
+                tried.add(backend.name)
+                last_error = exc
+                continue
+            except BaseException:
+                self._release(backend)
+                raise
+
+            self._record_success(backend, self._clock() - start)
+            return response
+
+    def report(self) -> dict:
+        """
+        Summarizes the state of each backend.
+
+        Returns
+        -------
+        dict
+            A mapping of backend name to its state (closed, open, or half_open), weight, requests, failures,
+            outstanding requests, and average latency in seconds.
+        """
+        with self._lock:
+            return {
+                name: {
+                    "state": self._state(backend),
+                    "weight": backend.weight,
+                    "requests": backend.requests,
+                    "failures": backend.failures,
+                    "outstanding": backend.outstanding,
+                    "latency": backend.latency,
+                }
+                for name, backend in self.backends.items()
+            }
+
+    def _state(self, backend: _Backend) -> str:
+        """Returns the breaker state, letting an open breaker through for a trial once its cooldown passes."""
+        if backend.state == OPEN and self._clock() - backend.opened_at >= self.cooldown:
+            return HALF_OPEN
+        return backend.state
+
+    def _acquire(self, tried: set) -> tuple[Optional[_Backend], bool]:
+        """
+        Picks the best untried backend and marks a request outstanding on it, returning it and whether it is
+        a fallback to an ejected backend. The backend is None if every healthy backend was tried.
+        """
+        with self._lock:
+            untried = [backend for backend in self.backends.values() if backend.name not in tried]
+            if not untried:
+                return None, False
+
+            # a half-open backend only takes one trial request at a time
+            available = [
+                backend
+                for backend in untried
+                if self._state(backend) == CLOSED or (self._state(backend) == HALF_OPEN and not backend.outstanding)
+            ]
+            fallback = not available
+            if available:
+                backend = min(available, key=self._load)
+            elif any(self._state(backend) == CLOSED for backend in self.backends.values()):
+                # the healthy backends already failed this request; ejected ones are left to cool down
+                return None, False
+            else:
+                # every backend is ejected; rather than failing outright, try the one ejected longest ago, leaving
+                # any backend with a trial in flight to its trial
+                ejected = [
+                    backend for backend in untried if not (self._state(backend) == HALF_OPEN and backend.outstanding)
+                ]
+                if not ejected:
+                    return None, False
+                backend = min(ejected, key=lambda backend: backend.opened_at or 0.0)
+                logger.warning(f"No healthy completion backends; trying {backend.name}")
+
+            if self._state(backend) == HALF_OPEN:
+                backend.state = HALF_OPEN
+                logger.info(f"Sending trial request to completion backend {backend.name}")
+            backend.outstanding += 1
+            backend.requests += 1
+            return backend, fallback
+
+    def _load(self, backend: _Backend) -> tuple:
+        share = backend.requests / backend.weight
+        if self.strategy == "latency":
+            return ((backend.latency or 0.0) / backend.weight, share)
+        return (backend.outstanding / backend.weight, share)
+
+    def _release(self, backend: _Backend) -> None:
+        with self._lock:
+            backend.outstanding -= 1
+
+    def _record_success(self, backend: _Backend, seconds: float) -> None:
+        with self._lock:
+            backend.outstanding -= 1
+            backend.consecutive_failures = 0
+            if backend.state != CLOSED:
+                logger.info(f"Restoring completion backend {backend.name}")
+            backend.state = CLOSED
+            backend.opened_at = None
+
+            if backend.latency is None:
+                backend.latency = seconds
+            else:
+                backend.latency += self.latency_smoothing * (seconds - backend.latency)
+
+    def _record_failure(self, backend: _Backend, error: BaseException, fallback: bool = False) -> None:
+        with self._lock:
+            backend.outstanding -= 1
+            backend.failures += 1
+            backend.consecutive_failures += 1
+
+            # a failed trial re-opens the breaker immediately, while a failed fallback leaves its cooldown running
+            if not fallback and (backend.state != CLOSED or backend.consecutive_failures >= self.failure_threshold):
+                if backend.state == CLOSED:
+                    logger.warning(
+                        f"Ejecting completion backend {backend.name} after {backend.consecutive_failures} failures"
+                    )
+                backend.state = OPEN
+                backend.opened_at = self._clock()
+            logger.info(f"Completion backend {backend.name} failed: {error!r}; failing over")
+
+
+__all__ = ["Router"]
@@ -0,0 +1,240 @@
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Optional
+
+logger = logging.getLogger("evaluation")
+
+
+class JsonObjectDetector:
+    """
+    Finds the first complete top-level JSON object in text that arrives in pieces, such as a streamed response.
+
+    Text is scanned once as it is fed, tracking brace depth outside of JSON strings. Whenever a top-level
+    object closes it is parsed, and accepted if it is a dict holding every expected key; otherwise scanning
+    continues, so braces in preceding reasoning, or an example object missing keys, are skipped over. A brace
+    that cannot open a JSON object, as it is not followed by a key or a closing brace, is treated as prose, so
+    that a stray '{' before the response does not hide the object after it.
+
+    Parameters
+    ----------
+    expected_keys : Iterable[str], optional
+        The keys the object must contain, ex. the rubric criteria, by default None to accept any object.
+    """
+
+    def __init__(self, expected_keys: Optional[Iterable[str]] = None):
+        self.expected_keys = set(expected_keys or ())
+        self.result: Optional[dict] = None
+        self.span: Optional[tuple[int, int]] = None
+
+        # the pieces are kept rather than concatenated as they arrive, which would copy the text on every piece
+        self._chunks: list[str] = []
+        self._chunk_starts: list[int] = []
+        self._pos = 0
+        self._depth = 0
+        self._start = 0
+        self._opening = False
+        self._in_string = False
+        self._escape = False
+
+    @property
+    def text(self) -> str:
+        """All text fed so far."""
+        if len(self._chunks) > 1:
+            self._chunks, self._chunk_starts = ["".join(self._chunks)], [0]
+        return self._chunks[0] if self._chunks else ""
+
+    def feed(self, text: str) -> Optional[dict]:
+        """
+        Adds the next piece of text, returning the object once a complete one has been received.
+
+        Parameters
+        ----------
+        text : str
+            The next piece of the text.
+
+        Returns
+        -------
+        Optional[dict]
+            The first accepted object, or None if none has been completed yet.
+        """
+        if self.result is not None:
+            return self.result
+        if not text:
+            return None
+
+        self._chunk_starts.append(self._pos)
+        self._chunks.append(text)
+        for char in text:
+            self._pos += 1
+
+            if self._opening:
+                if char.isspace():
+                    continue
+                self._opening = False
+                if char not in '"}':
+                    # not an object, ex. a brace in the reasoning; the character may open the next candidate
+                    self._depth = 0
+
+            if not self._depth:
+                if char == "{":
+                    self._start, self._depth, self._opening = self._pos - 1, 1, True
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if not self._depth and self._accept(self._start, self._pos):
+                    return self.result
+        return None
+
+    def _slice(self, start: int, end: int) -> str:
+        """Returns the fed text from start to end, joining only the pieces that hold it."""
+        first = bisect_right(self._chunk_starts, start) - 1
+        last = bisect_left(self._chunk_starts, end)
+        offset = self._chunk_starts[first]
+        return "".join(self._chunks[first:last])[start - offset : end - offset]  # noqa: E203
+
+    def _accept(self, start: int, end: int) -> bool:
+        try:
+            candidate = json.loads(self._slice(start, end))
+        except ValueError:
+            return False
+        if not isinstance(candidate, dict) or not self.expected_keys <= candidate.keys():
+            return False
+
+        self.result, self.span = candidate, (start, end)
+        return True
+
+
+@dataclass
+class StreamResult:
+    """
+    The outcome of consuming a streamed completion.
+
+    Attributes
+    ----------
+    text : str
+        All content received, including any after the JSON object in the same chunk.
+    content : str
+        The JSON object's text when one was found, otherwise all content received.
+    usage : Optional[dict]
+        The usage reported by the stream, or None if the stream was cancelled before reporting it.
+    time_to_first_token : Optional[float]
+        The seconds from the request to the first content, or None if no content was received.
+    time_to_result : float
+        The seconds from the request to the complete JSON object, or to the end of the stream.
+    cancelled : bool
+        Whether the stream was closed early, once the JSON object was complete.
+    abandoned : bool
+        Whether the stream was closed early because its request was abandoned, ex. on a timeout.
+    """
+
+    text: str
+    content: str
+    usage: Optional[dict]
+    time_to_first_token: Optional[float]
+    time_to_result: float
+    cancelled: bool
+    abandoned: bool = False
+
+
+def consume_stream(
+    chunks: Iterable,
+    expected_keys: Optional[Iterable[str]] = None,
+    start: Optional[float] = None,
+    clock: Callable[[], float] = time.monotonic,
+    abandon: Optional[threading.Event] = None,
+) -> StreamResult:
+    """
+    Reads a streamed completion until its JSON object is complete, then closes the stream.
+
+    The stream is also closed, at the next chunk received, once the abandon event is set, such as when the
+    request has timed out, so that an abandoned request stops generating.
+
+    Parameters
+    ----------
+    chunks : Iterable
+        The stream returned by a completion function called with stream=True, yielding OpenAI-style chunks
+        as dicts or provider objects, each with choices[0].delta.content.
+    expected_keys : Iterable[str], optional
+        The keys the JSON object must contain before the stream is cancelled, by default None for any object.
+    start : float, optional
+        The clock time the request was sent, by default None to time from this call.
+    clock : callable, optional
+        A monotonic clock returning seconds, by default time.monotonic. Primarily for testing.
+    abandon : threading.Event, optional
+        Set when the request is abandoned, by default None
+
+    Returns
+    -------
+    StreamResult
+        The content received, any usage the stream reported, and the time to the first token and to the result.
+    """
+    start = clock() if start is None else start
+    detector = JsonObjectDetector(expected_keys)
+    first_token = None
+    usage = None
+    cancelled = abandoned = False
+
+    iterator = iter(chunks)
+    for chunk in iterator:
+        if abandon is not None and abandon.is_set():
+            abandoned = True
+            break
+        usage = _field(chunk, "usage") or usage
+        text = _chunk_text(chunk)
+        if not text:
+            continue
+        if first_token is None:
+            first_token = clock() - start
+
+        if detector.feed(text) is not None:
+            cancelled = True
+            break
+    done = clock() - start
+
+    if cancelled or abandoned:
+        # stop generating: closing the stream ends the underlying response where the client supports it
+        for stream in (iterator, chunks):
+            if callable(close := getattr(stream, "close", None)):
+                close()
+        reason = "its request was abandoned" if abandoned else "its JSON object was complete"
+        logger.debug(f"Cancelled stream after {done:.2f}s, once {reason}")
+
+    content = detector.text if detector.span is None else detector.text[slice(*detector.span)]
+    return StreamResult(detector.text, content, _as_dict(usage), first_token, done, cancelled, abandoned)
+
+
+def _field(obj: Any, name: str):
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+
+def _chunk_text(chunk) -> str:
+    """Returns the content of a chunk's first choice delta, or an empty string."""
+    choices = _field(chunk, "choices") or []
+    if not choices:
+        return ""
+    return _field(_field(choices[0], "delta") or {}, "content") or ""
+
+
+def _as_dict(usage) -> Optional[dict]:
+    if usage is None or isinstance(usage, dict):
+        return usage
+    for method in ("model_dump", "dict"):
+        if callable(convert := getattr(usage, method, None)):
+            return convert()
+    return {key: getattr(usage, key, 0) for key in ("prompt_tokens", "completion_tokens", "total_tokens")}
@@ -0,0 +1,58 @@
+import threading
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Callable, Optional
+
+
+def call_with_timeout(
+    fn: Callable[[], Any], timeout: Optional[float], on_abandon: Optional[Callable[[Future], None]] = None
+) -> Any:
+    """
+    Calls fn, giving up on it after timeout seconds even if fn does not support a timeout itself.
+
+    The call runs on a daemon thread that is abandoned on timeout, so a hung call neither blocks the caller
+    nor prevents the interpreter from exiting. Any result it eventually produces is discarded, unless
+    on_abandon keeps the call's future to collect it, ex. to charge the usage of a request that is still billed.
+
+    Parameters
+    ----------
+    fn : Callable[[], Any]
+        The call to make, with no arguments.
+    timeout : float, optional
+        The seconds to wait for fn, by default None to call fn directly and wait indefinitely.
+    on_abandon : Callable[[Future], None], optional
+        Called with the future of the call when it is abandoned, by default None
+
+    Returns
+    -------
+    Any
+        The result of fn.
+
+    Raises
+    ------
+    TimeoutError
+        If fn has not returned within timeout seconds.
+    """
+    if timeout is None:
+        return fn()
+
+    future = Future()
+
+    def target():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn())
+        except BaseException as exc:
+            future.set_exception(exc)
+
+    threading.Thread(target=target, name="evaluation-request", daemon=True).start()
+    try:
+        return future.result(timeout=max(0.0, timeout))
+    except FutureTimeout:
+        if future.done():
+            # fn itself raised a TimeoutError
+            raise
+        if not future.cancel() and on_abandon is not None:
+            on_abandon(future)
+        raise TimeoutError(f"Request did not complete within {timeout:.1f}s") from None
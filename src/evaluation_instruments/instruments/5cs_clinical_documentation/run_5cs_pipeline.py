@@ -297,14 +297,24 @@ Clincal Note:
 {prompt_note}
 """
 
-from typing import List, Dict
-import evaluation_instruments as ev
 import logging
+from typing import Dict, List
+
 import pandas as pd
 
+import evaluation_instruments as ev
+from evaluation_instruments import prep
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("evaluation")
 
+# Parsed once, so notes are substituted without re-parsing the prompt per row
+COMPLETE_TEMPLATE = prep.PromptTemplate(COMPLETE_PROMPT)
+CLINICAL_ASSESSMENT_REASONING_TEMPLATE = prep.PromptTemplate(CLINICAL_ASSESSMENT_REASONING_PROMPT)
+CONTINGENT_TEMPLATE = prep.PromptTemplate(CONTINGENT_PROMPT)
+CONCISE_TEMPLATE = prep.PromptTemplate(CONCISE_PROMPT)
+CORRECT_TEMPLATE = prep.PromptTemplate(CORRECT_PROMPT)
+
 
 def create_complete_prompt(note: str) -> List[Dict]:
     """
@@ -317,7 +327,7 @@ def create_complete_prompt(note: str) -> List[Dict]:
         List[Dict]: A list containing a single dictionary, formatted as a user message
                     for the generative model, containing the completeness prompt.
     """
-    prompt = COMPLETE_PROMPT.format(prompt_note=note)
+    prompt = COMPLETE_TEMPLATE.render(prompt_note=note)
     return [{"role": "user", "content": prompt}]
 
 
@@ -332,7 +342,7 @@ def create_clinical_reasoning_assessment_prompt(note: str) -> List[Dict]:
         List[Dict]: A list containing a single dictionary, formatted as a user message
                     for the generative model, containing the clinical reasoning prompt.
     """
-    prompt = CLINICAL_ASSESSMENT_REASONING_PROMPT.format(prompt_note=note)
+    prompt = CLINICAL_ASSESSMENT_REASONING_TEMPLATE.render(prompt_note=note)
     return [{"role": "user", "content": prompt}]
 
 
@@ -347,7 +357,7 @@ def create_contingent_prompt(note: str) -> List[Dict]:
         List[Dict]: A list containing a single dictionary, formatted as a user message
                     for the generative model, containing the contingency planning prompt.
     """
-    prompt = CONTINGENT_PROMPT.format(prompt_note=note)
+    prompt = CONTINGENT_TEMPLATE.render(prompt_note=note)
     return [{"role": "user", "content": prompt}]
 
 
@@ -362,7 +372,7 @@ def create_concise_prompt(note: str) -> List[Dict]:
         List[Dict]: A list containing a single dictionary, formatted as a user message
                     for the generative model, containing the conciseness prompt.
     """
-    prompt = CONCISE_PROMPT.format(prompt_note=note)
+    prompt = CONCISE_TEMPLATE.render(prompt_note=note)
     return [{"role": "user", "content": prompt}]
 
 
@@ -377,11 +387,13 @@ def create_correct_prompt(note: str) -> List[Dict]:
         List[Dict]: A list containing a single dictionary, formatted as a user message
                     for the generative model, containing the correctness prompt.
     """
-    prompt = CORRECT_PROMPT.format(prompt_note=note)
+    prompt = CORRECT_TEMPLATE.render(prompt_note=note)
     return [{"role": "user", "content": prompt}]
 
 
-def run_pipeline(input_df: pd.DataFrame, completion, log_enabled: bool = True, max_tokens: int = 80_000) -> Dict:
+def run_pipeline(
+    input_df: pd.DataFrame, completion, log_enabled: bool = True, max_tokens: int = 80_000, budget: ev.Budget = None
+) -> Dict:
     """
     Runs a pipeline of evaluations on an input DataFrame using various prompt types and a specified completion function.
 
@@ -399,7 +411,9 @@ def run_pipeline(input_df: pd.DataFrame, completion, log_enabled: bool = True, m
             from the language model. This function is responsible for interacting with the language model API.
             In this case, it is expected to return a JSON string representing the completion.
         - log_enabled (bool): Flag to enable or disable logging within the Evaluation instances.
-        - max_tokens (int): Maximum number of tokens to be used by the Evaluation instances.
+        - max_tokens (int): Maximum number of tokens to be used across all of the Evaluation instances.
+        - budget (Budget): Optional shared budget to draw from, such as a per-model level of a larger run.
+            A child level per category is added beneath it, so any limits it carries are enforced as well.
 
     Returns:
         Dict: A dictionary where keys are 'noteid's (corresponding to the 'noteid' column in the input DataFrame)
@@ -407,8 +421,11 @@ def run_pipeline(input_df: pd.DataFrame, completion, log_enabled: bool = True, m
               `{'noteid1': {'complete': 1, 'clinical_reasoning': , ...}, 'noteid2': {...}}`.
               Each inner dictionary contains the grades assigned to that note ID for each prompt category.
     """
-    
+
     aggregated_output = {}
+    # One pipeline-wide limit, rather than max_tokens per category. A fresh level per call, rather than a named
+    # child of the shared budget, so a repeated call is not held to an earlier call's usage or max_tokens.
+    pipeline_budget = ev.Budget(max_tokens, parent=budget, name="5cs")
 
     # Define the types of prompts to run
     prompt_types = {
@@ -427,7 +444,8 @@ def run_pipeline(input_df: pd.DataFrame, completion, log_enabled: bool = True, m
             prep_fn=prompt_fxn,
             log_enabled=log_enabled,
             max_tokens=max_tokens,
-            log_prefix=category # Use the category as the log_prefix
+            log_prefix=category, # Use the category as the log_prefix
+            budget=pipeline_budget.child(category),
         )
 
         # Assuming run_dataset returns a tuple of (output_dict, usage_info)
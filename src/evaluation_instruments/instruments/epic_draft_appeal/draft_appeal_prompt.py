@@ -162,6 +162,62 @@ Rules to follow:
 OUTPUT:
 """
 
+# The same prompt with the rubric and instructions leading, so they form a stable prefix for provider prompt caching
+CACHE_FRIENDLY_PROMPT = """
+You will be given CLINICAL_DATA and a {OUTPUT_TEXT}, which is a summary of the CLINICAL_DATA. Your task is to use the following RUBRIC_SET to grade the {OUTPUT_TEXT}.
+
+<RUBRIC_SET>
+{RUBRIC_SET}
+<\\RUBRIC_SET>
+
+Rules to follow:
+{{instruction_set}}
+
+Read the following CLINICAL_DATA. They were used to create the {OUTPUT_TEXT}.
+
+<CLINICAL_DATA>
+{{clinical_data}}
+<\\CLINICAL_DATA>
+
+Read the following {OUTPUT_TEXT}, which is a summary of the above CLINICAL_DATA.
+
+<{OUTPUT_TEXT}>
+{{output_to_evaluate}}
+<\\{OUTPUT_TEXT}>
+
+Now, it's time to grade the {OUTPUT_TEXT}.
+
+OUTPUT:
+"""
+
+# Several cases in one request, sharing the rubric and instructions; see resolve_packed_prompt
+PACKED_PROMPT = """
+Read the following CASES. Each CASE contains CLINICAL_DATA and a {OUTPUT_TEXT}, which is a summary of that CASE's CLINICAL_DATA. Your task is to grade each {OUTPUT_TEXT} on its own.
+
+{{cases}}
+
+Read the following RUBRIC_SET. Your task is to use this RUBRIC_SET to grade each {OUTPUT_TEXT}.
+
+<RUBRIC_SET>
+{RUBRIC_SET}
+<\\RUBRIC_SET>
+
+Now, it's time to grade each {OUTPUT_TEXT}.
+
+Rules to follow:
+{{instruction_set}}
+
+OUTPUT:
+"""
+
+CASE_PROMPT = """<CLINICAL_DATA>
+{{clinical_data}}
+<\\CLINICAL_DATA>
+
+<{OUTPUT_TEXT}>
+{{output_to_evaluate}}
+<\\{OUTPUT_TEXT}>"""
+
 INSTRUCTION_LIST = [
 "- Your task is to grade the CLINICAL BASIS FOR APPEAL, based on the RUBRIC_SET and the CLINICAL_DATA being "
     "referenced.",
@@ -187,44 +243,149 @@ Here is your new role and persona:
 You are an expert grading machine, for clinical denial appeals.
 """
 # fmt: on
+from typing import Callable, Optional, Union
+
 import pandas as pd
 
 import evaluation_instruments.prep as prep
+
 OUTPUT_MODE = prep.OutputMode.EXPLAINED_SCORE
 
 
-def compile_clinical_data(sample: pd.Series) -> str:
-    data = ""
-    for key in sample.keys():
-        if key == "basis":
-            continue
-        if not sample[key]:
-            continue
-        data += f"{key}:\n"
-        if key == "denied procedures":
-            data += ", ".join(sample[key])
-        else:
-            for id in sample[key]:
-                data += f"[{id}] = {sample[key][id]}\n"
-    return data
-
-def resolve_prompt(sample, mode: prep.OutputMode = prep.OutputMode.DEFAULT) -> str:
-    prompt_pattern = prep.prompt_compilation(
-        PROMPT, pattern_kwargs={"OUTPUT_TEXT": "CLINICAL BASIS FOR APPEAL"}, rubric_library=EPIC_DRAFT_APPEAL_RUBRIC
+def compile_clinical_data(
+    sample: pd.Series, section_budget: Union[None, int, dict] = None, length_fn: Callable = len
+) -> str:
+    """Builds the CLINICAL_DATA block, optionally capping each section's size (see prep.compile_sections)."""
+    return prep.compile_sections(
+        sample,
+        exclude=("basis",),
+        joined_keys=("denied procedures",),
+        section_budget=section_budget,
+        length_fn=length_fn,
     )
 
-    instructions = prep.resolve_instructions(
-                            instructions=INSTRUCTION_LIST,
-                            details_overrides=DETAIL_INSTRUCTIONS,
-                            default_mode=OUTPUT_MODE,
-                            mode=mode
-                            )
 
-    return prompt_pattern.format(clinical_data=compile_clinical_data(sample),
-                                 output_to_evaluate=sample["basis"],
-                                 instruction_set=instructions)
+def resolve_prompt(
+    sample,
+    mode: prep.OutputMode = prep.OutputMode.DEFAULT,
+    section_budget: Union[None, int, dict] = None,
+    length_fn: Callable = len,
+    rubric_keys: Optional[list] = None,
+    layout: prep.PromptLayout = prep.PromptLayout.PUBLISHED,
+) -> str:
+    # CACHE_FRIENDLY leads with the rubric and instructions so requests share a prefix that providers can cache
+    cache_friendly = prep.PromptLayout(layout) == prep.PromptLayout.CACHE_FRIENDLY
+
+    # Rubric and instructions only depend on the mode, so are compiled once and cached across rows
+    prompt_template = prep.compile_instrument_prompt(
+        "epic_draft_appeal-cache_friendly" if cache_friendly else "epic_draft_appeal",
+        CACHE_FRIENDLY_PROMPT if cache_friendly else PROMPT,
+        pattern_kwargs={"OUTPUT_TEXT": "CLINICAL BASIS FOR APPEAL"},
+        rubric_library=EPIC_DRAFT_APPEAL_RUBRIC,
+        instructions=INSTRUCTION_LIST,
+        details_overrides=DETAIL_INSTRUCTIONS,
+        default_mode=OUTPUT_MODE,
+        mode=mode,
+        rubric_keys=rubric_keys,
+    )
+
+    return prompt_template.render(clinical_data=compile_clinical_data(sample, section_budget, length_fn),
+                                  output_to_evaluate=sample["basis"])
+
 
 @prep.json_from_column(namedtuple_key="guid")
 @prep.to_user_messages(system_message=SYSTEM_PROMPT)
 def to_prompt(sample):
     return resolve_prompt(sample)
+
+
+@prep.json_from_column(namedtuple_key="guid")
+@prep.to_user_messages(system_message=SYSTEM_PROMPT)
+def to_cache_friendly_prompt(sample):
+    return resolve_prompt(sample, layout=prep.PromptLayout.CACHE_FRIENDLY)
+
+
+# Two-phase scoring, see Evaluation.run_two_phase: score every case, then explain only the flagged criteria
+@prep.json_from_column(namedtuple_key="guid")
+@prep.to_user_messages(system_message=SYSTEM_PROMPT)
+def to_score_prompt(sample):
+    return resolve_prompt(sample, mode=prep.OutputMode.SCORE)
+
+
+@prep.json_from_column(namedtuple_key="guid")
+@prep.with_response_schema(
+    schema_fn=lambda sample, rubric_keys=None: response_schema(prep.OutputMode.EXPLAINED_SCORE, rubric_keys)
+)
+@prep.to_user_messages(system_message=SYSTEM_PROMPT)
+def to_explained_prompt(sample, rubric_keys=None):
+    return resolve_prompt(sample, mode=prep.OutputMode.EXPLAINED_SCORE, rubric_keys=rubric_keys)
+
+
+RUBRIC_GRADES = prep.rubric_grades(EPIC_DRAFT_APPEAL_RUBRIC.values())
+
+
+def response_schema(
+    mode: prep.OutputMode = prep.OutputMode.DEFAULT,
+    rubric_keys: Optional[list[str]] = None,
+    cases: Optional[int] = None,
+) -> dict:
+    """
+    The JSON schema of a response to a prompt from resolve_prompt, ex. for Evaluation(response_schema=...),
+    or with cases, of a response to resolve_packed_prompt keyed by case id.
+    """
+    grades = RUBRIC_GRADES if rubric_keys is None else {key: RUBRIC_GRADES[key] for key in rubric_keys}
+    schema = prep.rubric_schema(grades, mode, default_mode=OUTPUT_MODE)
+    return schema if cases is None else prep.packed_schema(schema, cases)
+
+
+# Groups of criteria graded in separate, concurrent requests by to_grouped_prompt
+RUBRIC_GROUPS = prep.partition_rubrics(EPIC_DRAFT_APPEAL_RUBRIC, 3)
+
+
+@prep.json_from_column(namedtuple_key="guid")
+@prep.split_rubrics(rubric_groups=RUBRIC_GROUPS)
+@prep.with_response_schema(schema_fn=lambda sample, rubric_keys=None: response_schema(rubric_keys=rubric_keys))
+@prep.to_user_messages(system_message=SYSTEM_PROMPT)
+def to_grouped_prompt(sample, rubric_keys=None):
+    return resolve_prompt(sample, rubric_keys=rubric_keys)
+
+
+CASE_TEMPLATE = prep.PromptTemplate.doubly_resolved(CASE_PROMPT, OUTPUT_TEXT="CLINICAL BASIS FOR APPEAL")
+
+# The output rules of INSTRUCTION_LIST apply to each case, within the object keyed by case id
+PACKED_INSTRUCTIONS, PACKED_DETAIL_INSTRUCTIONS = prep.packed_instructions(INSTRUCTION_LIST, DETAIL_INSTRUCTIONS)
+
+
+def resolve_packed_prompt(
+    samples: list,
+    mode: prep.OutputMode = prep.OutputMode.DEFAULT,
+    section_budget: Union[None, int, dict] = None,
+    length_fn: Callable = len,
+) -> str:
+    """Resolves one prompt grading several cases, with the response keyed by case id (see prep.wrap_cases)."""
+    prompt_template = prep.compile_instrument_prompt(
+        "epic_draft_appeal-packed",
+        PACKED_PROMPT,
+        pattern_kwargs={"OUTPUT_TEXT": "CLINICAL BASIS FOR APPEAL"},
+        rubric_library=EPIC_DRAFT_APPEAL_RUBRIC,
+        instructions=PACKED_INSTRUCTIONS,
+        details_overrides=PACKED_DETAIL_INSTRUCTIONS,
+        default_mode=OUTPUT_MODE,
+        mode=mode,
+    )
+
+    cases = [
+        CASE_TEMPLATE.render(clinical_data=compile_clinical_data(sample, section_budget, length_fn),
+                             output_to_evaluate=sample["basis"])
+        for sample in samples
+    ]
+    return prompt_template.render(cases=prep.wrap_cases(cases))
+
+
+_read_case = prep.json_from_column(lambda raw_json: raw_json, namedtuple_key="guid")
+
+
+@prep.with_response_schema(schema_fn=lambda samples: response_schema(cases=len(samples)))
+@prep.to_user_messages(system_message=SYSTEM_PROMPT)
+def to_packed_prompt(samples):
+    return resolve_packed_prompt([_read_case(sample) for sample in samples])
@@ -149,7 +149,37 @@ Rules to follow:
 {instruction_set}
 
 OUTPUT:
-""" # noqa: E501
+"""  # noqa: E501
+
+# The same prompt with the rubric and instructions leading, so they form a stable prefix for provider prompt caching
+CACHE_FRIENDLY_PROMPT_PATTERN = """Here is your new role and persona:
+You are an expert grading machine, for summaries of clinical notes.
+
+You will be given CLINICAL_NOTES and a CLINICAL_SUMMARY of those notes. Your task is to use the following RUBRIC_SET to grade the CLINICAL_SUMMARY.
+
+<RUBRIC_SET>
+{RUBRIC_SET}
+<\\RUBRIC_SET>
+
+Rules to follow:
+{instruction_set}
+
+Read the following CLINICAL_NOTES. They were used to create the CLINICAL_SUMMARY.
+
+<CLINICAL_NOTES>
+{prompt_notes}
+<\\CLINICAL_NOTES>
+
+Read the following CLINICAL_SUMMARY, which is a summary of the above CLINICAL_NOTES for a clinician with specialty {target_specialty}.
+
+<CLINICAL_SUMMARY>
+{summary_to_evaluate}
+<\\CLINICAL_SUMMARY>
+
+Now, it's time to grade the CLINICAL_SUMMARY.
+
+OUTPUT:
+"""  # noqa: E501
 
 INSTRUCTION_LIST = [
 "- Your task is to grade the CLINICAL_SUMMARY, based on the RUBRIC_SET and the CLINICAL_NOTES being summarized.",
@@ -179,12 +209,53 @@ You are a summarization quality expert that specializes in text analysis and rea
 # fmt: on
 import json
 import logging
-from typing import Any
-from evaluation_instruments import prep
+import re
+from functools import partial
+from pathlib import Path
+from typing import Any, Optional
+
+from evaluation_instruments import post, prep
+from evaluation_instruments.model import PromptMessages, PromptSet
+
+
+class InputError(Exception):
+    pass
+
 
 OUTPUT_MODE = prep.OutputMode.SCORE  # Default output mode
+PROMPT_TEMPLATE = prep.PromptTemplate(BASE_PROMPT_PATTERN).partial(RUBRIC_SET=RUBRIC_SET)
+CACHE_FRIENDLY_TEMPLATE = prep.PromptTemplate(CACHE_FRIENDLY_PROMPT_PATTERN).partial(RUBRIC_SET=RUBRIC_SET)
+
+# The criteria graded, in rubric order, ex. the keys a complete response must contain
+RUBRIC_KEYS = re.findall(r"^<(\w+)>$", RUBRIC_SET, flags=re.MULTILINE)
+RUBRIC_GRADES = prep.rubric_grades(RUBRIC_SET)
+
+
+def response_schema(mode: prep.OutputMode = prep.OutputMode.DEFAULT, rubric_keys: Optional[list[str]] = None) -> dict:
+    """The JSON schema of a response to a prompt from resolve_prompt, ex. for Evaluation(response_schema=...)."""
+    grades = RUBRIC_GRADES if rubric_keys is None else {key: RUBRIC_GRADES[key] for key in rubric_keys}
+    return prep.rubric_schema(grades, mode, default_mode=OUTPUT_MODE)
+
+
+# How per-chunk scores are combined when notes are evaluated in chunks; other criteria use the median.
+# A chunk only sees some of the notes, so citations and assertions supported by any chunk count (max),
+# while an omission or error found in any chunk counts against the summary (min).
+CHUNK_AGGREGATIONS = {
+    "citation": "max",
+    "accurate": "min",
+    "thorough": "min",
+    "voice_summ": "max",
+    "voice_note": "max",
+}
+
 
-def pdsqi_from_file(sample: Any, output_mode: str = 'default') -> list[dict]:
+def pdsqi_from_file(
+    sample: Any,
+    output_mode: str = 'default',
+    data_path: Optional[str] = None,
+    chunk_budget: Optional[int] = None,
+    **packing_kwargs
+) -> list[dict]:
     """
     Main function to resolve a prompt for PDSQI-9 evaluation from an entity-specific file.
     The file must be a JSON with keys:
@@ -199,22 +270,49 @@ def pdsqi_from_file(sample: Any, output_mode: str = 'default') -> list[dict]:
         Sample object containing guid for file lookup
     output_mode : OutputMode, optional
         Controls the output format (default: OutputMode.DEFAULT)
+    data_path : str, optional
+        A directory prefixed to the guid, or the path to a packed case store (see prep.write_case_store)
+        holding the guid, by default None to treat the guid as the file path.
+    chunk_budget : int, optional
+        When set, notes are split into chunks of at most this many tokens with resolve_chunked_prompt,
+        by default None to send all notes in one prompt.
+    **packing_kwargs
+        note_budget, packing, token_counter, and layout are passed through to resolve_prompt,
+        or token_counter, aggregations, and layout to resolve_chunked_prompt when chunking.
 
     Returns
     -------
     list[dict]
-        The message array to send to the generative model
+        The message array to send to the generative model, or a PromptSet when the notes are chunked
     """
-    with open(f"{sample.guid}.json", "r") as file:
-        raw_json = json.load(file)
+    if prep.is_case_store(data_path):
+        # looked up as json_from_column does, with a missing case read as empty
+        guid = Path(sample.guid).with_suffix("").as_posix()
+        raw_json = prep.open_case_store(data_path).get(guid, {})
+    else:
+        with open(Path(data_path or "") / f"{sample.guid}.json", "r") as file:
+            raw_json = json.load(file)
 
     summary = raw_json["summary"]
     notes = list(raw_json["notes"].values())
     target_specialty = raw_json["target_specialty"]
 
-    return resolve_prompt(summary, notes, target_specialty, output_mode)
-
-def resolve_prompt(summary_to_evaluate: str, notes: list[str], target_specialty: str, output_mode: prep.OutputMode = prep.OutputMode.DEFAULT) -> list[dict]:
+    if chunk_budget is not None:
+        return resolve_chunked_prompt(summary, notes, target_specialty, output_mode, chunk_budget, **packing_kwargs)
+    return resolve_prompt(summary, notes, target_specialty, output_mode, **packing_kwargs)
+
+
+def resolve_prompt(
+    summary_to_evaluate: str,
+    notes: list[str],
+    target_specialty: str,
+    output_mode: prep.OutputMode = prep.OutputMode.DEFAULT,
+    note_budget: Optional[int] = None,
+    packing: str = "recent",
+    token_counter: Optional[prep.TokenCounter] = None,
+    note_ids: Optional[list[int]] = None,
+    layout: prep.PromptLayout = prep.PromptLayout.PUBLISHED,
+) -> list[dict]:
     """
     Resolves the prompt for PDSQI-9 evaluation.
 
@@ -231,11 +329,29 @@ def resolve_prompt(summary_to_evaluate: str, notes: list[str], target_specialty:
         - DEFAULT: Use the global RETURN_EXPLANATION setting
         - SCORE_ONLY: Return only numeric scores
         - WITH_EXPLANATION: Return scores with explanations
+    note_budget : int, optional
+        The maximum tokens across all note texts, by default None for no limit.
+        Notes beyond the budget are truncated or omitted, keeping their NoteIDs so citations remain valid.
+    packing : str, optional
+        How the note_budget is allocated, by default "recent"
+        - "recent": notes are assumed chronological and the latest are kept whole first
+        - "proportional": every note is shortened by the same fraction
+    token_counter : TokenCounter, optional
+        Measures notes against the note_budget, by default None to use the character heuristic.
+    note_ids : list[int], optional
+        The NoteID of each note, by default None to number the notes from 1.
+        Used when the notes are a subset of the case, so citations refer to the case's NoteIDs.
+    layout : PromptLayout|str, optional
+        The order of the prompt content, by default PUBLISHED as in the original studies.
+        CACHE_FRIENDLY places the rubric and instructions before the notes and summary, so that every
+        request with the same output_mode shares a byte-identical prefix that providers can cache.
 
     Returns
     -------
     list[dict]
         The message array to send to the generative model
+        When a note_budget is set, this is a PromptMessages whose metadata records the NoteIDs that were
+        truncated or omitted under 'note_packing'.
     """
     if output_mode != prep.OutputMode.DEFAULT:
         logging.debug("Changing output mode from default deviates from the original published studies.")
@@ -247,20 +363,124 @@ def resolve_prompt(summary_to_evaluate: str, notes: list[str], target_specialty:
         mode=output_mode
     )
 
+    note_ids = note_ids or list(range(1, len(notes) + 1))
+
+    metadata = None
+    if note_budget is not None:
+        notes, report = prep.pack_texts(notes, note_budget, strategy=packing, token_counter=token_counter)
+        report["truncated"] = [note_ids[ix] for ix in report["truncated"]]  # as NoteIDs
+        report["omitted"] = [note_ids[ix] for ix in report["omitted"]]
+        metadata = {"note_packing": report}
+
     prompt_notes = "\n".join(
-        f"<NoteID:{i+1}>\n" f"Note: {note}\n" f"<\\NoteID:{i+1}>"
-        for i, note in enumerate(notes)
+        f"<NoteID:{i}>\n" f"Note: {note}\n" f"<\\NoteID:{i}>"
+        for i, note in zip(note_ids, notes)
     )
 
-    prompt = BASE_PROMPT_PATTERN.format(
+    cache_friendly = prep.PromptLayout(layout) == prep.PromptLayout.CACHE_FRIENDLY
+    prompt = (CACHE_FRIENDLY_TEMPLATE if cache_friendly else PROMPT_TEMPLATE).render(
         prompt_notes=prompt_notes,
         summary_to_evaluate=summary_to_evaluate,
-        RUBRIC_SET=RUBRIC_SET,
         target_specialty=target_specialty,
         instruction_set=instructions
     )
 
-    return [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": prompt}]
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": prompt}]
+    if metadata is None:
+        return messages
+    return PromptMessages(messages, metadata)
+
+
+def resolve_chunked_prompt(
+    summary_to_evaluate: str,
+    notes: list[str],
+    target_specialty: str,
+    output_mode: prep.OutputMode = prep.OutputMode.DEFAULT,
+    chunk_budget: int = None,
+    token_counter: Optional[prep.TokenCounter] = None,
+    aggregations: Optional[dict] = None,
+    layout: prep.PromptLayout = prep.PromptLayout.PUBLISHED,
+) -> list[dict]:
+    """
+    Resolves PDSQI-9 prompts for notes too long for one context window, splitting the notes into chunks.
 
-class InputError(Exception):
-    pass
+    Notes are grouped in order into chunks of at most chunk_budget tokens, and each chunk is evaluated
+    against the full summary with the case's original NoteIDs. A note larger than the budget is given a
+    chunk of its own and truncated to fit. Evaluation sends the chunks concurrently and reduces the
+    per-chunk scores with post.reduce_responses, using CHUNK_AGGREGATIONS unless aggregations are given.
+
+    Chunked evaluation deviates from the original published studies; prefer resolve_prompt when the
+    notes fit.
+
+    Parameters
+    ----------
+    summary_to_evaluate : str
+        The summary to evaluate
+    notes : list[str]
+        The notes to evaluate, in chronological order
+    target_specialty : str
+        The target medical specialty
+    output_mode : OutputMode|str, optional
+        Controls the output format, see resolve_prompt.
+    chunk_budget : int
+        The maximum tokens of note text per chunk.
+    token_counter : TokenCounter, optional
+        Measures notes against the chunk_budget, by default None to use the character heuristic.
+    aggregations : dict, optional
+        Maps criteria to an aggregation for post.reduce_responses, by default None for CHUNK_AGGREGATIONS.
+    layout : PromptLayout|str, optional
+        The order of the prompt content, see resolve_prompt.
+
+    Returns
+    -------
+    list[dict]
+        The message array when all notes fit in a single chunk (a PromptMessages recording any note truncated to
+        fit under 'note_packing'), otherwise a PromptSet with one message
+        array per chunk, whose metadata records the NoteIDs of each chunk under 'note_chunks' and of any
+        note truncated to fit its chunk under 'truncated'.
+    """
+    if chunk_budget is None or chunk_budget <= 0:
+        raise InputError("A positive chunk_budget is required to chunk notes.")
+
+    counter = token_counter or prep.TokenCounter()
+    chunks, size = [], 0
+    for note_id, note in enumerate(notes, start=1):
+        count = counter.count(note)
+        if not chunks or size + count > chunk_budget:
+            chunks.append([])
+            size = 0
+        chunks[-1].append(note_id)
+        size += count
+
+    if len(chunks) <= 1:
+        # notes that fit are left whole, while a single note larger than the budget is truncated to fit
+        return resolve_prompt(
+            summary_to_evaluate,
+            notes,
+            target_specialty,
+            output_mode,
+            note_budget=chunk_budget,
+            token_counter=token_counter,
+            layout=layout,
+        )
+
+    prompts = [
+        resolve_prompt(
+            summary_to_evaluate,
+            [notes[note_id - 1] for note_id in chunk],
+            target_specialty,
+            output_mode,
+            note_budget=chunk_budget,
+            token_counter=token_counter,
+            note_ids=chunk,
+            layout=layout,
+        )
+        for chunk in chunks
+    ]
+    aggregations = CHUNK_AGGREGATIONS if aggregations is None else aggregations
+    reduce_fn = partial(post.reduce_responses, aggregations=aggregations)
+    truncated = [note_id for prompt in prompts for note_id in prompt.metadata["note_packing"]["truncated"]]
+    for prompt in prompts:
+        # each chunk is graded on every criterion, for a structured output Evaluation(response_schema=...)
+        prompt.metadata[prep.SCHEMA_METADATA_KEY] = response_schema(output_mode)
+    return PromptSet(prompts, reduce_fn, {"note_chunks": chunks, "truncated": truncated})
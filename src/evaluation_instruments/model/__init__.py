@@ -1 +1 @@
-from ._parsed_components import TokenUsage
+from ._parsed_components import PromptMessages, PromptSet, TokenUsage
@@ -1,5 +1,41 @@
 from dataclasses import dataclass
-from typing import Optional
+from typing import Callable, Optional
+
+
+class PromptMessages(list):
+    """
+    A message array that also carries metadata about how the prompt was prepared.
+
+    Behaves exactly as the list of messages passed to the completion function, while letting a prep_fn
+    report details such as truncated inputs; Evaluation collects the metadata per sample.
+    """
+
+    def __init__(self, messages=(), metadata: Optional[dict] = None):
+        super().__init__(messages)
+        self.metadata = metadata or {}
+
+
+class PromptSet(list):
+    """
+    Several prompts that together evaluate a single sample, such as one per chunk of a long input.
+
+    Evaluation sends each prompt concurrently, then combines the parsed responses with reduce_fn into the
+    single response recorded for the sample; usage is summed across the prompts.
+
+    Parameters
+    ----------
+    prompts : Iterable[list[dict]]
+        The message arrays to send.
+    reduce_fn : Callable[[list[dict]], dict]
+        Combines the parsed responses, in the same order as the prompts, into one response.
+    metadata : dict, optional
+        Details about how the prompts were prepared, collected per sample by Evaluation.
+    """
+
+    def __init__(self, prompts=(), reduce_fn: Callable[[list[dict]], dict] = None, metadata: Optional[dict] = None):
+        super().__init__(prompts)
+        self.reduce_fn = reduce_fn
+        self.metadata = metadata or {}
 
 
 @dataclass(init=False)
@@ -13,6 +49,7 @@ class TokenUsage:
         prompt_tokens: Optional[int] = None,
         completion_tokens: Optional[int] = None,
         total_tokens: Optional[int] = None,
+        cached_tokens: Optional[int] = None,
         **kwargs,
     ):
         self.prompt_tokens = prompt_tokens
@@ -21,9 +58,19 @@ class TokenUsage:
         if self.total_tokens is None and (self.prompt_tokens is not None or self.completion_tokens is not None):
             self.total_tokens = (self.prompt_tokens or 0) + (self.completion_tokens or 0)
 
+        # Prompt tokens served from the provider's prompt cache, when reported; not a threshold field
+        self.cached_tokens = cached_tokens if cached_tokens is not None else _cached_tokens(kwargs)
+
         if kwargs:
             self.other = kwargs
 
+    @property
+    def cache_hit_rate(self) -> Optional[float]:
+        """The fraction of prompt tokens read from the provider's prompt cache, or None if not reported."""
+        if self.cached_tokens is None or not self.prompt_tokens:
+            return None
+        return self.cached_tokens / self.prompt_tokens
+
     def __str__(self):
         return f"Total Tokens={self.total_tokens}"
 
@@ -45,6 +92,10 @@ class TokenUsage:
                 new_value = (getattr(self, attr) or 0) + (getattr(other, attr) or 0)
             setattr(new_obj, attr, new_value)
 
+        cached = [getattr(usage, "cached_tokens", None) for usage in (self, other)]
+        if any(value is not None for value in cached):
+            new_obj.cached_tokens = sum(value or 0 for value in cached)
+
         return new_obj
 
     def validate_compatible(self, other):
@@ -99,3 +150,13 @@ class TokenUsage:
 
     def __le__(self, other):
         return self == other or self < other
+
+
+def _cached_tokens(usage: dict) -> Optional[int]:
+    """Reads cached prompt tokens from provider usage details, in OpenAI or Anthropic form."""
+    details = usage.get("prompt_tokens_details")
+    if details is not None:
+        cached = details.get("cached_tokens") if isinstance(details, dict) else getattr(details, "cached_tokens", None)
+        if cached is not None:
+            return cached
+    return usage.get("cache_read_input_tokens")
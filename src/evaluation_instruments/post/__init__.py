@@ -1,5 +1,25 @@
+import logging
+import statistics
+from collections import Counter
+from numbers import Number
+from typing import Callable, Optional, Union
+
+import numpy as np
 import pandas as pd
 
+logger = logging.getLogger("evaluation")
+
+AGGREGATIONS = {
+    "min": min,
+    "max": max,
+    "mean": statistics.fmean,
+    # median_low keeps the result one of the observed grades
+    "median": statistics.median_low,
+}
+
+CHOICE_AGGREGATIONS = ("majority", "median", "mean")
+
+
 def frame_from_evals(full_output: dict) -> pd.DataFrame:
     """
     Convert the output of the evaluation into a DataFrame.
@@ -43,3 +63,200 @@ def frame_from_evals(full_output: dict) -> pd.DataFrame:
     df.columns = pd.MultiIndex.from_tuples(df.columns)
 
     return df
+
+
+def frame_from_judges(judge_outputs: dict[str, dict]) -> pd.DataFrame:
+    """
+    Convert the outputs of several judges, such as from Ensemble.run_dataset, into a single DataFrame.
+
+    Parameters
+    ----------
+    judge_outputs : dict[str, dict]
+        The full output of each judge, keyed by the judge's model.
+
+    Returns
+    -------
+    pd.DataFrame
+        The outputs of every judge, as from frame_from_evals, indexed by judge and then sample.
+    """
+    frames = {judge: frame_from_evals(outputs) for judge, outputs in judge_outputs.items() if outputs}
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, names=["judge", None])
+
+
+def merge_responses(responses: list[dict]) -> dict:
+    """
+    Combines responses that each graded a different subset of criteria into a single response.
+
+    Parameters
+    ----------
+    responses : list[dict]
+        The parsed responses, ex. one per rubric group.
+
+    Returns
+    -------
+    dict
+        The union of the responses' criteria, in order; when a criterion appears more than once the last is kept.
+    """
+    merged = {}
+    for response in responses:
+        if overlap := merged.keys() & response.keys():
+            logger.debug(f"Criteria graded in more than one response: {', '.join(sorted(overlap))}")
+        merged.update(response)
+    return merged
+
+
+def reduce_responses(
+    responses: list[dict],
+    aggregations: Optional[dict[str, Union[str, Callable]]] = None,
+    default: Union[str, Callable] = "median",
+) -> dict:
+    """
+    Combines several parsed responses for the same sample into one, criterion by criterion.
+
+    Scores may be given directly ({"accurate": 4}) or nested ({"accurate": {"score": 4, "explanation": ...}}).
+    Numeric scores are aggregated with the criterion's aggregation; non-numeric values, such as "NA", are only
+    used when no response gave a number, in which case the most common value is kept. Nested text fields are
+    joined, labelled by the position of the response they came from. Empty responses, such as parse failures,
+    are ignored.
+
+    Parameters
+    ----------
+    responses : list[dict]
+        The parsed responses to combine.
+    aggregations : dict[str, str | Callable], optional
+        Maps criteria to an aggregation: "min", "max", "mean", "median", or a callable over a list of numbers.
+        By default None, using the default for every criterion.
+    default : str | Callable, optional
+        The aggregation for criteria not in aggregations, by default "median"
+
+    Returns
+    -------
+    dict
+        The combined response.
+    """
+    aggregations = aggregations or {}
+    responses = [response for response in responses if response]
+
+    combined = {}
+    for key in dict.fromkeys(key for response in responses for key in response):
+        labelled = [(ix, response[key]) for ix, response in enumerate(responses) if key in response]
+        aggregate = _resolve_aggregation(aggregations.get(key, default))
+
+        if all(isinstance(value, dict) for _, value in labelled):
+            combined[key] = {}
+            for field in dict.fromkeys(field for _, value in labelled for field in value):
+                values = [(ix, value[field]) for ix, value in labelled if field in value]
+                combined[key][field] = _combine_values(values, aggregate, join_text=True)
+        else:
+            combined[key] = _combine_values(labelled, aggregate)
+
+    return combined
+
+
+def _resolve_aggregation(aggregation: Union[str, Callable]) -> Callable:
+    if callable(aggregation):
+        return aggregation
+    if aggregation not in AGGREGATIONS:
+        raise ValueError(f"Unknown aggregation '{aggregation}'; expected one of {', '.join(AGGREGATIONS)}")
+    return AGGREGATIONS[aggregation]
+
+
+def _combine_values(labelled: list[tuple[int, object]], aggregate: Callable, join_text: bool = False):
+    numbers = [value for _, value in labelled if isinstance(value, Number) and not isinstance(value, bool)]
+    if numbers:
+        return aggregate(numbers)
+
+    distinct = dict.fromkeys(value for _, value in labelled if isinstance(value, str))
+    if join_text and len(distinct) > 1:
+        return "\n".join(f"[{ix + 1}] {value}" for ix, value in labelled if isinstance(value, str))
+
+    counts = Counter(repr(value) for _, value in labelled)
+    most_common = counts.most_common(1)[0][0]
+    return next(value for _, value in labelled if repr(value) == most_common)
+
+
+def aggregate_choices(responses: list[dict], method: str = "majority") -> tuple[dict, dict]:
+    """
+    Combines the parsed responses of several choices for the same prompt, ex. from a request with n > 1.
+
+    Scores are arranged as a choices by criteria array and aggregated column-wise. Scores may be given directly
+    or nested as {"score": ..., "explanation": ...}; a nested criterion keeps the explanation of a choice whose
+    score matches the aggregate. Criteria with no numeric scores, such as "NA", take the most common value.
+    Empty responses, such as parse failures, are ignored.
+
+    Parameters
+    ----------
+    responses : list[dict]
+        The parsed response of each choice.
+    method : str, optional
+        The aggregation across choices, by default "majority"
+        - "majority": the most common score, the lowest on ties
+        - "median": the lower median, so the result is one of the observed scores
+        - "mean": the mean score
+
+    Returns
+    -------
+    tuple[dict, dict]
+        The aggregated response, and the dispersion of each numeric criterion as the population standard
+        deviation of its scores across choices; 0.0 means every choice agreed.
+    """
+    if method not in CHOICE_AGGREGATIONS:
+        raise ValueError(f"Unknown aggregation '{method}'; expected one of {', '.join(CHOICE_AGGREGATIONS)}")
+
+    responses = [response for response in responses if response]
+    if not responses:
+        return {}, {}
+
+    criteria = list(dict.fromkeys(key for response in responses for key in response))
+    scores = pd.DataFrame(
+        [[_score_value(response.get(key)) for key in criteria] for response in responses], columns=criteria
+    )
+    numeric = scores.apply(pd.to_numeric, errors="coerce").astype(float)
+    has_numbers = numeric.notna().any().to_numpy()
+    values = numeric.to_numpy()
+
+    selected = values[:, has_numbers]
+    if method == "mean":
+        aggregated = np.nanmean(selected, axis=0)
+    elif method == "median":
+        aggregated = np.nanquantile(selected, 0.5, axis=0, method="lower")
+    else:
+        modes = numeric.loc[:, has_numbers].mode(axis=0)
+        aggregated = modes.iloc[0].to_numpy() if len(modes) else np.empty(0)
+    dispersion = np.nanstd(selected, axis=0)
+
+    combined = {}
+    numeric_criteria = [key for key, is_numeric in zip(criteria, has_numbers) if is_numeric]
+    for key, score in zip(numeric_criteria, aggregated):
+        combined[key] = _with_score(responses, key, _as_grade(score))
+    for key, is_numeric in zip(criteria, has_numbers):
+        if not is_numeric:
+            observed = [response[key] for response in responses if key in response]
+            counts = Counter(repr(value) for value in observed)
+            combined[key] = next(value for value in observed if repr(value) == counts.most_common(1)[0][0])
+
+    # keep the criteria in their original order
+    combined = {key: combined[key] for key in criteria}
+    return combined, {key: float(value) for key, value in zip(numeric_criteria, dispersion)}
+
+
+def _score_value(value):
+    return value.get("score") if isinstance(value, dict) else value
+
+
+def _as_grade(score: float):
+    """Returns whole-number scores as int, as they were parsed."""
+    return int(score) if float(score).is_integer() else float(score)
+
+
+def _with_score(responses: list[dict], key: str, score):
+    """Builds the aggregated value of a criterion, keeping the shape of the choices' values."""
+    nested = [response[key] for response in responses if isinstance(response.get(key), dict)]
+    if not nested:
+        return score
+
+    # prefer the explanation of a choice that gave the aggregated score
+    matching = next((value for value in nested if value.get("score") == score), nested[0])
+    return {**matching, "score": score}
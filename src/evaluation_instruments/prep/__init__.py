@@ -1,7 +1,35 @@
+from .batching import (
+    PACKED_RESPONSE_INSTRUCTION,
+    packed_instructions,
+    packed_schema,
+    split_packed_response,
+    wrap_cases,
+)
+from .case_store import CaseStore, close_case_stores, is_case_store, open_case_store, write_case_store
 from .data_handler import (
+    OutputMode,
+    PromptLayout,
+    clear_prompt_cache,
+    compile_instrument_prompt,
+    compile_sections,
     json_from_column,
+    partition_rubrics,
+    prompt_cache_info,
     prompt_compilation,
     resolve_instructions,
+    split_rubrics,
     to_user_messages,
-    OutputMode
 )
+from .packing import pack_texts
+from .reader import JsonReader
+from .schema import (
+    SCHEMA_METADATA_KEY,
+    response_format,
+    rubric_grades,
+    rubric_schema,
+    schema_max_tokens,
+    validate_response,
+    with_response_schema,
+)
+from .template import PromptTemplate
+from .tokens import TokenCounter
@@ -0,0 +1,121 @@
+from typing import Optional
+
+CASE_ID_PREFIX = "case_"
+
+PACKED_RESPONSE_INSTRUCTION = (
+    "- Grade every CASE independently of the others. Your output must be a single JSON object where each key is a "
+    'CASE id (e.g., "case_1") and each corresponding value is the JSON output described above for that CASE.'
+)
+
+# How instruments address the output of a single-case prompt, and the same rule scoped to each CASE of a packed one
+PACKED_OUTPUT_SCOPES = {
+    "Your output must be": "Each CASE's output must be",
+    "Your JSON output's": "Each CASE's JSON output's",
+}
+
+
+def case_ids(count: int) -> list[str]:
+    """Returns the ids used to delimit the cases of a packed prompt, 'case_1' through 'case_{count}'."""
+    return [f"{CASE_ID_PREFIX}{ix}" for ix in range(1, count + 1)]
+
+
+def packed_instructions(instructions: list[str], details_overrides: dict) -> tuple[list[str], dict]:
+    """
+    Adapts an instrument's instructions to a packed prompt, so they agree with PACKED_RESPONSE_INSTRUCTION.
+
+    Rules describing the output (ex. "Your output must be JSON-formatted, where each key is one of your
+    RUBRIC_SET items") are rescoped to the output of each CASE, and PACKED_RESPONSE_INSTRUCTION is appended to
+    describe the object keyed by case id that holds them.
+
+    Parameters
+    ----------
+    instructions : list[str]
+        The instrument's instruction list.
+    details_overrides : dict
+        The instrument's line-index:value overrides for OutputMode.EXPLAINED_SCORE.
+
+    Returns
+    -------
+    tuple[list[str], dict]
+        The instructions and overrides for resolve_instructions or compile_instrument_prompt.
+    """
+
+    def rescope(instruction: str) -> str:
+        for single, per_case in PACKED_OUTPUT_SCOPES.items():
+            instruction = instruction.replace(single, per_case)
+        return instruction
+
+    return (
+        [rescope(instruction) for instruction in instructions] + [PACKED_RESPONSE_INSTRUCTION],
+        {ix: rescope(instruction) for ix, instruction in details_overrides.items()},
+    )
+
+
+def wrap_cases(blocks: list[str]) -> str:
+    """
+    Joins the case-specific portions of several prompts, delimiting each with its case id.
+
+    Parameters
+    ----------
+    blocks : list[str]
+        The resolved case content, such as the clinical data and output to evaluate, of each case in order.
+
+    Returns
+    -------
+    str
+        The cases, each wrapped in <CASE id=...> tags.
+    """
+    return "\n".join(
+        f"<CASE id={case_id}>\n{block}\n<\\CASE id={case_id}>" for case_id, block in zip(case_ids(len(blocks)), blocks)
+    )
+
+
+def packed_schema(case_schema: dict, count: int) -> dict:
+    """
+    Builds the JSON schema of a response to a packed prompt, keyed by case id as in wrap_cases.
+
+    Parameters
+    ----------
+    case_schema : dict
+        The JSON schema of the response for a single case, as from rubric_schema.
+    count : int
+        The number of cases in the prompt.
+
+    Returns
+    -------
+    dict
+        A JSON schema for an object with exactly the keys 'case_1' through 'case_{count}', each holding a
+        response matching case_schema.
+    """
+    # strict structured outputs require every property and no others, as in rubric_schema
+    return {
+        "type": "object",
+        "properties": {case_id: case_schema for case_id in case_ids(count)},
+        "required": case_ids(count),
+        "additionalProperties": False,
+    }
+
+
+def split_packed_response(response: dict, count: int) -> list[Optional[dict]]:
+    """
+    Splits a response keyed by case id back into one response per case.
+
+    Parameters
+    ----------
+    response : dict
+        The parsed response to a packed prompt.
+    count : int
+        The number of cases in the prompt.
+
+    Returns
+    -------
+    list[Optional[dict]]
+        The response for each case in order, or None where the case is missing or not a non-empty dict,
+        so that it can be retried on its own.
+    """
+    response = response if isinstance(response, dict) else {}
+    split = []
+    for case_id in case_ids(count):
+        case_response = response.get(case_id)
+        split.append(case_response if isinstance(case_response, dict) and case_response else None)
+    return split
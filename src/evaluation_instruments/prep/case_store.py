@@ -0,0 +1,224 @@
+import json
+import logging
+import mmap
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterator, Union
+
+logger = logging.getLogger("evaluation")
+
+STORE_SUFFIX = ".pack"
+INDEX_SUFFIX = ".idx"
+PARTIAL_SUFFIX = ".partial"
+STORE_VERSION = 1
+
+
+class CaseStore:
+    """
+    Read-only random access to a packed case store by guid.
+
+    A store is a single data file of concatenated JSON documents, alongside an index file mapping each guid
+    to the offset and length of its document. The data file is memory mapped, so reading a case is one slice
+    and one json.loads, with no per-case filesystem metadata lookups.
+
+    Create stores with write_case_store.
+
+    Parameters
+    ----------
+    path : str | Path
+        The path to the store data file, ending in '.pack'.
+        The index is expected alongside it with the '.idx' suffix.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        with self.path.with_suffix(INDEX_SUFFIX).open("r") as index_file:
+            index = json.load(index_file)
+
+        if index.get("version") != STORE_VERSION:
+            raise ValueError(f"Unsupported case store version {index.get('version')} for {self.path}")
+        self._index: dict[str, list[int]] = index["cases"]
+
+        self._file = self.path.open("rb")
+        # mmap does not support empty files
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self._index else b""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, guid: str) -> bool:
+        return guid in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __getitem__(self, guid: str) -> dict:
+        offset, length = self._index[guid]
+        return json.loads(self._mmap[offset : offset + length])  # noqa: E203
+
+    def get(self, guid: str, default: dict = None) -> dict:
+        """
+        Returns the parsed document for a guid, or the default if it is not in the store.
+
+        Parameters
+        ----------
+        guid : str
+            The case identifier, the source file name without the '.json' suffix.
+        default : dict, optional
+            The value returned for a missing guid, by default None
+
+        Returns
+        -------
+        dict
+            The parsed case document.
+        """
+        if guid not in self._index:
+            return default
+        return self[guid]
+
+    def __del__(self):
+        # stores dropped by open_case_store are only closed once no reader holds them
+        if hasattr(self, "_mmap"):
+            self.close()
+
+    def close(self) -> None:
+        """Releases the memory map and file handle."""
+        if isinstance(self._mmap, mmap.mmap):
+            self._mmap.close()
+        self._file.close()
+
+
+def write_case_store(source_dir: Union[str, Path], store_path: Union[str, Path]) -> int:
+    """
+    Packs a directory of per-case '{guid}.json' files into a case store.
+
+    Files are found recursively; the guid of each is its path relative to source_dir without the '.json'
+    suffix, using '/' separators, so 'data/abc.json' is stored as 'data/abc' and 'abc.json' as 'abc'.
+    Each document is validated as JSON before it is written.
+
+    Parameters
+    ----------
+    source_dir : str | Path
+        The directory containing the case JSON files.
+    store_path : str | Path
+        The path of the store to write; the '.pack' suffix is added if missing.
+
+    Returns
+    -------
+    int
+        The number of cases written.
+    """
+    source_dir = Path(source_dir)
+    store_path = Path(store_path)
+    if store_path.suffix != STORE_SUFFIX:
+        store_path = store_path.with_name(store_path.name + STORE_SUFFIX)
+    store_path.parent.mkdir(parents=True, exist_ok=True)
+
+    index_path = store_path.with_suffix(INDEX_SUFFIX)
+    partial_data = store_path.with_name(store_path.name + PARTIAL_SUFFIX)
+    partial_index = index_path.with_name(index_path.name + PARTIAL_SUFFIX)
+
+    # Both files are written aside and moved into place, so a store that is open (and memory mapped) keeps
+    # reading the previous files rather than having them truncated beneath it
+    cases = {}
+    offset = 0
+    with partial_data.open("wb") as data_file:
+        for case_file in sorted(source_dir.rglob("*.json")):
+            content = case_file.read_bytes()
+            json.loads(content)  # validate before packing
+
+            guid = case_file.relative_to(source_dir).with_suffix("").as_posix()
+            data_file.write(content)
+            cases[guid] = [offset, len(content)]
+            offset += len(content)
+
+    with partial_index.open("w") as index_file:
+        json.dump({"version": STORE_VERSION, "cases": cases}, index_file)
+
+    # The old index is removed first and the new one moved in last, so an interrupted write leaves no loadable
+    # store, rather than a stale index paired with new data
+    index_path.unlink(missing_ok=True)
+    os.replace(partial_data, store_path)
+    os.replace(partial_index, index_path)
+
+    logger.info(f"Packed {len(cases)} cases from {source_dir} into {store_path}")
+    return len(cases)
+
+
+def is_case_store(path: Union[None, str, Path]) -> bool:
+    """Returns True if path points to a packed case store rather than a directory of JSON files."""
+    if not path:
+        return False
+    path = Path(path)
+    return path.suffix == STORE_SUFFIX and path.is_file() and path.with_suffix(INDEX_SUFFIX).is_file()
+
+
+OPEN_STORES_MAX = 16
+STORE_CHECK_SECONDS = 1.0
+
+_OPEN_LOCK = threading.Lock()
+_OPEN_STORES: "OrderedDict[str, tuple[tuple, float, CaseStore]]" = OrderedDict()
+
+
+def open_case_store(path: Union[str, Path]) -> CaseStore:
+    """
+    Returns a shared, open CaseStore for a path, so repeated lookups reuse one memory map.
+
+    A store rewritten since it was opened is reopened; whether it was rewritten is checked at most once every
+    STORE_CHECK_SECONDS, rather than on every lookup. The least recently used stores beyond OPEN_STORES_MAX, and
+    stores replaced by a rewrite, are dropped rather than closed, so that readers still holding them can finish;
+    they are closed once garbage collected.
+
+    Parameters
+    ----------
+    path : str | Path
+        The path to the store data file.
+
+    Returns
+    -------
+    CaseStore
+        The open store.
+    """
+    path = os.path.abspath(path)
+    now = time.monotonic()
+    with _OPEN_LOCK:
+        if path in _OPEN_STORES:
+            _, checked_at, store = _OPEN_STORES[path]
+            if now - checked_at < STORE_CHECK_SECONDS:
+                _OPEN_STORES.move_to_end(path)
+                return store
+
+    # the index is moved into place last by write_case_store, so it identifies the version of the store
+    try:
+        index_stat = os.stat(Path(path).with_suffix(INDEX_SUFFIX))
+    except FileNotFoundError as exc:
+        raise FileNotFoundError(f"No case store at {path}") from exc
+    version = (index_stat.st_ino, index_stat.st_mtime_ns)
+
+    with _OPEN_LOCK:
+        if path in _OPEN_STORES and _OPEN_STORES[path][0] == version:
+            store = _OPEN_STORES[path][2]
+        else:
+            store = CaseStore(path)
+        _OPEN_STORES[path] = (version, now, store)
+        _OPEN_STORES.move_to_end(path)
+        while len(_OPEN_STORES) > OPEN_STORES_MAX:
+            _OPEN_STORES.popitem(last=False)
+        return store
+
+
+def close_case_stores() -> None:
+    """Closes every store opened with open_case_store."""
+    with _OPEN_LOCK:
+        while _OPEN_STORES:
+            _, (_, _, store) = _OPEN_STORES.popitem()
+            store.close()
@@ -1,12 +1,23 @@
 import json
 import logging
+from enum import Enum
 from functools import wraps
-from typing import Callable, Optional
 from pathlib import Path
-from enum import Enum
+from typing import Callable, Iterable, Optional, Union
+
+from evaluation_instruments.model import PromptSet
+from evaluation_instruments.post import merge_responses
+from evaluation_instruments.prep._lru import LRUCache
+from evaluation_instruments.prep.case_store import STORE_SUFFIX, open_case_store
+from evaluation_instruments.prep.reader import JsonReader
+from evaluation_instruments.prep.template import PromptTemplate
 
 logger = logging.getLogger("evaluation")
 
+PROMPT_CACHE_SIZE = 64
+_PROMPT_CACHE = LRUCache(PROMPT_CACHE_SIZE)
+
+
 class OutputMode(Enum):
     """Defines the output mode for PDSQI-9 evaluation."""
     DEFAULT = "default"  # Use the global RETURN_EXPLANATION setting
@@ -14,6 +25,12 @@ class OutputMode(Enum):
     EXPLAINED_SCORE = "with_explanation"  # Return scores with explanations
 
 
+class PromptLayout(Enum):
+    """Defines the order of the static and case-specific content within an instrument prompt."""
+    PUBLISHED = "published"  # The layout of the original published studies, with case data before the rubric
+    CACHE_FRIENDLY = "cache_friendly"  # Rubric and instructions first, so they form a stable prefix for caching
+
+
 def _resolve_mode(mode: OutputMode, default_mode: OutputMode = OutputMode.SCORE) -> OutputMode:
     """ Substitutes the default_mode for "default" """
     # resolve default
@@ -22,6 +39,7 @@ def _resolve_mode(mode: OutputMode, default_mode: OutputMode = OutputMode.SCORE)
 
     return mode
 
+
 def resolve_instructions(instructions: list,
                          details_overrides: dict,
                          default_mode: OutputMode,
@@ -63,7 +81,12 @@ def resolve_instructions(instructions: list,
     return "\n".join([instr for instr in instructions if instr])
 
 
-def json_from_column(prompt_fn: Callable = None, namedtuple_key: str = None, data_path: Optional[str] = None):
+def json_from_column(
+    prompt_fn: Callable = None,
+    namedtuple_key: str = None,
+    data_path: Optional[str] = None,
+    reader: Optional[JsonReader] = None,
+):
     """
     Handles reading a JSON file from a specified path then passing the contents to
     the relevant function. Allows the original function to act as if the JSON file
@@ -80,36 +103,68 @@ def json_from_column(prompt_fn: Callable = None, namedtuple_key: str = None, dat
         The key to access the filename in the namedtuple, by default None
     data_path : str, optional
         The path to the directory containing the JSON file, by default None
+        May instead be the path to a packed case store (see write_case_store), ending in '.pack', in which case
+        the value in the column is looked up as a guid within the store. The store is opened on the first row,
+        raising FileNotFoundError if it does not exist.
+    reader : JsonReader, optional
+        A caching reader to load files through, by default None to read each file directly.
+        When provided, the wrapped function exposes 'prefetch' and 'read_ahead' so the evaluation loop
+        can load the files of upcoming rows in the background.
     """
     if namedtuple_key is None:
         raise ValueError("namedtuple_key must be provided")
 
+    # a store is recognized by its suffix rather than by its files, which may be written after decoration;
+    # a store that is still missing when a row is read raises rather than reading every row as empty
+    packed = bool(data_path) and Path(data_path).suffix == STORE_SUFFIX
+
+    def resolve_path(sample: "namedtuple") -> Optional[Path]:
+        filename = Path(getattr(sample, namedtuple_key))
+        if not filename:
+            return None
+
+        filename = filename.with_suffix(".json")
+        if data_path:
+            filename = Path(data_path) / filename
+        return filename
+
     def decorator(fn):
         @wraps(fn)
-        def wrapped(sample: "namedtuple"):
+        def wrapped(sample: "namedtuple", **kwargs):
             """
             The sample is expected to be a namedtuple with the key specified by namedtuple_key.
 
             This is passed in by the evaluation loop when using file descriptors to the data.
+            Any keyword arguments, such as rubric_keys, are passed through to the wrapped function.
             """
 
             # Get the file path from the namedtuple using the key
-            filename = Path(getattr(sample, namedtuple_key))
-            if not filename:
-                return fn(filename)
-
-            filename = filename.with_suffix(".json")
-            if data_path:
-                filename = Path(data_path) / filename
-
-            if not filename.is_file():
+            filename = resolve_path(sample)
+            if filename is None:
+                return fn(Path(getattr(sample, namedtuple_key)), **kwargs)
+
+            if packed:
+                guid = Path(getattr(sample, namedtuple_key)).with_suffix("").as_posix()
+                raw_json = open_case_store(data_path).get(guid, {})
+            elif reader is not None:
+                raw_json = reader.read(filename)
+            elif not filename.is_file():
                 raw_json = {}
             else:  # Open the file and read its contents
                 with filename.open("r") as file:
                     raw_json = json.load(file)
 
             # Call the original function with the file contents
-            return fn(raw_json)
+            return fn(raw_json, **kwargs)
+
+        if reader is not None and not packed:
+
+            def prefetch(sample: "namedtuple"):
+                if (filename := resolve_path(sample)) is not None:
+                    reader.prefetch([filename])
+
+            wrapped.prefetch = prefetch
+            wrapped.read_ahead = reader.read_ahead
 
         return wrapped
 
@@ -154,6 +209,73 @@ def to_user_messages(prompt_fn: Callable = None, system_message: Optional[str] =
     return decorator
 
 
+def partition_rubrics(rubric_library: dict, groups: int) -> list[list[str]]:
+    """
+    Splits the keys of a rubric library into contiguous groups of near-equal size.
+
+    Parameters
+    ----------
+    rubric_library : dict
+        A dictionary mapping rubric keys to their descriptions.
+    groups : int
+        The number of groups; capped at the number of rubrics.
+
+    Returns
+    -------
+    list[list[str]]
+        The rubric keys of each group, in library order.
+    """
+    if groups < 1:
+        raise ValueError("groups must be at least 1")
+
+    keys = list(rubric_library)
+    groups = min(groups, len(keys)) or 1
+    size, extra = divmod(len(keys), groups)
+    partitions, start = [], 0
+    for ix in range(groups):
+        stop = start + size + (ix < extra)
+        partitions.append(keys[start:stop])
+        start = stop
+    return partitions
+
+
+def split_rubrics(prompt_fn: Callable = None, rubric_groups: Optional[list[list[str]]] = None):
+    """
+    Handles resolving a separate prompt for each group of rubrics, so the groups can be graded concurrently.
+
+    The wrapped function is called once per group with a rubric_keys keyword argument, and the prompts are
+    returned as a PromptSet that Evaluation sends in parallel, merging the per-criterion responses into one.
+    Each request then only generates the output for its own criteria, so the latency of a case is bounded by
+    its slowest group rather than the full output length.
+
+    Can be used as a decorator or as a function.
+
+    Parameters
+    ----------
+    prompt_fn : Callable
+        Function resolving a prompt, accepting a rubric_keys keyword argument, by default None
+        When used as a decorator, this is implicitly the target function.
+    rubric_groups : list[list[str]]
+        The rubric keys of each request, ex. from partition_rubrics.
+    """
+    if not rubric_groups:
+        raise ValueError("rubric_groups must be provided")
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapped(*args, **kwargs):
+            prompts = [fn(*args, rubric_keys=list(keys), **kwargs) for keys in rubric_groups]
+            return PromptSet(prompts, merge_responses, {"rubric_groups": rubric_groups})
+
+        return wrapped
+
+    # When using as a function pass, wrap the first argument
+    if callable(prompt_fn):
+        return decorator(prompt_fn)
+    # When using as a decorator, the caller will apply it to the target function
+    return decorator
+
+
 def prompt_compilation(
     prompt_pattern: str, pattern_kwargs: dict, rubric_library: dict, rubric_keys: Optional[list] = None
 ) -> str:
@@ -183,17 +305,168 @@ def prompt_compilation(
         The formatted prompt template with the specified rubrics included.
         Ready to resolve into a specific prompt via string.format
     """
-    if rubric_keys is None:
-        rubrics = "\n".join(list(rubric_library.values()))
-    else:
-        good_keys = [k for k in rubric_keys if rubric_library.get(k) is not None]
-        if len(good_keys) < len(rubric_keys):
-            logger.warning(
-                f"Requested rubric keys not found, omitting: {', '.join(set(rubric_keys) - set(good_keys))}"
-            )
-        rubrics = "\n".join([rubric_library[k] for k in good_keys])
+    rubrics = _resolve_rubrics(rubric_library, rubric_keys)
     if rubrics:
         pattern_kwargs["RUBRIC_SET"] = rubrics
     general_prompt = prompt_pattern.format(**pattern_kwargs)
 
     return general_prompt
+
+
+def _resolve_rubrics(rubric_library: dict, rubric_keys: Optional[list] = None) -> str:
+    """Joins the requested rubrics from the library, or all when no keys are provided."""
+    if rubric_keys is None:
+        return "\n".join(list(rubric_library.values()))
+
+    good_keys = [k for k in rubric_keys if rubric_library.get(k) is not None]
+    if len(good_keys) < len(rubric_keys):
+        logger.warning(f"Requested rubric keys not found, omitting: {', '.join(set(rubric_keys) - set(good_keys))}")
+    return "\n".join([rubric_library[k] for k in good_keys])
+
+
+def compile_instrument_prompt(
+    instrument: str,
+    prompt_pattern: str,
+    pattern_kwargs: dict,
+    rubric_library: dict,
+    instructions: list,
+    details_overrides: dict,
+    default_mode: OutputMode,
+    mode: OutputMode = OutputMode.DEFAULT,
+    rubric_keys: Optional[list] = None,
+) -> PromptTemplate:
+    """
+    Compiles and caches the case-independent portion of an instrument prompt.
+
+    Resolves the rubric set and instructions, as prompt_compilation and resolve_instructions do, into a
+    PromptTemplate whose 'instruction_set' is already filled so that only case-specific slots remain to render.
+    Results are memoized in a bounded LRU keyed by instrument, resolved mode, rubric_keys, and pattern_kwargs;
+    the prompt pattern, rubric library, and instructions are assumed to be fixed for a given instrument name.
+
+    Parameters
+    ----------
+    instrument : str
+        A unique name for the instrument, used as part of the cache key.
+    prompt_pattern : str
+        The doubly-resolved prompt pattern, see prompt_compilation and PromptTemplate.doubly_resolved.
+    pattern_kwargs : dict
+        The keyword arguments for the first format pass; must be hashable values.
+    rubric_library : dict
+        A dictionary mapping rubric keys to their descriptions.
+    instructions : list
+        An ordered list of instructions to use in the prompt.
+    details_overrides : dict
+        A dictionary mapping line indices to their detailed instruction overrides.
+    default_mode : OutputMode
+        The output mode to use if 'default' is specified, should be set by the instrument.
+    mode : OutputMode, optional
+        The output mode to use for resolving instructions, by default 'default'
+    rubric_keys : Optional[list], optional
+        A list of keys to specify which rubrics to include, by default None for all.
+
+    Returns
+    -------
+    PromptTemplate
+        The prompt template with rubrics and instructions resolved, ready to render the case-specific slots.
+    """
+    mode = _resolve_mode(mode, default_mode)
+    key = (
+        instrument,
+        mode,
+        None if rubric_keys is None else tuple(rubric_keys),
+        tuple(sorted(pattern_kwargs.items())),
+    )
+
+    def compile_pattern():
+        level_kwargs = dict(pattern_kwargs)
+        if rubrics := _resolve_rubrics(rubric_library, rubric_keys):
+            level_kwargs["RUBRIC_SET"] = rubrics
+        instruction_set = resolve_instructions(instructions, details_overrides, default_mode, mode)
+        return PromptTemplate.doubly_resolved(prompt_pattern, **level_kwargs).partial(instruction_set=instruction_set)
+
+    return _PROMPT_CACHE.get_or_compute(key, compile_pattern)
+
+
+def prompt_cache_info() -> dict:
+    """Returns the hit, miss, and size statistics of the compiled prompt cache."""
+    return _PROMPT_CACHE.info()
+
+
+def clear_prompt_cache() -> None:
+    """Empties the compiled prompt cache, ex. after editing an instrument's rubric library in place."""
+    _PROMPT_CACHE.clear()
+
+
+def compile_sections(
+    sample: dict,
+    exclude: Iterable[str] = (),
+    joined_keys: Iterable[str] = (),
+    section_budget: Union[None, int, dict] = None,
+    length_fn: Callable[[str], int] = len,
+) -> str:
+    """
+    Builds a clinical data block from a case's sections in a single pass.
+
+    Each non-empty section is written as a "key:" header followed by one "[id] = value" line per entry,
+    or, for joined_keys, a single comma-separated line of the entries. An optional budget caps the size of
+    each section deterministically: entries are kept in order until the next would exceed the budget, and the
+    remainder is replaced by a single omission marker.
+
+    Parameters
+    ----------
+    sample : dict
+        The case, mapping section names to a dict of entries (or a list, for joined_keys).
+    exclude : Iterable[str], optional
+        Keys that are not clinical data, such as the output being evaluated, by default ()
+    joined_keys : Iterable[str], optional
+        Keys whose entries are written comma-separated on a single line, by default ()
+    section_budget : int | dict, optional
+        The maximum size of the entries within each section, by default None (unbounded).
+        An int applies to every section; a dict maps section names to their budget, leaving others unbounded.
+    length_fn : Callable[[str], int], optional
+        Measures the size of an entry, by default len for characters. Pass a token counter for token budgets.
+
+    Returns
+    -------
+    str
+        The compiled clinical data.
+    """
+    exclude, joined_keys = set(exclude), set(joined_keys)
+    parts = []
+    for key in sample.keys():
+        if key in exclude or not sample[key]:
+            continue
+        budget = section_budget.get(key) if isinstance(section_budget, dict) else section_budget
+
+        parts.append(f"{key}:\n")
+        if key in joined_keys:
+            entries = [str(entry) for entry in sample[key]]
+            kept = _within_budget(entries, budget, length_fn, separator_length=length_fn(", "))
+            parts.append(", ".join(entries[:kept]))
+            if kept < len(entries):
+                parts.append(_omission(len(entries) - kept, leading=", " if kept else ""))
+        else:
+            entries = [f"[{id}] = {value}\n" for id, value in sample[key].items()]
+            kept = _within_budget(entries, budget, length_fn)
+            parts.extend(entries[:kept])
+            if kept < len(entries):
+                parts.append(_omission(len(entries) - kept) + "\n")
+
+    return "".join(parts)
+
+
+def _within_budget(entries: list[str], budget: Optional[int], length_fn: Callable, separator_length: int = 0) -> int:
+    """Returns how many leading entries fit within the budget."""
+    if budget is None:
+        return len(entries)
+
+    used = 0
+    for kept, entry in enumerate(entries):
+        used += length_fn(entry) + (separator_length if kept else 0)
+        if used > budget:
+            return kept
+    return len(entries)
+
+
+def _omission(count: int, leading: str = "") -> str:
+    return f"{leading}[... {count} more {'entry' if count == 1 else 'entries'} omitted]"
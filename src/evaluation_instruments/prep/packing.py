@@ -0,0 +1,90 @@
+import logging
+from typing import Optional
+
+from evaluation_instruments.prep.tokens import TokenCounter
+
+logger = logging.getLogger("evaluation")
+
+TRUNCATION_MARKER = " [...truncated to fit context]"
+OMISSION_MARKER = "[omitted to fit context]"
+PACKING_STRATEGIES = ("recent", "proportional")
+
+
+def pack_texts(
+    texts: list[str],
+    budget: int,
+    strategy: str = "recent",
+    token_counter: Optional[TokenCounter] = None,
+) -> tuple[list[str], dict]:
+    """
+    Fits a list of texts, such as source notes, within a shared token budget.
+
+    The number and order of texts is preserved so identifiers such as note citations remain valid;
+    texts that do not fit are shortened from the end, or replaced by a marker when no budget remains.
+
+    Strategies:
+    - "recent": the texts are assumed to be in chronological order, and the budget is given to the most
+      recent (last) texts first, so older texts are the ones truncated or omitted.
+    - "proportional": each text is allotted a share of the budget proportional to its size,
+      so every text is shortened by the same fraction.
+
+    Parameters
+    ----------
+    texts : list[str]
+        The texts to pack.
+    budget : int
+        The total tokens available across all texts.
+    strategy : str, optional
+        The allocation strategy, one of "recent" or "proportional", by default "recent"
+    token_counter : TokenCounter, optional
+        Counts and truncates the texts, by default None to use the character heuristic.
+
+    Returns
+    -------
+    tuple[list[str], dict]
+        The packed texts, and a report with the budget, the original and packed token counts, and the
+        zero-based positions of texts that were truncated or omitted.
+    """
+    if strategy not in PACKING_STRATEGIES:
+        raise ValueError(f"Unknown packing strategy '{strategy}'; expected one of {', '.join(PACKING_STRATEGIES)}")
+
+    counter = token_counter or TokenCounter()
+    counts = [counter.count(text) for text in texts]
+    total = sum(counts)
+
+    if total <= budget:
+        allotments = counts
+    elif strategy == "recent":
+        allotments, remaining = [0] * len(texts), budget
+        for ix in reversed(range(len(texts))):
+            allotments[ix] = min(counts[ix], remaining)
+            remaining -= allotments[ix]
+    else:
+        allotments = [count * budget // total for count in counts]
+
+    packed, truncated, omitted = [], [], []
+    for ix, (text, count, allotment) in enumerate(zip(texts, counts, allotments)):
+        if allotment >= count:
+            packed.append(text)
+            continue
+
+        shortened = counter.truncate(text, allotment)
+        if shortened:
+            packed.append(shortened + TRUNCATION_MARKER)
+            truncated.append(ix)
+        else:
+            packed.append(OMISSION_MARKER)
+            omitted.append(ix)
+
+    if truncated or omitted:
+        logger.debug(f"Packed {len(texts)} texts into {budget} tokens; truncated {truncated}, omitted {omitted}")
+
+    report = {
+        "budget": budget,
+        "strategy": strategy,
+        "original_tokens": total,
+        "packed_tokens": sum(min(count, allotment) for count, allotment in zip(counts, allotments)),
+        "truncated": truncated,
+        "omitted": omitted,
+    }
+    return packed, report
@@ -0,0 +1,206 @@
+import copy
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, Iterator, Union
+
+from evaluation_instruments.prep._lru import LRUCache
+
+logger = logging.getLogger("evaluation")
+
+
+class JsonReader:
+    """
+    A caching, read-ahead loader for the per-case JSON files used by json_from_column.
+
+    Parsed documents are kept in a bounded LRU keyed by path and modification time, so an edited file is
+    re-read while repeated rows are served from memory. Files can be requested ahead of time with prefetch,
+    which loads them on a background thread pool; a later read waits on the in-flight load rather than
+    reading the file again, as does a concurrent read of a file another read is already loading. Each read
+    returns its own copy of the document, so callers may edit it without affecting the cache.
+
+    Missing files are read as an empty dictionary, matching json_from_column.
+
+    Parameters
+    ----------
+    maxsize : int, optional
+        The maximum number of parsed documents to retain, by default 256
+        Should exceed read_ahead so prefetched documents are not evicted before they are read.
+    read_ahead : int, optional
+        The number of upcoming rows the evaluation loop should prefetch, by default 8
+    max_workers : int, optional
+        The number of background threads for prefetching, by default 4
+    """
+
+    def __init__(self, maxsize: int = 256, read_ahead: int = 8, max_workers: int = 4):
+        if maxsize <= read_ahead:
+            logger.warning(f"JsonReader maxsize {maxsize} <= read_ahead {read_ahead}; prefetches may be evicted.")
+        self.read_ahead = read_ahead
+        self.max_workers = max_workers
+
+        self._cache = LRUCache(maxsize)
+        self._pending: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+        self._waits = 0
+        self._loads = 0
+        self._load_seconds = 0.0
+        self._prefetched = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def read(self, path: Union[str, Path]) -> dict:
+        """
+        Returns the parsed contents of a JSON file, from cache when unchanged on disk.
+
+        Parameters
+        ----------
+        path : str | Path
+            The path to the JSON file.
+
+        Returns
+        -------
+        dict
+            A copy of the parsed document, or an empty dict if the file does not exist.
+        """
+        path = str(path)
+        with self._lock:
+            pending = self._pending.get(path)
+            owner = pending is None
+            if owner:
+                key = _cache_key(path)
+                if key is None:
+                    return {}
+                cached = self._cache.get(key)
+                if cached is None:
+                    # claim the load, so concurrent reads of the same file wait on this one
+                    pending = self._pending[path] = Future()
+            else:
+                self._waits += 1
+
+        if pending is None:
+            document = cached
+        elif owner:
+            try:
+                document = self._load(path, key)
+            except BaseException as exc:
+                pending.set_exception(exc)
+                raise
+            pending.set_result(document)
+        else:
+            document = pending.result()
+        # copied so that a caller editing its document cannot alter the cached one
+        return copy.deepcopy(document)
+
+    def prefetch(self, paths: Iterable[Union[str, Path]]) -> None:
+        """
+        Schedules background loads for files that are not already cached or in flight.
+
+        Parameters
+        ----------
+        paths : Iterable[str | Path]
+            The paths expected to be read soon.
+        """
+        for path in map(str, paths):
+            with self._lock:
+                if path in self._pending:
+                    continue
+                key = _cache_key(path)
+                if key is None or key in self._cache:
+                    continue
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="json-reader")
+                self._pending[path] = self._executor.submit(self._load, path, key)
+                self._prefetched += 1
+
+    def stats(self) -> dict:
+        """
+        Returns cache and load statistics.
+
+        Returns
+        -------
+        dict
+            hits (including reads that waited on an in-flight prefetch), misses, size, and maxsize of the cache,
+            plus the number of files loaded and prefetched, the total load time in seconds, and the mean load
+            latency in milliseconds.
+        """
+        stats = self._cache.info()
+        stats["hits"] += self._waits
+        stats.update(
+            loads=self._loads,
+            prefetched=self._prefetched,
+            load_seconds=self._load_seconds,
+            mean_load_ms=1000 * self._load_seconds / self._loads if self._loads else 0.0,
+        )
+        return stats
+
+    def close(self) -> None:
+        """Waits for in-flight prefetches and stops the background threads."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _load(self, path: str, key: tuple) -> dict:
+        start = time.perf_counter()
+        try:
+            try:
+                with open(path, "r") as file:
+                    raw_json = json.load(file)
+            except FileNotFoundError:
+                raw_json = {}
+            # cached before the load stops being pending, so a read in between cannot miss both and load again
+            self._cache.put(key, raw_json)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._loads += 1
+                self._load_seconds += elapsed
+                self._pending.pop(path, None)
+        logger.debug(f"Loaded {path} in {1000 * elapsed:.1f}ms")
+        return raw_json
+
+
+def _cache_key(path: str):
+    """Returns the (path, mtime) cache key for an existing file, or None if it is missing."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return path, stat.st_mtime_ns
+
+
+def read_ahead(rows: Iterable, prefetch: callable, depth: int) -> Iterator:
+    """
+    Yields rows in order while calling prefetch on each row once it is within depth of being yielded.
+
+    Parameters
+    ----------
+    rows : Iterable
+        The rows to iterate, ex. DataFrame.itertuples().
+    prefetch : callable
+        Called with each upcoming row, ex. to schedule its file load.
+    depth : int
+        How many rows ahead of the current row to prefetch.
+
+    Yields
+    ------
+    row
+        The next row, in the original order.
+    """
+    buffer = deque()
+    for row in rows:
+        prefetch(row)
+        buffer.append(row)
+        if len(buffer) > depth:
+            yield buffer.popleft()
+    yield from buffer
@@ -0,0 +1,230 @@
+import math
+import re
+from functools import wraps
+from typing import Callable, Iterable, Optional, Union
+
+from evaluation_instruments.model import PromptMessages
+from evaluation_instruments.prep.data_handler import OutputMode, _resolve_mode
+
+# A rubric criterion opens with its key on its own line, ex. <citation>, and lists its grades as "1 = ..."
+CRITERION_PATTERN = re.compile(r"^<(\w+)>\s*$(.*?)^<\\\1>", flags=re.MULTILINE | re.DOTALL)
+GRADE_PATTERN = re.compile(r"^\s*(\w+)\s*=", flags=re.MULTILINE)
+
+SCORE_TOKENS = 4  # a key, its grade, and the punctuation around them
+EXPLANATION_TOKENS = 150
+
+# The prompt metadata holding the schema of a prompt's own response, used in place of an Evaluation's response_schema
+SCHEMA_METADATA_KEY = "response_schema"
+
+
+def rubric_grades(rubric: Union[str, Iterable[str]]) -> dict[str, list]:
+    """
+    Finds the grades of each criterion of a rubric, in rubric order.
+
+    Parameters
+    ----------
+    rubric : str | Iterable[str]
+        The rubric text, such as a RUBRIC_SET, or the texts of each criterion, such as the values of a rubric
+        library. Each criterion is delimited by <key> and <\\key> lines and lists its grades as "grade = ...".
+
+    Returns
+    -------
+    dict[str, list]
+        The grades of each criterion, as int where numeric, ex. {"synthesized": ["NA", 1, 2, 3, 4, 5]}.
+    """
+    text = rubric if isinstance(rubric, str) else "\n".join(rubric)
+    return {
+        key: [int(grade) if grade.isdigit() else grade for grade in GRADE_PATTERN.findall(body.split("GRADES:")[-1])]
+        for key, body in CRITERION_PATTERN.findall(text)
+    }
+
+
+def rubric_schema(
+    grades: Union[dict[str, list], Iterable[str]],
+    mode: OutputMode = OutputMode.DEFAULT,
+    default_mode: OutputMode = OutputMode.SCORE,
+) -> dict:
+    """
+    Builds the JSON schema of a response grading every criterion of a rubric.
+
+    Parameters
+    ----------
+    grades : dict[str, list] | Iterable[str]
+        The grades of each criterion, as from rubric_grades, or only the criteria keys to allow any integer.
+    mode : OutputMode, optional
+        The output mode of the prompt, by default OutputMode.DEFAULT
+    default_mode : OutputMode, optional
+        The mode that OutputMode.DEFAULT resolves to, ex. the instrument's OUTPUT_MODE, by default SCORE
+
+    Returns
+    -------
+    dict
+        A JSON schema for an object with exactly the criteria as keys, each a grade, or for
+        OutputMode.EXPLAINED_SCORE an object of an explanation and a score.
+    """
+    grades = grades if isinstance(grades, dict) else dict.fromkeys(grades)
+    explained = _resolve_mode(mode, default_mode) == OutputMode.EXPLAINED_SCORE
+
+    properties = {}
+    for key, criterion_grades in grades.items():
+        score = _grade_schema(criterion_grades)
+        if explained:
+            score = _object_schema({"explanation": {"type": "string"}, "score": score})
+        properties[key] = score
+    return _object_schema(properties)
+
+
+def with_response_schema(prompt_fn: Callable = None, schema_fn: Optional[Callable] = None):
+    """
+    Handles attaching the JSON schema of a prompt's response, for prompts whose response differs from the
+    others of an evaluation, such as one group of rubrics of split_rubrics or a packed prompt.
+
+    The messages are returned as a PromptMessages with the schema as its 'response_schema' metadata, which
+    Evaluation sends and validates in place of its response_schema.
+
+    Can be used as a decorator or as a function.
+
+    Parameters
+    ----------
+    prompt_fn : Callable
+        Function resolving a message array, by default None
+        When used as a decorator, this is implicitly the target function.
+    schema_fn : Callable
+        Called with the same arguments as prompt_fn, returning the schema of the response to its prompt,
+        ex. an instrument's response_schema for the rubric_keys.
+    """
+    if schema_fn is None:
+        raise ValueError("schema_fn must be provided")
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapped(*args, **kwargs):
+            messages = fn(*args, **kwargs)
+            metadata = {**getattr(messages, "metadata", {}), SCHEMA_METADATA_KEY: schema_fn(*args, **kwargs)}
+            return PromptMessages(messages, metadata)
+
+        return wrapped
+
+    # When using as a function pass, wrap the first argument
+    if callable(prompt_fn):
+        return decorator(prompt_fn)
+    # When using as a decorator, the caller will apply it to the target function
+    return decorator
+
+
+def response_format(schema: dict, name: str = "rubric_grades") -> dict:
+    """
+    Wraps a JSON schema as a structured output response_format, for the model_args of an Evaluation.
+
+    Parameters
+    ----------
+    schema : dict
+        The JSON schema of the response, as from rubric_schema.
+    name : str, optional
+        The name of the schema reported to the provider, by default "rubric_grades"
+
+    Returns
+    -------
+    dict
+        The OpenAI-style response_format, with strict adherence to the schema.
+    """
+    return {"type": "json_schema", "json_schema": {"name": name, "schema": schema, "strict": True}}
+
+
+def validate_response(response, schema: dict, path: str = "$") -> list[str]:
+    """
+    Checks a parsed response against a JSON schema from rubric_schema, without altering it.
+
+    Only the parts of JSON schema used by rubric_schema are checked: object properties, required and
+    additional keys, and the type or enum of each value.
+
+    Parameters
+    ----------
+    response : Any
+        The parsed response.
+    schema : dict
+        The JSON schema to check against.
+    path : str, optional
+        The location of the response, for error messages, by default "$"
+
+    Returns
+    -------
+    list[str]
+        A description of each violation, empty when the response is valid.
+    """
+    if "enum" in schema:
+        # compare with types, as the JSON grade 1 is valid but true is not
+        if not any(type(response) is type(value) and response == value for value in schema["enum"]):
+            return [f"{path}: {response!r} is not one of {schema['enum']}"]
+        return []
+
+    expected = schema.get("type")
+    if expected == "object":
+        if not isinstance(response, dict):
+            return [f"{path}: expected an object"]
+        properties = schema.get("properties", {})
+        errors = [f"{path}: missing '{key}'" for key in schema.get("required", []) if key not in response]
+        if schema.get("additionalProperties") is False:
+            errors += [f"{path}: unexpected '{key}'" for key in response if key not in properties]
+        for key, value in response.items():
+            if key in properties:
+                errors += validate_response(value, properties[key], f"{path}.{key}")
+        return errors
+    if expected == "integer" and (not isinstance(response, int) or isinstance(response, bool)):
+        return [f"{path}: expected an integer"]
+    if expected == "string" and not isinstance(response, str):
+        return [f"{path}: expected a string"]
+    return []
+
+
+def schema_max_tokens(
+    schema: dict, explanation_tokens: int = EXPLANATION_TOKENS, counter=None, margin: float = 1.25
+) -> int:
+    """
+    Sizes the completion token limit of a request from the JSON schema of its response.
+
+    Parameters
+    ----------
+    schema : dict
+        The JSON schema of the response, as from rubric_schema.
+    explanation_tokens : int, optional
+        The tokens allowed for each free-text explanation, by default 150
+    counter : TokenCounter, optional
+        Counts the tokens of each key, by default None to assume SCORE_TOKENS per criterion.
+    margin : float, optional
+        A multiplier for the estimate, to allow for whitespace and tokenization, by default 1.25
+
+    Returns
+    -------
+    int
+        The max_tokens for a request whose response follows the schema.
+    """
+    return math.ceil(_schema_tokens(schema, explanation_tokens, counter) * margin)
+
+
+def _schema_tokens(schema: dict, explanation_tokens: int, counter=None) -> int:
+    if schema.get("type") == "object":
+        return 2 + sum(
+            (counter.count(f'"{key}": ') if counter is not None else SCORE_TOKENS)
+            + _schema_tokens(value, explanation_tokens, counter)
+            for key, value in schema.get("properties", {}).items()
+        )
+    if schema.get("type") == "string":
+        return explanation_tokens
+    return 1
+
+
+def _grade_schema(grades: Optional[list]) -> dict:
+    if not grades:
+        return {"type": "integer"}
+    return {"enum": list(grades)}
+
+
+def _object_schema(properties: dict) -> dict:
+    # strict structured outputs require every property and no others
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False,
+    }
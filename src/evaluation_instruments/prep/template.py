@@ -0,0 +1,227 @@
+from string import Formatter
+from typing import IO, Iterable, Iterator, Optional, Union
+
+SlotValue = Union[str, Iterable[str]]
+
+
+class _Slot:
+    """A named placeholder within a parsed template."""
+
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __repr__(self):
+        return f"_Slot({self.name!r})"
+
+
+class _Filled(str):
+    """A literal segment that came from a substituted value, and so is never re-parsed."""
+
+
+class PromptTemplate:
+    """
+    A prompt pattern parsed once into static segments and named slots.
+
+    Patterns use the same syntax as str.format, where {name} is a slot and {{ or }} are literal braces,
+    so existing instrument prompts can be used unchanged. Unlike str.format, the pattern is only parsed
+    on construction and rendering is a single join. Substituted values are always treated as opaque text,
+    so braces within clinical data or rubric examples are never interpreted and need no escaping.
+
+    Format specs, conversions, and attribute or index lookups (ex. {name!r}, {name:>5}, {name.attr})
+    are not supported.
+
+    Parameters
+    ----------
+    pattern : str
+        The prompt pattern to parse.
+    """
+
+    def __init__(self, pattern: str = ""):
+        self._segments: tuple = tuple(_merge(_parse(pattern)))
+
+    @classmethod
+    def _from_segments(cls, segments: Iterable) -> "PromptTemplate":
+        template = cls()
+        template._segments = tuple(_merge(segments))
+        return template
+
+    @classmethod
+    def doubly_resolved(cls, pattern: str, **values: str) -> "PromptTemplate":
+        """
+        Parses a doubly-resolved pattern, filling the first level and leaving the second level as slots.
+
+        This matches the two str.format passes of prompt_compilation, where {NAME} fields are filled with
+        the use-case values and {{name}} fields remain for the case being evaluated. Filled values are not
+        re-parsed in the second level, so braces in rubric text are safe.
+
+        Parameters
+        ----------
+        pattern : str
+            The doubly-resolved prompt pattern.
+        **values : str
+            The values for the first-level fields.
+
+        Returns
+        -------
+        PromptTemplate
+            The template with first-level fields filled and second-level slots open.
+        """
+        segments = []
+        for segment in cls(pattern).partial(**values)._segments:
+            if isinstance(segment, str) and not isinstance(segment, _Filled):
+                segments.extend(_parse(segment))
+            else:
+                segments.append(segment)
+        return cls._from_segments(segments)
+
+    @property
+    def fields(self) -> tuple[str, ...]:
+        """The names of the open slots, in order of first appearance."""
+        return tuple(dict.fromkeys(seg.name for seg in self._segments if isinstance(seg, _Slot)))
+
+    def __repr__(self):
+        return f"PromptTemplate(fields={self.fields!r})"
+
+    def partial(self, **values: str) -> "PromptTemplate":
+        """
+        Returns a new template with the given slots filled and all others left open.
+
+        Parameters
+        ----------
+        **values : str
+            The values for a subset of the slots.
+
+        Returns
+        -------
+        PromptTemplate
+            A template with fewer open slots.
+        """
+        return self._from_segments(
+            _Filled(values[seg.name]) if isinstance(seg, _Slot) and seg.name in values else seg
+            for seg in self._segments
+        )
+
+    def iter_render(self, **values: SlotValue) -> Iterator[str]:
+        """
+        Yields the rendered prompt as a series of string chunks without joining them.
+
+        A slot value may be an iterable of strings, such as a generator over a large set of notes,
+        which is streamed through in order.
+
+        Parameters
+        ----------
+        **values : str | Iterable[str]
+            The values for every open slot.
+
+        Yields
+        ------
+        str
+            The next chunk of the prompt.
+
+        Raises
+        ------
+        KeyError
+            If a value is not provided for an open slot.
+        """
+        for seg in self._segments:
+            if not isinstance(seg, _Slot):
+                yield seg
+                continue
+
+            value = values[seg.name]
+            if isinstance(value, str):
+                yield value
+            else:
+                yield from value
+
+    def render(self, **values: SlotValue) -> str:
+        """
+        Renders the prompt, filling every open slot.
+
+        Parameters
+        ----------
+        **values : str | Iterable[str]
+            The values for every open slot.
+
+        Returns
+        -------
+        str
+            The resolved prompt.
+
+        Raises
+        ------
+        KeyError
+            If a value is not provided for an open slot.
+        """
+        return "".join(self.iter_render(**values))
+
+    def render_bytes(self, encoding: str = "utf-8", **values: SlotValue) -> bytes:
+        """
+        Renders the prompt as encoded bytes, ex. for a request body.
+
+        Parameters
+        ----------
+        encoding : str, optional
+            The text encoding, by default "utf-8"
+        **values : str | Iterable[str]
+            The values for every open slot.
+
+        Returns
+        -------
+        bytes
+            The encoded prompt.
+        """
+        return b"".join(chunk.encode(encoding) for chunk in self.iter_render(**values))
+
+    def write(self, stream: IO, encoding: Optional[str] = None, **values: SlotValue) -> int:
+        """
+        Writes the rendered prompt to a text or binary stream chunk by chunk.
+
+        Parameters
+        ----------
+        stream : IO
+            A writable text stream, or binary stream when encoding is provided.
+        encoding : str, optional
+            The encoding to apply before writing, by default None for text streams.
+        **values : str | Iterable[str]
+            The values for every open slot.
+
+        Returns
+        -------
+        int
+            The number of characters, or bytes when encoding, written.
+        """
+        written = 0
+        for chunk in self.iter_render(**values):
+            written += stream.write(chunk if encoding is None else chunk.encode(encoding))
+        return written
+
+
+def _parse(pattern: str) -> Iterator:
+    """Splits a str.format-style pattern into literal strings and _Slot placeholders."""
+    for literal, field, spec, conversion in Formatter().parse(pattern):
+        if literal:
+            yield literal
+        if field is None:
+            continue
+        if spec or conversion or not field.isidentifier():
+            raise ValueError(f"Unsupported template field '{{{field}}}'; only plain names are supported.")
+        yield _Slot(field)
+
+
+def _merge(segments: Iterable) -> Iterator:
+    """Collapses adjacent plain literals; filled values are kept separate so they are never re-parsed."""
+    pending = []
+    for seg in segments:
+        if isinstance(seg, str) and not isinstance(seg, _Filled):
+            pending.append(seg)
+            continue
+        if pending:
+            yield "".join(pending)
+            pending = []
+        if not (isinstance(seg, str) and not seg):
+            yield seg
+    if pending:
+        yield "".join(pending)
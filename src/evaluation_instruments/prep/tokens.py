@@ -0,0 +1,166 @@
+import math
+from typing import Callable, Iterable, Optional, Sequence, Union
+
+from evaluation_instruments.model import TokenUsage
+from evaluation_instruments.prep._lru import LRUCache
+
+SEGMENT_SEPARATOR = "\n\n"
+
+
+class TokenCounter:
+    """
+    Estimates prompt sizes offline, before any request is sent.
+
+    Counting uses a pluggable tokenizer when one is provided, such as tiktoken's Encoding.encode or a
+    HuggingFace tokenizer's encode, and otherwise falls back to a character-ratio heuristic.
+    Long texts are split into blank-line delimited segments and each segment's count is cached by its hash,
+    so static content shared across prompts, such as rubrics and instructions, is only tokenized once.
+
+    Counts are estimates: tokenizers do not split exactly at segment boundaries, and chat formats add a
+    small per-message overhead that varies by provider.
+
+    Parameters
+    ----------
+    tokenizer : Callable[[str], int | Sequence], optional
+        Returns a token count, or the tokens themselves, for a text; by default None to use the heuristic.
+    chars_per_token : float, optional
+        The characters per token assumed by the heuristic, by default 4.0
+    message_overhead : int, optional
+        Tokens added per chat message for role and formatting, by default 4
+    cache_size : int, optional
+        The maximum number of segment counts to cache, by default 4096
+    """
+
+    def __init__(
+        self,
+        tokenizer: Optional[Callable[[str], Union[int, Sequence]]] = None,
+        chars_per_token: float = 4.0,
+        message_overhead: int = 4,
+        cache_size: int = 4096,
+    ):
+        self.tokenizer = tokenizer
+        self.chars_per_token = chars_per_token
+        self.message_overhead = message_overhead
+        self._cache = LRUCache(cache_size)
+
+    def count(self, text: str) -> int:
+        """
+        Estimates the number of tokens in a text.
+
+        Parameters
+        ----------
+        text : str
+            The text to count.
+
+        Returns
+        -------
+        int
+            The estimated token count.
+        """
+        if not text:
+            return 0
+        if self.tokenizer is None:
+            return math.ceil(len(text) / self.chars_per_token)
+
+        segments = text.split(SEGMENT_SEPARATOR)
+        total = self._count_segment(SEGMENT_SEPARATOR) * (len(segments) - 1)
+        return total + sum(self._count_segment(segment) for segment in segments)
+
+    def count_segments(self, segments: Iterable[str]) -> int:
+        """
+        Estimates the tokens of a prompt provided as pre-split segments, ex. from PromptTemplate.iter_render.
+
+        Parameters
+        ----------
+        segments : Iterable[str]
+            The parts of the prompt, in order.
+
+        Returns
+        -------
+        int
+            The estimated token count.
+        """
+        return sum(self.count(segment) for segment in segments)
+
+    def count_messages(self, messages: Union[str, list[dict]]) -> int:
+        """
+        Estimates the prompt tokens of a message array, as passed to the completion function.
+
+        Parameters
+        ----------
+        messages : str | list[dict]
+            The message array, or a raw prompt string.
+
+        Returns
+        -------
+        int
+            The estimated prompt token count, including per-message overhead.
+        """
+        if isinstance(messages, str):
+            return self.count(messages)
+
+        total = 0
+        for message in messages:
+            content = message.get("content") or ""
+            if not isinstance(content, str):  # multi-part content
+                content = "".join(part.get("text", "") for part in content if isinstance(part, dict))
+            total += self.count(content) + self.message_overhead
+        return total
+
+    def estimate(self, messages: Union[str, list[dict]], completion_tokens: int = 0) -> TokenUsage:
+        """
+        Estimates the usage of a request.
+
+        Parameters
+        ----------
+        messages : str | list[dict]
+            The message array, or a raw prompt string.
+        completion_tokens : int, optional
+            The expected completion tokens, ex. the request's max_tokens, by default 0
+
+        Returns
+        -------
+        TokenUsage
+            The estimated prompt, completion, and total tokens.
+        """
+        return TokenUsage(self.count_messages(messages), completion_tokens)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """
+        Shortens a text from the end until it fits within max_tokens.
+
+        Parameters
+        ----------
+        text : str
+            The text to shorten.
+        max_tokens : int
+            The maximum estimated tokens to keep.
+
+        Returns
+        -------
+        str
+            A leading portion of the text that fits, or the text itself if it already fits.
+        """
+        if max_tokens <= 0:
+            return ""
+        count = self.count(text)
+        if count <= max_tokens:
+            return text
+
+        # Start from the proportional cut, shrinking until it fits since tokens are not evenly distributed
+        cut = int(len(text) * max_tokens / count)
+        while cut > 0 and self.count(text[:cut]) > max_tokens:
+            cut = int(cut * 0.9)
+        return text[:cut]
+
+    def cache_info(self) -> dict:
+        """Returns the hit, miss, and size statistics of the segment cache."""
+        return self._cache.info()
+
+    def _count_segment(self, segment: str) -> int:
+        # Keyed on the length as well as the hash to make collisions between different segments negligible
+        return self._cache.get_or_compute((len(segment), hash(segment)), lambda: self._tokenize(segment))
+
+    def _tokenize(self, text: str) -> int:
+        tokens = self.tokenizer(text)
+        return tokens if isinstance(tokens, int) else len(tokens)
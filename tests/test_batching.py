@@ -0,0 +1,105 @@
+from unittest.mock import MagicMock
+
+import pandas as pd
+
+import evaluation_instruments.prep as prep
+from evaluation_instruments._evaluation import Evaluation
+from evaluation_instruments.model import TokenUsage
+
+USAGE = {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+
+
+def test_wrap_cases_delimits_by_id():
+    wrapped = prep.wrap_cases(["first", "second"])
+
+    assert wrapped == "<CASE id=case_1>\nfirst\n<\\CASE id=case_1>\n<CASE id=case_2>\nsecond\n<\\CASE id=case_2>"
+
+
+def test_split_packed_response_marks_missing_cases():
+    response = {"case_1": {"Tone": 4}, "case_3": "not a grade", "case_4": {}}
+
+    assert prep.split_packed_response(response, 4) == [{"Tone": 4}, None, None, None]
+    assert prep.split_packed_response([], 2) == [None, None]
+
+
+def test_packed_instructions_rescope_output():
+    instructions = ["- Your output must be JSON-formatted, where each key is one of your RUBRIC_SET items.", "- Be."]
+    details = {0: "- Your JSON output's keys must include ALL metrics."}
+
+    packed, packed_details = prep.packed_instructions(instructions, details)
+
+    assert packed == [
+        "- Each CASE's output must be JSON-formatted, where each key is one of your RUBRIC_SET items.",
+        "- Be.",
+        prep.PACKED_RESPONSE_INSTRUCTION,
+    ]
+    assert packed_details == {0: "- Each CASE's JSON output's keys must include ALL metrics."}
+
+
+def test_packed_schema_keyed_by_case_id():
+    case_schema = prep.rubric_schema(["Tone"])
+    schema = prep.packed_schema(case_schema, 2)
+
+    assert schema["required"] == ["case_1", "case_2"]
+    assert prep.validate_response({"case_1": {"Tone": 4}, "case_2": {"Tone": 2}}, schema) == []
+    assert prep.validate_response({"case_1": {"Tone": 4}}, schema) == ["$: missing 'case_2'"]
+
+
+class TestPackedRun:
+    def evaluation(self, packed_response, **kwargs):
+        def post_fn(sample_ix, raw_output):
+            return (packed_response if str(sample_ix).endswith("packed") else {"single": sample_ix}), USAGE
+
+        return Evaluation(
+            prep_fn=lambda sample: [{"role": "user", "content": str(sample.Index)}],
+            completion_fn=MagicMock(return_value={}),
+            post_process_fn=post_fn,
+            log_enabled=False,
+            batch_prep_fn=MagicMock(side_effect=lambda samples: [{"role": "user", "content": len(samples)}]),
+            **kwargs,
+        )
+
+    def test_cases_are_packed_and_split(self):
+        packed = {"case_1": {"score": 1}, "case_2": {"score": 2}}
+        evaluation = self.evaluation(packed, cases_per_request=2)
+
+        outputs, usage = evaluation.run_dataset(pd.DataFrame({"a": range(4)}))
+
+        assert outputs == {0: {"score": 1}, 1: {"score": 2}, 2: {"score": 1}, 3: {"score": 2}}
+        assert evaluation.completion_fn.call_count == 2
+        assert usage == TokenUsage(20, 10, 30)
+        assert evaluation.packing_stats == {"packed_requests": 2, "packed_cases": 4, "fallbacks": 0}
+
+    def test_last_batch_may_be_short(self):
+        evaluation = self.evaluation({"case_1": {"score": 1}, "case_2": {"score": 2}}, cases_per_request=2)
+
+        outputs, _ = evaluation.run_dataset(pd.DataFrame({"a": range(3)}))
+
+        assert [len(call.args[0]) for call in evaluation.batch_prep_fn.call_args_list] == [2]
+        assert outputs[2] == {"single": 2}
+
+    def test_missing_cases_fall_back_in_order(self):
+        evaluation = self.evaluation({"case_2": {"score": 2}}, cases_per_request=3)
+
+        outputs, usage = evaluation.run_dataset(pd.DataFrame({"a": range(3)}))
+
+        assert list(outputs.items()) == [(0, {"single": 0}), (1, {"score": 2}), (2, {"single": 2})]
+        assert evaluation.completion_fn.call_count == 3
+        assert evaluation.packing_stats["fallbacks"] == 2
+
+    def test_fallbacks_respect_capacity(self):
+        evaluation = self.evaluation({}, cases_per_request=3, max_tokens=20)
+
+        outputs, usage = evaluation.run_dataset(pd.DataFrame({"a": range(3)}))
+
+        # the packed request uses 15, the first fallback crosses 20 and the rest are abandoned
+        assert list(outputs) == [0]
+        assert usage.total_tokens == 30
+
+    def test_single_case_requests_without_batch_prep(self):
+        evaluation = self.evaluation({}, cases_per_request=4)
+        evaluation.batch_prep_fn = None
+
+        outputs, _ = evaluation.run_dataset(pd.DataFrame({"a": range(2)}))
+
+        assert outputs == {0: {"single": 0}, 1: {"single": 1}}
@@ -0,0 +1,187 @@
+import threading
+from unittest.mock import MagicMock
+
+import pandas as pd
+import pytest
+
+from evaluation_instruments import Budget, Evaluation
+from evaluation_instruments.model import TokenUsage
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def usage(total):
+    return TokenUsage(total // 2, total - total // 2, total)
+
+
+class Test_Budget:
+    def test_int_capacity_limits_total(self):
+        budget = Budget(100)
+        assert budget.capacity == TokenUsage(None, None, 100)
+
+    def test_child_is_shared_by_name(self):
+        root = Budget()
+        first = root.child("model", capacity=10)
+        second = root.child("model", capacity=999)
+
+        assert first is second
+        assert first.capacity.total_tokens == 10
+        assert first.path == "root/model"
+
+    def test_charge_propagates_to_ancestors(self):
+        root = Budget()
+        leaf = root.child("model").child("instrument")
+
+        assert leaf.admit()
+        leaf.charge(usage(30))
+
+        assert leaf.usage == TokenUsage(15, 15, 30)
+        assert root.children["model"].usage.total_tokens == 30
+        assert root.usage.total_tokens == 30
+
+    def test_crossing_request_completes_then_refuses(self):
+        budget = Budget(15)
+
+        assert budget.admit()
+        budget.charge(usage(15))
+        assert budget.admit()  # exactly at capacity continues
+        budget.charge(usage(15))
+
+        assert budget.exceeded
+        assert not budget.admit()
+
+    @pytest.mark.parametrize("level", ["root", "model", "instrument"])
+    def test_any_exceeded_level_refuses(self, level):
+        root = Budget(1000)
+        model = root.child("model", capacity=1000)
+        instrument = model.child("instrument", capacity=1000)
+        target = {"root": root, "model": model, "instrument": instrument}[level]
+        target.capacity = TokenUsage(None, None, 10)
+
+        assert instrument.admit()
+        instrument.charge(usage(20))
+
+        assert not instrument.admit()
+
+    def test_sibling_levels_draw_from_parent(self):
+        root = Budget(25)
+        first, second = root.child("first"), root.child("second")
+
+        assert first.admit()
+        first.charge(usage(30))
+
+        assert not second.admit()
+
+    def test_estimate_reserves_capacity(self):
+        budget = Budget(100)
+
+        assert budget.admit(estimate=60)
+        assert budget.remaining() == 40
+        assert not budget.admit(estimate=60)
+
+        budget.charge(usage(50), estimate=60)
+        assert budget.remaining() == 50
+
+    def test_release_returns_reservation(self):
+        budget = Budget(100)
+        assert budget.admit(estimate=80)
+
+        budget.release(estimate=80)
+
+        assert budget.remaining() == 100
+        assert budget.usage.total_tokens == 0
+
+    def test_requests_per_minute_without_wait(self):
+        clock = FakeClock()
+        budget = Budget(requests_per_minute=2, clock=clock)
+
+        assert budget.admit(wait=False)
+        assert budget.admit(wait=False)
+        assert not budget.admit(wait=False)
+
+        clock.now = 61
+        assert budget.admit(wait=False)
+
+    def test_tokens_per_minute_on_ancestor(self):
+        clock = FakeClock()
+        root = Budget(tokens_per_minute=100, clock=clock)
+        leaf = root.child("model")
+
+        assert leaf.admit(wait=False)
+        leaf.charge(usage(90))
+        assert not leaf.admit(estimate=20, wait=False)
+        assert leaf.admit(estimate=5, wait=False)
+
+    def test_wait_times_out(self):
+        budget = Budget(requests_per_minute=1)
+        assert budget.admit()
+
+        assert not budget.admit(timeout=0.01)
+
+    def test_concurrent_charges_are_consistent(self):
+        root = Budget()
+        leaves = [root.child(str(i)) for i in range(4)]
+
+        def work(leaf):
+            for _ in range(250):
+                leaf.admit()
+                leaf.charge(usage(2))
+
+        threads = [threading.Thread(target=work, args=(leaf,)) for leaf in leaves]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert root.usage.total_tokens == 2000
+
+    def test_report_lists_tree(self):
+        root = Budget(100)
+        root.child("a").child("b")
+
+        assert list(root.report()) == ["root", "root/a", "root/a/b"]
+
+
+class Test_EvaluationBudget:
+    def evaluation(self, budget=None, max_tokens=1000):
+        return Evaluation(
+            prep_fn=MagicMock(return_value="test prompt"),
+            completion_fn=MagicMock(return_value={}),
+            post_process_fn=MagicMock(
+                return_value=({"result": "success"}, {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15})
+            ),
+            log_enabled=False,
+            max_tokens=max_tokens,
+            budget=budget,
+        )
+
+    def test_shared_budget_limits_across_evaluations(self):
+        df = pd.DataFrame({"id": list(range(10))})
+        shared = Budget(30)
+        first = self.evaluation(shared.child("first"))
+        second = self.evaluation(shared.child("second"))
+
+        outputs_first, usage_first = first.run_dataset(df)
+        outputs_second, usage_second = second.run_dataset(df)
+
+        assert len(outputs_first) == 3
+        assert usage_first.total_tokens == 45
+        assert outputs_second == {}
+        assert shared.usage.total_tokens == 45
+
+    def test_run_capacity_still_applies_under_budget(self):
+        df = pd.DataFrame({"id": list(range(10))})
+        shared = Budget(1000)
+        evaluation = self.evaluation(shared, max_tokens=15)
+
+        outputs, usage = evaluation.run_dataset(df)
+
+        assert len(outputs) == 2
+        assert usage.total_tokens == 30
+        assert shared.usage.total_tokens == 30
@@ -0,0 +1,129 @@
+from unittest.mock import MagicMock
+
+import pandas as pd
+import pytest
+
+from evaluation_instruments import Cascade
+from evaluation_instruments._cascade import uncertainty
+from evaluation_instruments._evaluation import Evaluation
+from evaluation_instruments.model import TokenUsage
+
+USAGE = {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+
+
+class TestUncertainty:
+    def test_confident(self):
+        assert uncertainty([{"a": 4, "b": {"score": 5}}, {"a": 4, "b": {"score": 5}}]) is None
+
+    @pytest.mark.parametrize("responses", [[{}], [{"a": 1}, {}], []])
+    def test_parse_failure(self, responses):
+        assert uncertainty(responses) == "parse_failure"
+
+    def test_unanswered(self):
+        assert uncertainty([{"a": 1}, None]) == "unanswered"
+
+    def test_disagreement(self):
+        assert uncertainty([{"a": 4, "b": 2}, {"a": 4, "b": 3}]) == "disagreement"
+        assert uncertainty([{"a": 4}, {"a": 4, "b": 3}]) == "disagreement"
+
+    def test_borderline(self):
+        assert uncertainty([{"a": 3}], borderline=lambda key, score: score == 3) == "borderline"
+        assert uncertainty([{"a": 4}], borderline=lambda key, score: score == 3) is None
+
+
+def tier(responses_by_row):
+    """An evaluation answering each row index from a fixed table, or from a list of answers per call."""
+    calls = {}
+
+    def completion(model, messages):
+        answer = responses_by_row[messages]
+        if isinstance(answer, list):
+            calls[messages] = calls.get(messages, -1) + 1
+            answer = answer[calls[messages]]
+        return answer
+
+    return Evaluation(
+        prep_fn=lambda sample: sample.Index,
+        completion_fn=MagicMock(side_effect=completion),
+        post_process_fn=lambda sample_ix, raw: (raw, USAGE),
+        log_enabled=False,
+    )
+
+
+class TestCascade:
+    def test_escalates_uncertain_rows_only(self):
+        cheap = tier({0: {"a": 4}, 1: {}, 2: {"a": 3}, 3: {"a": 5}})
+        strong = tier({1: {"a": 2}, 2: {"a": 1}})
+        cascade = Cascade([(cheap, "small"), (strong, "large")], borderline=lambda key, score: score == 3)
+
+        outputs, usage = cascade.run_dataset(pd.DataFrame({"x": range(4)}))
+
+        assert list(outputs.items()) == [(0, {"a": 4}), (1, {"a": 2}), (2, {"a": 1}), (3, {"a": 5})]
+        assert strong.completion_fn.call_count == 2
+        assert usage == TokenUsage(60, 30, 90)
+        assert cascade.report["escalation_rate"] == 0.5
+        assert cascade.report["reasons"] == {"parse_failure": 1, "borderline": 1}
+        assert cascade.report["answered_by"] == {0: "small", 3: "small", 1: "large", 2: "large"}
+        assert [t["usage"].total_tokens for t in cascade.report["tiers"]] == [60, 30]
+
+    def test_disagreement_across_samples(self):
+        cheap = tier({0: [{"a": 4}, {"a": 4}], 1: [{"a": 4}, {"a": 2}]})
+        strong = tier({1: {"a": 3}})
+        cascade = Cascade([(cheap, "small"), (strong, "large")], samples=2)
+
+        outputs, _ = cascade.run_dataset(pd.DataFrame({"x": range(2)}))
+
+        assert outputs == {0: {"a": 4}, 1: {"a": 3}}
+        assert cheap.completion_fn.call_count == 4
+        assert cascade.report["reasons"] == {"disagreement": 1}
+
+    def test_last_tier_is_accepted(self):
+        cheap = tier({0: {}})
+        strong = tier({0: {}})
+        cascade = Cascade([(cheap, "small"), (strong, "large")])
+
+        outputs, _ = cascade.run_dataset(pd.DataFrame({"x": [0]}))
+
+        assert outputs == {0: {}}
+        assert cascade.report["answered_by"] == {0: "large"}
+
+    def test_no_escalation_skips_later_tiers(self):
+        strong = tier({})
+        cascade = Cascade([(tier({0: {"a": 1}}), "small"), (strong, "large")])
+
+        cascade.run_dataset(pd.DataFrame({"x": [0]}))
+
+        strong.completion_fn.assert_not_called()
+        assert len(cascade.report["tiers"]) == 1
+
+    def test_unanswered_rows_escalate(self):
+        cheap = tier({0: {"a": 4}, 1: {"a": 4}})
+        cheap.capacity = TokenUsage(None, None, 10)  # the capacity is spent by row 0
+        strong = tier({1: {"a": 2}, 2: {"a": 1}})
+        strong.capacity = TokenUsage(None, None, 10)
+        cascade = Cascade([(cheap, "small"), (strong, "large")])
+
+        outputs, _ = cascade.run_dataset(pd.DataFrame({"x": range(3)}))
+
+        assert outputs == {0: {"a": 4}, 1: {"a": 2}}
+        assert cascade.report["reasons"] == {"unanswered": 2}
+        assert [t["unanswered"] for t in cascade.report["tiers"]] == [2, 1]
+        assert cascade.report["unanswered"] == [2]
+
+    def test_samples_share_capacity(self):
+        cheap = tier({0: [{"a": 4}, {"a": 4}]})
+        cheap.capacity = TokenUsage(None, None, 10)  # the capacity is spent by the first sample
+        strong = tier({0: {"a": 2}})
+        cascade = Cascade([(cheap, "small"), (strong, "large")], samples=2)
+
+        outputs, usage = cascade.run_dataset(pd.DataFrame({"x": [0]}))
+
+        assert outputs == {0: {"a": 2}}
+        assert cheap.completion_fn.call_count == 1
+        assert cheap.budget is None
+        assert cascade.report["reasons"] == {"unanswered": 1}
+        assert cascade.report["tiers"][0]["usage"] == TokenUsage(10, 5, 15)
+
+    def test_requires_tiers(self):
+        with pytest.raises(ValueError):
+            Cascade([])
@@ -0,0 +1,161 @@
+import json
+import os
+from collections import namedtuple
+from unittest.mock import MagicMock
+
+import pytest
+
+import evaluation_instruments.prep as undertest
+
+
+@pytest.fixture
+def case_dir(tmp_path):
+    source = tmp_path / "cases"
+    (source / "nested").mkdir(parents=True)
+    (source / "a.json").write_text(json.dumps({"summary": "first", "text": "braces {ok} and é"}))
+    (source / "b.json").write_text(json.dumps({"summary": "second"}))
+    (source / "nested" / "c.json").write_text(json.dumps({"summary": "third"}))
+    (source / "ignored.txt").write_text("not a case")
+    return source
+
+
+@pytest.fixture
+def store_path(case_dir, tmp_path):
+    path = tmp_path / "store.pack"
+    undertest.write_case_store(case_dir, path)
+    return path
+
+
+class Test_WriteCaseStore:
+    def test_counts_cases(self, case_dir, tmp_path):
+        assert undertest.write_case_store(case_dir, tmp_path / "out.pack") == 3
+
+    def test_adds_suffix(self, case_dir, tmp_path):
+        undertest.write_case_store(case_dir, tmp_path / "out")
+
+        assert (tmp_path / "out.pack").is_file()
+        assert (tmp_path / "out.idx").is_file()
+
+    def test_invalid_json_raises(self, case_dir, tmp_path):
+        (case_dir / "bad.json").write_text("{not json")
+
+        with pytest.raises(json.JSONDecodeError):
+            undertest.write_case_store(case_dir, tmp_path / "out.pack")
+
+    def test_empty_directory(self, tmp_path):
+        (tmp_path / "empty").mkdir()
+        undertest.write_case_store(tmp_path / "empty", tmp_path / "out.pack")
+
+        with undertest.CaseStore(tmp_path / "out.pack") as store:
+            assert len(store) == 0
+
+
+class Test_CaseStore:
+    def test_random_access_by_guid(self, store_path):
+        with undertest.CaseStore(store_path) as store:
+            assert store["b"] == {"summary": "second"}
+            assert store["a"] == {"summary": "first", "text": "braces {ok} and é"}
+            assert store["nested/c"] == {"summary": "third"}
+
+    def test_membership_and_iteration(self, store_path):
+        with undertest.CaseStore(store_path) as store:
+            assert "a" in store
+            assert "missing" not in store
+            assert sorted(store) == ["a", "b", "nested/c"]
+
+    def test_missing_guid(self, store_path):
+        with undertest.CaseStore(store_path) as store:
+            assert store.get("missing", {}) == {}
+            with pytest.raises(KeyError):
+                store["missing"]
+
+    def test_unknown_version_raises(self, store_path):
+        store_path.with_suffix(".idx").write_text(json.dumps({"version": 99, "cases": {}}))
+
+        with pytest.raises(ValueError, match="Unsupported case store version"):
+            undertest.CaseStore(store_path)
+
+    def test_open_case_store_is_shared(self, store_path):
+        assert undertest.open_case_store(store_path) is undertest.open_case_store(str(store_path))
+
+    def test_rewrite_keeps_open_store_readable(self, case_dir, store_path):
+        store = undertest.CaseStore(store_path)
+        (case_dir / "b.json").write_text(json.dumps({"summary": "rewritten"}))
+
+        undertest.write_case_store(case_dir, store_path)
+
+        assert store["b"] == {"summary": "second"}
+        assert not list(store_path.parent.glob("*.partial"))
+        store.close()
+
+    def test_open_case_store_reopens_rewritten(self, case_dir, store_path, monkeypatch):
+        monkeypatch.setattr(undertest.case_store, "STORE_CHECK_SECONDS", 0)
+        first = undertest.open_case_store(store_path)
+        (case_dir / "b.json").write_text(json.dumps({"summary": "rewritten"}))
+        undertest.write_case_store(case_dir, store_path)
+
+        second = undertest.open_case_store(store_path)
+
+        assert second is not first
+        assert second["b"] == {"summary": "rewritten"}
+        # a reader still holding the replaced store can finish with it
+        assert first["b"] == {"summary": "second"}
+
+    def test_open_case_store_checks_periodically(self, store_path, monkeypatch):
+        store = undertest.open_case_store(store_path)
+        stat = MagicMock(side_effect=os.stat)
+        monkeypatch.setattr(undertest.case_store.os, "stat", stat)
+
+        for _ in range(3):
+            assert undertest.open_case_store(store_path) is store
+        assert stat.call_count == 0
+
+        monkeypatch.setattr(undertest.case_store, "STORE_CHECK_SECONDS", 0)
+        assert undertest.open_case_store(store_path) is store
+        assert stat.call_count == 1
+
+    def test_missing_store_raises(self, tmp_path):
+        with pytest.raises(FileNotFoundError, match="No case store"):
+            undertest.open_case_store(tmp_path / "missing.pack")
+
+    def test_evicted_stores_stay_readable(self, case_dir, tmp_path, monkeypatch):
+        monkeypatch.setattr(undertest.case_store, "OPEN_STORES_MAX", 1)
+        stores = []
+        for name in ["one.pack", "two.pack"]:
+            undertest.write_case_store(case_dir, tmp_path / name)
+            stores.append(undertest.open_case_store(tmp_path / name))
+
+        assert stores[0]["b"] == {"summary": "second"}
+        reopened = undertest.open_case_store(tmp_path / "one.pack")
+        assert reopened is not stores[0]
+        undertest.close_case_stores()
+        assert reopened._file.closed
+
+    @pytest.mark.parametrize("suffix,expected", [(".pack", True), (".idx", False), ("", False)])
+    def test_is_case_store(self, store_path, suffix, expected):
+        assert undertest.is_case_store(store_path.with_suffix(suffix)) == expected
+
+
+class Test_JsonFromColumnStore:
+    @pytest.mark.parametrize("guid,expected", [("b", {"summary": "second"}), ("missing", {})])
+    def test_reads_from_store(self, store_path, guid, expected):
+        Sample = namedtuple("Sample", ["guid"])
+
+        @undertest.json_from_column(namedtuple_key="guid", data_path=store_path)
+        def test_fn(json_data):
+            return json_data
+
+        assert test_fn(Sample(guid)) == expected
+
+    def test_store_written_after_decoration(self, case_dir, tmp_path):
+        Sample = namedtuple("Sample", ["guid"])
+        path = tmp_path / "later.pack"
+
+        @undertest.json_from_column(namedtuple_key="guid", data_path=path)
+        def test_fn(json_data):
+            return json_data
+
+        with pytest.raises(FileNotFoundError, match="No case store"):
+            test_fn(Sample("b"))
+        undertest.write_case_store(case_dir, path)
+        assert test_fn(Sample("b")) == {"summary": "second"}
@@ -0,0 +1,123 @@
+import io
+import sys
+from collections import namedtuple
+from unittest.mock import MagicMock
+
+import pandas as pd
+import pytest
+
+from evaluation_instruments import Evaluation, read_parquet_batches
+from evaluation_instruments._dataset import _chunk_range, _stored_range, is_empty, iter_samples
+
+
+class Test_IterSamples:
+    def test_dataframe_matches_itertuples(self):
+        df = pd.DataFrame({"guid": ["a", "b"]}, index=[10, 20])
+
+        assert list(iter_samples(df)) == list(df.itertuples())
+
+    def test_chunked_csv_preserves_index(self):
+        csv = io.StringIO("guid\n" + "\n".join(f"g{i}" for i in range(5)))
+
+        samples = list(iter_samples(pd.read_csv(csv, chunksize=2)))
+
+        assert [s.Index for s in samples] == [0, 1, 2, 3, 4]
+        assert [s.guid for s in samples] == ["g0", "g1", "g2", "g3", "g4"]
+
+    def test_records_use_position_as_index(self):
+        samples = list(iter_samples(iter([{"guid": "a"}, {"guid": "b"}])))
+
+        assert [(s.Index, s.guid) for s in samples] == [(0, "a"), (1, "b")]
+
+    def test_records_with_index_key(self):
+        samples = list(iter_samples([{"Index": "x", "guid": "a"}]))
+
+        assert samples[0].Index == "x"
+        assert samples[0].guid == "a"
+
+    def test_namedtuples_pass_through(self):
+        Row = namedtuple("Row", ["Index", "guid"])
+        rows = [Row(5, "a")]
+
+        assert list(iter_samples(rows)) == rows
+
+    def test_unsupported_item_raises(self):
+        with pytest.raises(TypeError, match="Unsupported dataset item"):
+            list(iter_samples([1, 2]))
+
+    def test_generator_is_consumed_lazily(self):
+        consumed = []
+
+        def records():
+            for i in range(3):
+                consumed.append(i)
+                yield {"guid": i}
+
+        samples = iter_samples(records())
+        next(samples)
+
+        assert consumed == [0]
+
+    @pytest.mark.parametrize(
+        "data,expected",
+        [(None, True), (pd.DataFrame(), True), ([], True), ([{"a": 1}], False), (iter([]), False)],
+    )
+    def test_is_empty(self, data, expected):
+        assert is_empty(data) == expected
+
+
+class Test_ReadParquetBatches:
+    def test_missing_pyarrow_raises(self, monkeypatch):
+        monkeypatch.setitem(sys.modules, "pyarrow.parquet", None)
+
+        with pytest.raises(ImportError, match="requires pyarrow"):
+            next(read_parquet_batches("data.parquet"))
+
+    def test_batches_continue_index(self, tmp_path):
+        pytest.importorskip("pyarrow")
+        path = tmp_path / "data.parquet"
+        pd.DataFrame({"guid": [f"g{i}" for i in range(5)]}).to_parquet(path, index=False, row_group_size=2)
+
+        chunks = list(read_parquet_batches(path))
+
+        assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+        assert [s.Index for s in iter_samples(chunks)] == [0, 1, 2, 3, 4]
+
+    def test_batches_keep_stored_range(self, tmp_path):
+        pytest.importorskip("pyarrow")
+        path = tmp_path / "data.parquet"
+        df = pd.DataFrame({"guid": [f"g{i}" for i in range(5)]}, index=pd.RangeIndex(10, 20, 2, name="row"))
+        df.to_parquet(path, row_group_size=2)
+
+        chunks = list(read_parquet_batches(path))
+
+        assert pd.concat(chunks).index.equals(df.index)
+        assert chunks[0].index.name == "row"
+
+    def test_chunk_range_continues_stored_range(self):
+        metadata = {"index_columns": [{"kind": "range", "name": "row", "start": 10, "stop": 20, "step": 2}]}
+        stored = _stored_range(metadata)
+
+        assert list(_chunk_range(stored, 0, 2)) == [10, 12]
+        assert list(_chunk_range(stored, 2, 3)) == [14, 16, 18]
+        assert _chunk_range(stored, 2, 3).name == "row"
+
+    @pytest.mark.parametrize("metadata", [None, {"index_columns": []}, {"index_columns": ["__index_level_0__"]}])
+    def test_chunk_range_numbers_rows_without_stored_range(self, metadata):
+        assert _stored_range(metadata) is None
+        assert list(_chunk_range(None, 2, 3)) == [2, 3, 4]
+
+
+def test_run_dataset_accepts_lazy_input():
+    evaluation = Evaluation(
+        prep_fn=lambda sample: sample.guid,
+        completion_fn=MagicMock(return_value={}),
+        post_process_fn=lambda ix, raw: ({"ix": ix}, {"total_tokens": 1}),
+        log_enabled=False,
+    )
+    csv = io.StringIO("guid\n" + "\n".join(f"g{i}" for i in range(5)))
+
+    outputs, usage = evaluation.run_dataset(pd.read_csv(csv, chunksize=2))
+
+    assert outputs == {i: {"ix": i} for i in range(5)}
+    assert usage.total_tokens == 5
@@ -0,0 +1,120 @@
+import threading
+from unittest.mock import MagicMock
+
+import pandas as pd
+import pytest
+
+from evaluation_instruments._dedup import SingleFlight, prompt_key
+from evaluation_instruments._evaluation import Evaluation
+from evaluation_instruments.model import PromptSet, TokenUsage
+
+USAGE = {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+
+
+def test_prompt_key_is_stable_and_distinguishes_model():
+    messages = [{"role": "user", "content": "a", "name": "x"}]
+    reordered = [{"name": "x", "content": "a", "role": "user"}]
+
+    assert prompt_key(messages, "m") == prompt_key(reordered, "m")
+    assert prompt_key(messages, "m") != prompt_key(messages, "other")
+    assert prompt_key(messages) != prompt_key([{"role": "user", "content": "b", "name": "x"}])
+
+
+class TestSingleFlight:
+    def test_result_is_shared(self):
+        flight = SingleFlight()
+        fn = MagicMock(return_value=1)
+
+        assert flight.do("k", fn) == (1, False)
+        assert flight.do("k", fn) == (1, True)
+        assert fn.call_count == 1
+        assert flight.done("k")
+
+    def test_concurrent_calls_coalesce(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            release.wait(5)
+            return "result"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flight.do("k", slow))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert sorted(shared for _, shared in results) == [False, True, True, True]
+
+    def test_failures_are_not_stored(self):
+        flight = SingleFlight()
+
+        with pytest.raises(RuntimeError):
+            flight.do("k", MagicMock(side_effect=RuntimeError))
+
+        assert not flight.done("k")
+        assert flight.do("k", lambda: 2) == (2, False)
+
+
+class TestDeduplicatedRun:
+    def evaluation(self, **kwargs):
+        return Evaluation(
+            prep_fn=lambda sample: [{"role": "user", "content": sample.text}],
+            completion_fn=MagicMock(return_value={}),
+            post_process_fn=MagicMock(side_effect=lambda ix, raw: ({"score": 3}, USAGE)),
+            log_enabled=False,
+            **kwargs,
+        )
+
+    def test_duplicates_are_sent_once(self):
+        evaluation = self.evaluation(deduplicate=True)
+
+        outputs, usage = evaluation.run_dataset(pd.DataFrame({"text": ["a", "b", "a", "a"]}))
+
+        assert evaluation.completion_fn.call_count == 2
+        assert outputs == {0: {"score": 3}, 1: {"score": 3}, 2: {"score": 3}, 3: {"score": 3}}
+        assert usage == TokenUsage(20, 10, 30)
+        assert evaluation.dedup_stats == {
+            "requests": 4,
+            "unique": 2,
+            "duplicates": 2,
+            "saved_usage": TokenUsage(20, 10, 30),
+        }
+
+    def test_outputs_are_independent_copies(self):
+        evaluation = self.evaluation(deduplicate=True)
+
+        outputs, _ = evaluation.run_dataset(pd.DataFrame({"text": ["a", "a"]}))
+        outputs[0]["score"] = 1
+
+        assert outputs[1] == {"score": 3}
+
+    def test_disabled_by_default(self):
+        evaluation = self.evaluation()
+
+        evaluation.run_dataset(pd.DataFrame({"text": ["a", "a"]}))
+
+        assert evaluation.completion_fn.call_count == 2
+
+    def test_stats_reset_between_runs(self):
+        evaluation = self.evaluation(deduplicate=True)
+
+        evaluation.run_dataset(pd.DataFrame({"text": ["a", "a"]}))
+        evaluation.run_dataset(pd.DataFrame({"text": ["a"]}))
+
+        assert evaluation.completion_fn.call_count == 2
+        assert evaluation.dedup_stats["duplicates"] == 0
+
+    def test_identical_chunks_in_flight_coalesce(self):
+        evaluation = self.evaluation(deduplicate=True)
+        evaluation.prep_fn = lambda sample: PromptSet([["same"], ["same"], ["other"]], reduce_fn=len)
+
+        outputs, _ = evaluation.run_dataset(pd.DataFrame({"text": ["a"]}))
+
+        assert outputs == {0: 3}
+        assert evaluation.completion_fn.call_count == 2
@@ -0,0 +1,166 @@
+import threading
+from unittest.mock import MagicMock
+
+import pandas as pd
+import pytest
+
+import evaluation_instruments.post as post
+from evaluation_instruments import Ensemble
+from evaluation_instruments._evaluation import Evaluation
+from evaluation_instruments.model import TokenUsage
+
+USAGE = {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+
+
+def evaluation(completion_fn=None, **kwargs):
+    return Evaluation(
+        prep_fn=lambda sample: sample.Index,
+        completion_fn=completion_fn or MagicMock(side_effect=lambda model, messages: {"a": messages}),
+        post_process_fn=lambda sample_ix, raw: (raw, USAGE),
+        log_enabled=False,
+        **kwargs,
+    )
+
+
+def judge(score):
+    return MagicMock(side_effect=lambda model, messages: {"a": score})
+
+
+class TestEnsemble:
+    def test_outputs_per_judge(self):
+        small, large = judge(1), judge(5)
+        ensemble = Ensemble(evaluation(), [("small", small), ("large", large)])
+
+        outputs, usage = ensemble.run_dataset(pd.DataFrame({"x": range(3)}))
+
+        assert outputs == {
+            "small": {0: {"a": 1}, 1: {"a": 1}, 2: {"a": 1}},
+            "large": {0: {"a": 5}, 1: {"a": 5}, 2: {"a": 5}},
+        }
+        assert usage == {"small": TokenUsage(30, 15, 45), "large": TokenUsage(30, 15, 45)}
+        assert {call.kwargs["model"] for call in large.call_args_list} == {"large"}
+
+    def test_default_completion_fn(self):
+        shared = evaluation()
+        outputs, _ = Ensemble(shared, [("small", None), ("large", None)]).run_dataset(pd.DataFrame({"x": range(2)}))
+
+        assert outputs == {"small": {0: {"a": 0}, 1: {"a": 1}}, "large": {0: {"a": 0}, 1: {"a": 1}}}
+        assert shared.completion_fn.call_count == 4
+
+    def test_judges_share_the_pool(self):
+        # every judge must be in flight at once for the barrier to release
+        barrier = threading.Barrier(3, timeout=5)
+
+        def completion(model, messages):
+            barrier.wait()
+            return {"a": model}
+
+        ensemble = Ensemble(evaluation(completion), [("a", None), ("b", None), ("c", None)], max_workers=3)
+        outputs, _ = ensemble.run_dataset(pd.DataFrame({"x": [0]}))
+
+        assert {model: responses[0]["a"] for model, responses in outputs.items()} == {"a": "a", "b": "b", "c": "c"}
+
+    def test_rows_prepared_once(self):
+        prep_fn = MagicMock(side_effect=lambda sample: sample.Index)
+        shared = evaluation()
+        shared.prep_fn = prep_fn
+
+        Ensemble(shared, [("small", judge(1)), ("large", judge(5))]).run_dataset(pd.DataFrame({"x": range(4)}))
+
+        assert prep_fn.call_count == 4
+
+    def test_row_order_restored(self):
+        def completion(model, messages):
+            # the first rows finish last
+            threading.Event().wait(0.01 * (4 - messages))
+            return {"a": messages}
+
+        ensemble = Ensemble(evaluation(completion), [("small", None), ("large", None)], max_workers=8)
+        outputs, _ = ensemble.run_dataset(pd.DataFrame({"x": range(4)}, index=[3, 1, 0, 2]))
+
+        assert list(outputs["small"]) == [3, 1, 0, 2]
+        assert list(outputs["large"]) == [3, 1, 0, 2]
+
+    def test_capacity_stops_one_judge(self):
+        def expensive(model, messages):
+            return {"a": 0, "usage": 100}
+
+        shared = evaluation(max_tokens=40)
+        shared.post_fn = lambda sample_ix, raw: (
+            raw,
+            {"prompt_tokens": raw.get("usage", 10), "completion_tokens": 0, "total_tokens": raw.get("usage", 10)},
+        )
+
+        ensemble = Ensemble(shared, [("cheap", judge(1)), ("costly", MagicMock(side_effect=expensive))], max_workers=1)
+        outputs, usage = ensemble.run_dataset(pd.DataFrame({"x": range(3)}))
+
+        assert list(outputs["cheap"]) == [0, 1, 2]
+        assert list(outputs["costly"]) == [0]
+        assert usage["costly"].total_tokens == 100
+
+    def test_judges_log_and_record_separately(self, tmp_path):
+        completion = {"choices": [{"message": {"content": '{"a": 1}'}}], "usage": USAGE}
+        base = Evaluation(
+            prep_fn=lambda sample: sample.Index,
+            completion_fn=MagicMock(return_value=completion),
+            response_schema={"type": "object", "properties": {}, "required": [], "additionalProperties": False},
+        )
+        base.tmp_dir = tmp_path
+        ensemble = Ensemble(base, [("small", None), ("large", None)])
+
+        ensemble.run_dataset(pd.DataFrame({"x": [0]}))
+
+        assert sorted(path.name.split("_raw_")[0] for path in tmp_path.iterdir()) == ["0-large", "0-small"]
+        assert base.schema_violations == {}
+        assert set(ensemble.runs) == {"small", "large"}
+        assert list(ensemble.runs["small"].schema_violations) == ["0-small"]
+        assert list(ensemble.runs["large"].schema_violations) == ["0-large"]
+
+    def test_timed_out_rows_kept_per_judge(self):
+        def slow(model, messages):
+            threading.Event().wait(0.3)
+            return {"a": 1}
+
+        base = evaluation(request_timeout=0.05)
+        ensemble = Ensemble(base, [("fast", judge(1)), ("slow", slow)])
+        outputs, _ = ensemble.run_dataset(pd.DataFrame({"x": [0]}))
+
+        assert outputs == {"fast": {0: {"a": 1}}, "slow": {}}
+        assert ensemble.runs["fast"].unfinished == []
+        assert ensemble.runs["slow"].unfinished == [0]
+        assert len(ensemble.runs["slow"]._request_seconds) == 0
+        assert base.unfinished == [] and len(base._request_seconds) == 0
+
+    def test_empty(self):
+        outputs, usage = Ensemble(evaluation(), [("small", None)]).run_dataset(pd.DataFrame())
+
+        assert outputs == {"small": {}}
+        assert usage == {"small": TokenUsage(0, 0, 0)}
+
+    def test_failure_raised(self):
+        failing = MagicMock(side_effect=RuntimeError("boom"))
+
+        with pytest.raises(RuntimeError, match="boom"):
+            Ensemble(evaluation(), [("small", judge(1)), ("large", failing)]).run_dataset(pd.DataFrame({"x": [0]}))
+
+    @pytest.mark.parametrize("judges", [[], [("small", None), ("small", None)]])
+    def test_invalid_judges(self, judges):
+        with pytest.raises(ValueError):
+            Ensemble(evaluation(), judges)
+
+
+class TestFrameFromJudges:
+    def test_judge_dimension(self):
+        df = post.frame_from_judges({"small": {0: {"a": 1}, 1: {"a": 2}}, "large": {0: {"a": 5}}, "none": {}})
+
+        assert df.index.names == ["judge", None]
+        assert df.loc[("small", 1), "a"] == 2
+        assert df.xs(0, level=1)["a"].to_dict() == {"small": 1, "large": 5}
+
+    def test_nested(self):
+        df = post.frame_from_judges({"small": {0: {"a": {"score": 1, "explanation": "x"}}}})
+
+        assert df.loc[("small", 0), ("a", "score")] == 1
+
+    def test_empty(self):
+        assert post.frame_from_judges({"small": {}}).empty
@@ -5,7 +5,9 @@ import pandas as pd
 import pytest
 
 from evaluation_instruments._evaluation import Evaluation
-from evaluation_instruments.model import TokenUsage
+from evaluation_instruments.model import PromptSet, TokenUsage
+from evaluation_instruments.prep import TokenCounter
+
 
 def example_dict():
     return {
@@ -289,6 +291,32 @@ class Test_PostProcess:
         assert response == {}
         assert usage == {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
 
+    @pytest.mark.parametrize(
+        "method, expected",
+        [("majority", {"a": 4, "b": 2}), ("median", {"a": 4, "b": 2}), ("mean", {"a": 4.25, "b": 2.5})],
+    )
+    def test_post_process_default_with_choices(self, method, expected):
+        """Test that several choices are parsed and aggregated, with their dispersion kept."""
+        eval_obj = Evaluation(choice_aggregation=method)
+        contents = ['{"a": 4, "b": 2}', '{"a": 5, "b": 2}', '{"a": 4, "b": 3}', '{"a": 4, "b": 3}', "not json"]
+
+        openai_json = {
+            "choices": [{"message": {"content": content}} for content in contents],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 25, "total_tokens": 35},
+        }
+
+        response, usage = eval_obj.post_process_default("ix", openai_json)
+        assert response == expected
+        assert eval_obj.choice_dispersion["ix"] == pytest.approx({"a": 0.4330127, "b": 0.5})
+        assert usage["total_tokens"] == 35
+
+    def test_post_process_default_single_choice_has_no_dispersion(self):
+        eval_obj = Evaluation()
+
+        eval_obj.post_process_default("ix", {"choices": [{"message": {"content": '{"a": 1}'}}]})
+
+        assert eval_obj.choice_dispersion == {}
+
     def test_litellm_example(self, sample_evaluation):
         """Test the post-processing function with Litellm response."""
         expected_usage = TokenUsage(12, 34, 46)
@@ -329,6 +357,55 @@ class Test_PostProcess:
         assert response == expected_output
 
 
+class TestPromptSet:
+    @pytest.fixture
+    def chunked_evaluation(self):
+        def post_fn(sample_ix, raw_output):
+            return {"score": raw_output}, {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+
+        prompt_set = PromptSet([["chunk 1"], ["chunk 2"], ["chunk 3"]], reduce_fn=lambda responses: responses)
+        return Evaluation(
+            prep_fn=MagicMock(return_value=prompt_set),
+            completion_fn=lambda model, messages: int(messages[0][-1]),
+            post_process_fn=post_fn,
+            log_enabled=False,
+            max_tokens=1000,
+        )
+
+    def test_parts_are_reduced_in_order(self, chunked_evaluation):
+        outputs, usage = chunked_evaluation.run_dataset(pd.DataFrame({"a": [1]}))
+
+        assert outputs == {0: [{"score": 1}, {"score": 2}, {"score": 3}]}
+        assert usage == TokenUsage(30, 15, 45)
+
+    def test_parts_are_sent_concurrently(self):
+        import threading
+
+        barrier = threading.Barrier(2, timeout=5)
+
+        def completion(model, messages):
+            barrier.wait()  # deadlocks unless both parts are in flight together
+            return example_dict()
+
+        evaluation = Evaluation(
+            prep_fn=MagicMock(return_value=PromptSet([["a"], ["b"]], reduce_fn=lambda responses: responses[0])),
+            completion_fn=completion,
+            log_enabled=False,
+        )
+
+        outputs, _ = evaluation.run_dataset(pd.DataFrame({"a": [1]}))
+
+        assert outputs == {0: {"result": "success"}}
+
+    def test_estimate_sums_parts(self, chunked_evaluation):
+        from evaluation_instruments.prep import TokenCounter
+
+        chunked_evaluation.token_counter = TokenCounter(message_overhead=0)
+        prompt_set = PromptSet([[{"content": "x" * 40}], [{"content": "x" * 80}]])
+
+        assert chunked_evaluation.estimate_usage(prompt_set) == TokenUsage(30, 0, 30)
+
+
 @patch("tempfile.gettempdir")
 def test_dump_to_temp(mock_temp, sample_evaluation, tmp_path):
     """Test that _dump_to_temp creates proper temp files."""
@@ -354,3 +431,105 @@ def test_dump_to_temp(mock_temp, sample_evaluation, tmp_path):
     assert len(log_files) == 2
     assert log_files[0].name.startswith("test_01_raw_")
     assert log_files[1].name.startswith("test_02_raw_")
+
+
+class Test_DryRun:
+    def evaluation(self, **kwargs):
+        kwargs.setdefault("token_counter", TokenCounter(message_overhead=0))
+        return Evaluation(
+            prep_fn=lambda sample: [{"role": "user", "content": "x" * 40 * sample.size}],
+            completion_fn=MagicMock(),
+            log_enabled=False,
+            **kwargs,
+        )
+
+    def test_completion_is_never_called(self):
+        evaluation = self.evaluation()
+
+        estimates, summary = evaluation.dry_run(pd.DataFrame({"size": [1, 2, 3]}))
+
+        evaluation.completion_fn.assert_not_called()
+        assert estimates["prompt_tokens"].tolist() == [10, 20, 30]
+        assert summary["rows"] == 3
+        assert summary["estimated_usage"] == TokenUsage(60, 0, 60)
+
+    def test_capacity_and_cost(self):
+        evaluation = self.evaluation(model_args={"max_tokens": 10}, max_tokens=40)
+
+        estimates, summary = evaluation.dry_run(
+            pd.DataFrame({"size": [1, 2, 3]}), prompt_price=1_000_000, completion_price=2_000_000
+        )
+
+        # 20, 30, 40 tokens: the second request's estimate would overrun 40, so it is refused before dispatch
+        assert summary["exceeds_capacity"]
+        assert summary["rows_within_capacity"] == 1
+        assert summary["projected_cost"] == 60 + 30 * 2
+
+    def test_capacity_matches_run(self):
+        evaluation = self.evaluation(model_args={"max_tokens": 10}, max_tokens=40)
+        evaluation.completion_fn = lambda model, messages, **kwargs: {"usage": evaluation.estimate_usage(messages)}
+        evaluation.post_fn = lambda sample_ix, raw: ({}, vars(raw["usage"]))
+        df = pd.DataFrame({"size": [1, 2, 3]})
+
+        _, summary = evaluation.dry_run(df)
+        outputs, _ = evaluation.run_dataset(df)
+
+        assert summary["rows_within_capacity"] == len(outputs)
+
+    def test_capacity_without_counter(self):
+        evaluation = self.evaluation(token_counter=None, model_args={"max_tokens": 10}, max_tokens=40)
+
+        _, summary = evaluation.dry_run(pd.DataFrame({"size": [1, 2, 3]}))
+
+        # nothing is reserved at admission, so the request crossing capacity still completes
+        assert summary["rows_within_capacity"] == 2
+
+    def test_packed_requests(self):
+        evaluation = self.evaluation(
+            batch_prep_fn=lambda batch: [{"role": "user", "content": "x" * 40 * len(batch)}], cases_per_request=2
+        )
+
+        estimates, summary = evaluation.dry_run(pd.DataFrame({"size": [1, 1, 1]}))
+
+        assert summary["requests"] == 2
+        assert estimates["requests"].tolist() == [1, 0, 1]
+        assert estimates["prompt_tokens"].tolist() == [10, 10, 10]
+
+    def test_lazy_input_read_in_windows(self):
+        produced = []
+
+        def records():
+            for ix in range(100):
+                produced.append(ix)
+                yield {"size": 1}
+
+        lead = []
+        evaluation = self.evaluation()
+        evaluation.prep_fn = lambda sample: lead.append(len(produced) - sample.Index) or []
+
+        evaluation.dry_run(records(), prep_workers=2)
+
+        assert len(lead) == 100
+        assert max(lead) <= 2 * 2 + 1
+
+    def test_wall_time_at_concurrency(self):
+        _, summary = self.evaluation().dry_run(
+            pd.DataFrame({"size": [1] * 5}), concurrency=2, seconds_per_request=3.0
+        )
+
+        assert summary["projected_seconds"] == 9.0
+
+    def test_overflow_and_largest_rows(self):
+        estimates, summary = self.evaluation(model_args={"max_tokens": 10}).dry_run(
+            pd.DataFrame({"size": [1, 5, 2]}, index=["a", "b", "c"]), context_window=40
+        )
+
+        assert estimates["overflow"].tolist() == [False, True, False]
+        assert summary["overflow_rows"] == ["b"]
+        assert summary["largest_rows"][0] == "b"
+
+    def test_empty(self):
+        estimates, summary = self.evaluation().dry_run(pd.DataFrame())
+
+        assert estimates.empty
+        assert summary["estimated_usage"] == TokenUsage(0, 0, 0)
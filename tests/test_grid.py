@@ -0,0 +1,169 @@
+import json
+import tempfile
+import threading
+from unittest.mock import MagicMock
+
+import pandas as pd
+import pytest
+
+from evaluation_instruments import Grid
+from evaluation_instruments._evaluation import Evaluation
+from evaluation_instruments._grid import result_frame
+from evaluation_instruments.model import TokenUsage
+
+USAGE = {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+
+
+def evaluation(completion_fn=None):
+    return Evaluation(
+        prep_fn=lambda sample: sample.Index,
+        completion_fn=completion_fn or MagicMock(side_effect=lambda model, messages: {"a": len(model) + messages}),
+        post_process_fn=lambda sample_ix, raw: (raw, USAGE),
+        log_enabled=False,
+    )
+
+
+def dataset(rows=2):
+    return pd.DataFrame({"x": range(rows)})
+
+
+class TestGrid:
+    def test_runs_every_cell(self):
+        first, second = evaluation(), evaluation()
+        grid = Grid({"first": (first, dataset()), "second": (second, dataset(1))}, ["m", "mm"])
+
+        df, usage = grid.run()
+
+        assert grid.cells() == [("first", "m"), ("first", "mm"), ("second", "m"), ("second", "mm")]
+        assert list(usage) == grid.cells()
+        assert usage[("first", "m")] == TokenUsage(20, 10, 30)
+        assert usage[("second", "mm")] == TokenUsage(10, 5, 15)
+        assert first.completion_fn.call_count == 4
+        assert list(df.columns) == ["instrument", "model", "sample", "criterion", "score", "explanation"]
+        assert len(df) == 6
+        scores = df.set_index(["instrument", "model", "sample"])["score"]
+        assert scores[("first", "mm", 1)] == 3
+
+    def test_global_limit(self):
+        active, peak = [0], [0]
+        lock = threading.Lock()
+
+        def completion(model, messages):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            threading.Event().wait(0.02)
+            with lock:
+                active[0] -= 1
+            return {"a": 1}
+
+        shared = evaluation(completion)
+        grid = Grid({name: (shared, dataset(1)) for name in "abc"}, ["m", "n"], max_workers=2)
+        df, _ = grid.run()
+
+        assert peak[0] == 2
+        assert len(df) == 6
+
+    def test_per_model_limit(self):
+        active, peak = {}, {}
+        lock = threading.Lock()
+
+        def completion(model, messages):
+            with lock:
+                active[model] = active.get(model, 0) + 1
+                peak[model] = max(peak.get(model, 0), active[model])
+            threading.Event().wait(0.02)
+            with lock:
+                active[model] -= 1
+            return {"a": 1}
+
+        shared = evaluation(completion)
+        grid = Grid(
+            {name: (shared, dataset(1)) for name in "abcd"}, ["slow", "fast"], max_workers=8, max_per_model={"slow": 1}
+        )
+        grid.run()
+
+        assert peak["slow"] == 1
+        assert peak["fast"] > 1
+
+    def test_failed_cell_is_kept_out(self, tmp_path):
+        def completion(model, messages):
+            if model == "bad":
+                raise RuntimeError("boom")
+            return {"a": 1}
+
+        grid = Grid({"first": (evaluation(completion), dataset())}, ["good", "bad"], checkpoint_dir=tmp_path)
+        df, usage = grid.run()
+
+        assert list(usage) == [("first", "good")]
+        assert set(df["model"]) == {"good"}
+        assert isinstance(grid.errors[("first", "bad")], RuntimeError)
+        assert [path.name for path in tmp_path.iterdir()] == ["first__good.json"]
+
+    def test_resumes_from_checkpoint(self, tmp_path):
+        first = evaluation()
+        Grid({"first": (first, dataset())}, ["openai/m"], checkpoint_dir=tmp_path).run()
+        assert first.completion_fn.call_count == 2
+
+        again = evaluation()
+        df, usage = Grid({"first": (again, dataset())}, ["openai/m", "n"], checkpoint_dir=tmp_path).run()
+
+        # only the new cell is run
+        assert {call.kwargs["model"] for call in again.completion_fn.call_args_list} == {"n"}
+        assert usage[("first", "openai/m")] == TokenUsage(20, 10, 30)
+        assert df.loc[df["model"] == "openai/m", "sample"].tolist() == [0, 1]
+
+    def test_stopped_cell_not_checkpointed(self, tmp_path):
+        limited = evaluation(lambda model, messages: {"a": 1})
+        limited.capacity = TokenUsage(None, None, 10)
+
+        grid = Grid({"first": (limited, dataset())}, ["m"], checkpoint_dir=tmp_path)
+        _, usage = grid.run()
+
+        assert usage[("first", "m")] == TokenUsage(10, 5, 15)
+        assert grid.incomplete == {("first", "m"): "capacity"}
+        assert list(tmp_path.iterdir()) == []
+
+    def test_cells_log_separately(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(tempfile, "gettempdir", lambda: str(tmp_path))
+        completion = {"choices": [{"message": {"content": '{"a": 1}'}}], "usage": USAGE}
+        first, second = (
+            Evaluation(prep_fn=lambda sample: sample.Index, completion_fn=lambda model, messages: completion)
+            for _ in range(2)
+        )
+
+        Grid({"first": (first, dataset(1)), "second": (second, dataset(1))}, ["openai/m"]).run()
+
+        logs = sorted((tmp_path / "evaluation_logs").iterdir())
+        assert [path.name.rsplit("_", 1)[0] for path in logs] == ["first__openai_m", "second__openai_m"]
+        assert all(len(list(path.iterdir())) == 1 for path in logs)
+
+    def test_checkpoint_keeps_tuple_index(self, tmp_path):
+        df = pd.DataFrame({"x": [1, 2]}, index=pd.MultiIndex.from_tuples([("a", 1), ("b", 2)]))
+        Grid({"first": (evaluation(lambda model, messages: {"a": 1}), df)}, ["m"], checkpoint_dir=tmp_path).run()
+
+        checkpoint = json.loads((tmp_path / "first__m.json").read_text())
+        assert checkpoint["outputs"][0] == [["a", 1], {"a": 1}]
+
+        resumed, _ = Grid({"first": (evaluation(), df)}, ["m"], checkpoint_dir=tmp_path).run()
+        assert resumed["sample"].tolist() == [("a", 1), ("b", 2)]
+
+    @pytest.mark.parametrize("models, max_per_model", [([], None), (["m", "m"], None), (["m"], 0), (["m"], {"m": 0})])
+    def test_invalid(self, models, max_per_model):
+        with pytest.raises(ValueError):
+            Grid({"first": (evaluation(), dataset())}, models, max_per_model=max_per_model)
+
+
+class TestResultFrame:
+    def test_nested_and_flat(self):
+        df = result_frame(
+            {
+                ("first", "m"): {0: {"a": {"score": 4, "explanation": "ok"}}},
+                ("second", "m"): {0: {"b": 2}, 1: {}},
+            }
+        )
+
+        assert df.values.tolist() == [["first", "m", 0, "a", 4, "ok"], ["second", "m", 0, "b", 2, None]]
+
+    def test_empty(self):
+        assert result_frame({}).empty
@@ -0,0 +1,171 @@
+import threading
+from unittest.mock import MagicMock
+
+import pandas as pd
+import pytest
+
+from evaluation_instruments._evaluation import Evaluation
+from evaluation_instruments._hedge import MIN_SAMPLES, Hedger
+from evaluation_instruments.model import TokenUsage
+
+USAGE = {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+
+
+def usage_of(raw):
+    return TokenUsage(**USAGE)
+
+
+def warm(hedger):
+    for _ in range(MIN_SAMPLES):
+        hedger.call(lambda: "fast", lambda: "hedge", usage_of)
+
+
+class TestHedger:
+    def test_no_hedge_before_warm(self):
+        hedger = Hedger(50)
+        assert hedger.threshold() is None
+
+        assert hedger.call(lambda: "primary", lambda: "hedge", usage_of) == "primary"
+        assert hedger.stats["hedged"] == 0
+
+    def test_slow_request_hedged(self):
+        hedger = Hedger(50)
+        warm(hedger)
+        release = threading.Event()
+
+        def slow():
+            release.wait(5)
+            return "slow"
+
+        assert hedger.call(slow, lambda: "hedge", usage_of) == "hedge"
+        expected = {"requests": MIN_SAMPLES + 1, "hedged": 1, "hedge_wins": 1, "usage": TokenUsage(0, 0, 0)}
+        assert hedger.stats == expected
+
+        # the losing request is only charged once it completes
+        assert hedger.settle() == TokenUsage(0, 0, 0)
+        release.set()
+        assert hedger.settle(wait_all=True) == TokenUsage(10, 5, 15)
+        assert hedger.stats["usage"] == TokenUsage(10, 5, 15)
+
+    def test_failed_first_response_falls_back(self):
+        hedger = Hedger(50)
+        warm(hedger)
+        release = threading.Event()
+
+        def slow():
+            release.wait(5)
+            return "slow"
+
+        def failing():
+            # the primary only finishes after the hedge has failed
+            threading.Timer(0.05, release.set).start()
+            raise RuntimeError("down")
+
+        assert hedger.call(slow, failing, usage_of) == "slow"
+        assert hedger.settle(wait_all=True) == TokenUsage(0, 0, 0)
+
+    def test_primary_failure_raised(self):
+        hedger = Hedger(50)
+
+        def failing():
+            raise RuntimeError("down")
+
+        with pytest.raises(RuntimeError):
+            hedger.call(failing, lambda: "hedge", usage_of)
+
+    def test_cap(self):
+        hedger = Hedger(50, cap=15)
+        warm(hedger)
+
+        def slow():
+            threading.Event().wait(0.05)
+            return "slow"
+
+        assert hedger.call(slow, lambda: "hedge", usage_of) == "hedge"
+        hedger.settle(wait_all=True)
+
+        # the first losing request used the whole cap
+        assert hedger.call(slow, lambda: "hedge", usage_of) == "slow"
+        assert hedger.stats["hedged"] == 1
+
+    def test_in_flight_losers_count_against_cap(self):
+        hedger = Hedger(50, cap=20)
+        warm(hedger)
+        release = threading.Event()
+
+        def slow():
+            release.wait(5)
+            return "slow"
+
+        assert hedger.call(slow, lambda: "hedge", usage_of, reserve=15) == "hedge"
+        # the first loser has not completed, but its reservation leaves too little of the cap for another
+
+        def also_slow():
+            threading.Event().wait(0.05)
+            return "slow"
+
+        assert hedger.call(also_slow, lambda: "hedge", usage_of, reserve=15) == "slow"
+        assert hedger.stats["hedged"] == 1
+        release.set()
+        hedger.settle(wait_all=True)
+
+    def test_slow_losers_do_not_block(self):
+        hedger = Hedger(50)
+        warm(hedger)
+        release = threading.Event()
+
+        def slow():
+            release.wait(5)
+            return "slow"
+
+        # more losing requests in flight than any fixed pool would hold
+        for _ in range(40):
+            assert hedger.call(slow, lambda: "hedge", usage_of) == "hedge"
+        release.set()
+        assert hedger.settle(wait_all=True) == TokenUsage(400, 200, 600)
+
+
+class TestEvaluationHedging:
+    def test_hedged_run(self):
+        rows = MIN_SAMPLES + 1
+
+        def completion(model, messages):
+            if messages == rows - 1:
+                threading.Event().wait(0.3)
+            return {"a": "primary", "usage": USAGE}
+
+        hedge_fn = MagicMock(return_value={"a": "hedge", "usage": USAGE})
+        post_fn = MagicMock(side_effect=lambda sample_ix, raw: ({"a": raw["a"]}, raw["usage"]))
+        evaluation = Evaluation(
+            prep_fn=lambda sample: sample.Index,
+            completion_fn=completion,
+            post_process_fn=post_fn,
+            log_enabled=False,
+            max_tokens=10_000,
+            hedge_percentile=90,
+            hedge_completion_fn=hedge_fn,
+        )
+
+        outputs, usage = evaluation.run_dataset(pd.DataFrame({"x": range(rows)}))
+
+        assert outputs[rows - 1] == {"a": "hedge"}
+        assert all(outputs[ix] == {"a": "primary"} for ix in range(rows - 1))
+        # the losing request is included in the run's usage
+        assert usage == TokenUsage(10 * (rows + 1), 5 * (rows + 1), 15 * (rows + 1))
+        assert evaluation.hedge_stats["hedged"] == 1
+        assert evaluation.hedge_stats["hedge_wins"] == 1
+        assert evaluation.hedge_stats["usage"] == TokenUsage(10, 5, 15)
+        # the losing response is charged from its usage, not post-processed
+        assert [call.args[0] for call in post_fn.call_args_list] == list(range(rows))
+
+    def test_disabled_by_default(self):
+        evaluation = Evaluation(
+            prep_fn=lambda sample: sample.Index,
+            completion_fn=lambda model, messages: {"a": 1},
+            post_process_fn=lambda sample_ix, raw: (raw, USAGE),
+            log_enabled=False,
+        )
+
+        evaluation.run_dataset(pd.DataFrame({"x": range(2)}))
+
+        assert evaluation.hedge_stats == {}
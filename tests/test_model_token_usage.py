@@ -133,3 +133,35 @@ class Test_TokenUsage:
                 self.total_tokens = 7
 
         assert usage.validate_compatible(CompatibleObject()) is True
+
+
+class Test_CachedTokens:
+    def test_openai_prompt_tokens_details(self):
+        usage = TokenUsage(prompt_tokens=100, completion_tokens=5, prompt_tokens_details={"cached_tokens": 80})
+
+        assert usage.cached_tokens == 80
+        assert usage.cache_hit_rate == 0.8
+
+    def test_anthropic_cache_read(self):
+        usage = TokenUsage(prompt_tokens=100, completion_tokens=5, cache_read_input_tokens=25)
+
+        assert usage.cached_tokens == 25
+
+    def test_details_object(self):
+        class Details:
+            cached_tokens = 10
+
+        assert TokenUsage(prompt_tokens=20, prompt_tokens_details=Details()).cache_hit_rate == 0.5
+
+    def test_not_reported(self):
+        usage = TokenUsage(10, 5, 15, prompt_tokens_details=None)
+
+        assert usage.cached_tokens is None
+        assert usage.cache_hit_rate is None
+
+    def test_sums_when_either_reports(self):
+        total = TokenUsage(0, 0, 0) + TokenUsage(100, 5, cached_tokens=60) + TokenUsage(100, 5)
+
+        assert total.cached_tokens == 60
+        assert total.cache_hit_rate == 0.3
+        assert (TokenUsage(1, 1) + TokenUsage(1, 1)).cached_tokens is None
@@ -0,0 +1,89 @@
+from unittest.mock import MagicMock
+
+import pandas as pd
+import pytest
+
+from evaluation_instruments import Evaluation
+from evaluation_instruments.model import PromptMessages
+from evaluation_instruments.prep import TokenCounter, pack_texts
+from evaluation_instruments.prep.packing import OMISSION_MARKER, TRUNCATION_MARKER
+
+
+@pytest.fixture
+def counter():
+    # one token per character keeps budgets readable
+    return TokenCounter(chars_per_token=1)
+
+
+class Test_PackTexts:
+    def test_within_budget_unchanged(self, counter):
+        texts = ["aaaa", "bbbb"]
+
+        packed, report = pack_texts(texts, 8, token_counter=counter)
+
+        assert packed == texts
+        assert report["truncated"] == [] and report["omitted"] == []
+        assert report["packed_tokens"] == 8
+
+    def test_recent_keeps_latest_whole(self, counter):
+        packed, report = pack_texts(["a" * 10, "b" * 10, "c" * 10], 15, token_counter=counter)
+
+        assert packed == [OMISSION_MARKER, "b" * 5 + TRUNCATION_MARKER, "c" * 10]
+        assert report["truncated"] == [1]
+        assert report["omitted"] == [0]
+        assert report["packed_tokens"] == 15
+
+    def test_proportional_shortens_evenly(self, counter):
+        packed, report = pack_texts(["a" * 10, "b" * 30], 20, strategy="proportional", token_counter=counter)
+
+        assert packed == ["a" * 5 + TRUNCATION_MARKER, "b" * 15 + TRUNCATION_MARKER]
+        assert report["truncated"] == [0, 1]
+
+    def test_preserves_count_and_order(self, counter):
+        texts = [str(i) * 10 for i in range(5)]
+
+        packed, _ = pack_texts(texts, 12, token_counter=counter)
+
+        assert len(packed) == 5
+        assert packed[-1] == texts[-1]
+
+    def test_unknown_strategy(self):
+        with pytest.raises(ValueError, match="Unknown packing strategy"):
+            pack_texts(["a"], 1, strategy="random")
+
+    def test_default_counter_is_heuristic(self):
+        packed, report = pack_texts(["a" * 400], 50)
+
+        assert report["original_tokens"] == 100
+        assert packed[0].startswith("a" * 200)
+        assert report["truncated"] == [0]
+
+
+class Test_TokenCounterTruncate:
+    def test_fits_unchanged(self, counter):
+        assert counter.truncate("abc", 5) == "abc"
+
+    def test_zero_budget(self, counter):
+        assert counter.truncate("abc", 0) == ""
+
+    def test_tokenizer_truncation_fits(self):
+        counter = TokenCounter(lambda text: text.split())
+
+        shortened = counter.truncate("one two three four five six", 3)
+
+        assert counter.count(shortened) <= 3
+        assert "one two three four five six".startswith(shortened)
+
+
+def test_evaluation_collects_prompt_metadata():
+    prompts = {0: PromptMessages([{"role": "user", "content": "x"}], {"note_packing": {"truncated": [1]}}), 1: []}
+    evaluation = Evaluation(
+        prep_fn=lambda sample: prompts[sample.Index],
+        completion_fn=MagicMock(return_value={}),
+        post_process_fn=lambda ix, raw: ({}, {"total_tokens": 1}),
+        log_enabled=False,
+    )
+
+    evaluation.run_dataset(pd.DataFrame({"id": [0, 1]}))
+
+    assert evaluation.prompt_metadata == {0: {"note_packing": {"truncated": [1]}}}
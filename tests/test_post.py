@@ -1,7 +1,8 @@
 import pandas as pd
+import pytest
 from pandas.testing import assert_frame_equal
 
-from evaluation_instruments.post import frame_from_evals
+from evaluation_instruments.post import aggregate_choices, frame_from_evals, merge_responses, reduce_responses
 
 
 def evaluation_output():
@@ -68,7 +69,6 @@ def test_frame_from_evals_empty():
     assert result_df.empty
 
 
-
 def test_frame_from_evals_single_score_multiple_items():
     """Test frame_from_evals with multiple items but only single score values (no evidence)."""
     # Sample with single score per criteria, multiple items
@@ -92,3 +92,80 @@ def test_frame_from_evals_single_score_multiple_items():
 
     # Verify exact match with expected DataFrame
     assert_frame_equal(result_df, expected_df)
+
+
+class TestReduceResponses:
+    def test_default_median_keeps_observed_grade(self):
+        responses = [{"organized": 2}, {"organized": 5}, {"organized": 4}, {"organized": 3}]
+
+        assert reduce_responses(responses) == {"organized": 3}
+
+    def test_named_aggregations_per_criterion(self):
+        responses = [{"accurate": 4, "citation": 2}, {"accurate": 2, "citation": 5}]
+
+        result = reduce_responses(responses, aggregations={"accurate": "min", "citation": "max"})
+
+        assert result == {"accurate": 2, "citation": 5}
+
+    def test_nested_scores_join_explanations(self):
+        responses = [
+            {"accurate": {"score": 4, "explanation": "fine"}},
+            {"accurate": {"score": 1, "explanation": "fabricated dose"}},
+        ]
+
+        result = reduce_responses(responses, aggregations={"accurate": "min"})
+
+        assert result == {"accurate": {"score": 1, "explanation": "[1] fine\n[2] fabricated dose"}}
+
+    def test_non_numeric_values_fall_back_to_most_common(self):
+        responses = [{"synthesized": "NA"}, {"synthesized": "NA"}, {"synthesized": 3}]
+
+        assert reduce_responses(responses) == {"synthesized": 3}
+        assert reduce_responses(responses[:2]) == {"synthesized": "NA"}
+
+    def test_empty_responses_are_ignored(self):
+        assert reduce_responses([{}, {"useful": 4}, {}]) == {"useful": 4}
+        assert reduce_responses([{}, {}]) == {}
+
+    def test_callable_aggregation(self):
+        assert reduce_responses([{"a": 1}, {"a": 2}], default=sum) == {"a": 3}
+
+    def test_unknown_aggregation_raises(self):
+        with pytest.raises(ValueError, match="Unknown aggregation"):
+            reduce_responses([{"a": 1}], default="mode")
+
+
+def test_merge_responses_unions_criteria():
+    merged = merge_responses([{"Tone": 4, "Grammar": 5}, {}, {"KeyEvents": {"score": 3, "explanation": "ok"}}])
+
+    assert merged == {"Tone": 4, "Grammar": 5, "KeyEvents": {"score": 3, "explanation": "ok"}}
+
+
+class TestAggregateChoices:
+    def test_nested_scores_keep_a_matching_explanation(self):
+        choices = [
+            {"Tone": {"score": 2, "explanation": "curt"}},
+            {"Tone": {"score": 4, "explanation": "warm"}},
+            {"Tone": {"score": 4, "explanation": "polite"}},
+        ]
+
+        aggregated, dispersion = aggregate_choices(choices)
+
+        assert aggregated == {"Tone": {"score": 4, "explanation": "warm"}}
+        assert dispersion["Tone"] == pytest.approx(0.9428090)
+
+    def test_non_numeric_criteria_use_most_common(self):
+        aggregated, dispersion = aggregate_choices([{"synthesized": "NA"}, {"synthesized": "NA"}])
+
+        assert aggregated == {"synthesized": "NA"}
+        assert dispersion == {}
+
+    def test_agreement_has_zero_dispersion(self):
+        assert aggregate_choices([{"a": 3}, {"a": 3}], "median") == ({"a": 3}, {"a": 0.0})
+
+    def test_all_failures(self):
+        assert aggregate_choices([{}, {}]) == ({}, {})
+
+    def test_unknown_method_raises(self):
+        with pytest.raises(ValueError, match="Unknown aggregation"):
+            aggregate_choices([{"a": 1}], "max")
@@ -1,7 +1,7 @@
 import json
 from collections import namedtuple
+from pathlib import PurePosixPath, PureWindowsPath
 from unittest.mock import mock_open, patch
-from pathlib import PureWindowsPath, PurePosixPath
 
 import pytest
 
@@ -55,6 +55,15 @@ class TestJsonFromColumnDecorator:
         result = test_fn(sample)
         assert result == {}
 
+    def test_keyword_arguments_pass_through(self):
+        @undertest.json_from_column(namedtuple_key="file_id", data_path="nonexistent_path")
+        def test_fn(json_data, rubric_keys=None):
+            return json_data, rubric_keys
+
+        Sample = namedtuple("Sample", ["file_id"])
+
+        assert test_fn(Sample(file_id="id"), rubric_keys=["a"]) == ({}, ["a"])
+
     def test_missing_key(self):
         """Test json_from_column raises ValueError if namedtuple_key is not provided."""
         with pytest.raises(ValueError, match="namedtuple_key must be provided"):
@@ -230,3 +239,186 @@ class Test_ResolveMode:
 
     def test_default_mode_used_when_enum(self, default):
         assert undertest.OutputMode(default) == undertest.data_handler._resolve_mode(OutputMode.DEFAULT, default)
+
+
+class TestRubricGroups:
+    def test_partition_is_contiguous_and_balanced(self):
+        library = {key: f"{key} rubric" for key in "abcdefg"}
+
+        assert undertest.partition_rubrics(library, 3) == [["a", "b", "c"], ["d", "e"], ["f", "g"]]
+
+    def test_partition_caps_groups(self):
+        assert undertest.partition_rubrics({"a": "", "b": ""}, 5) == [["a"], ["b"]]
+
+    def test_partition_rejects_zero(self):
+        with pytest.raises(ValueError):
+            undertest.partition_rubrics({"a": ""}, 0)
+
+    def test_split_rubrics_resolves_each_group(self):
+        @undertest.split_rubrics(rubric_groups=[["a", "b"], ["c"]])
+        def prompt(sample, rubric_keys=None):
+            return f"{sample}: {','.join(rubric_keys)}"
+
+        prompt_set = prompt("case")
+
+        assert list(prompt_set) == ["case: a,b", "case: c"]
+        assert prompt_set.metadata == {"rubric_groups": [["a", "b"], ["c"]]}
+        assert prompt_set.reduce_fn([{"a": 1, "b": 2}, {"c": 3}]) == {"a": 1, "b": 2, "c": 3}
+
+    def test_split_rubrics_requires_groups(self):
+        with pytest.raises(ValueError):
+            undertest.split_rubrics(lambda sample, rubric_keys=None: sample)
+
+
+class TestCompileInstrumentPrompt:
+    PATTERN = "Grade the {OUTPUT_TEXT}.\n{RUBRIC_SET}\n{{case}}\nRules:\n{{instruction_set}}"
+    LIBRARY = {"rubric1": "Evaluate clarity.", "rubric2": "Evaluate accuracy."}
+    INSTRUCTIONS = ["Return JSON.", "Scores only."]
+    OVERRIDES = {1: 'Explain each score as {"score": 1, "explanation": "..."}.'}
+
+    @pytest.fixture(autouse=True)
+    def empty_cache(self):
+        undertest.clear_prompt_cache()
+        yield
+        undertest.clear_prompt_cache()
+
+    def compile(self, mode=OutputMode.DEFAULT, rubric_keys=None, instrument="test"):
+        return undertest.compile_instrument_prompt(
+            instrument,
+            self.PATTERN,
+            pattern_kwargs={"OUTPUT_TEXT": "SUMMARY"},
+            rubric_library=self.LIBRARY,
+            instructions=self.INSTRUCTIONS,
+            details_overrides=self.OVERRIDES,
+            default_mode=OutputMode.SCORE,
+            mode=mode,
+            rubric_keys=rubric_keys,
+        )
+
+    def test_matches_uncached_compilation(self):
+        expected = undertest.prompt_compilation(self.PATTERN, {"OUTPUT_TEXT": "SUMMARY"}, self.LIBRARY).format(
+            case="CASE",
+            instruction_set=undertest.resolve_instructions(
+                self.INSTRUCTIONS, self.OVERRIDES, OutputMode.SCORE, OutputMode.EXPLAINED_SCORE
+            ),
+        )
+
+        actual = self.compile(OutputMode.EXPLAINED_SCORE).render(case="CASE")
+
+        assert actual == expected
+        assert '{"score": 1' in actual
+
+    def test_only_case_fields_remain(self):
+        template = self.compile()
+
+        assert template.fields == ("case",)
+        assert "Return JSON.\nScores only." in template.render(case="")
+
+    def test_braces_in_rubrics_are_not_interpreted(self, monkeypatch):
+        monkeypatch.setitem(self.LIBRARY, "rubric1", 'Example: {"clarity": 5}')
+
+        actual = self.compile().render(case="{not a field}")
+
+        assert 'Example: {"clarity": 5}' in actual
+        assert "{not a field}" in actual
+
+    def test_repeat_calls_hit_cache(self):
+        first = self.compile()
+        second = self.compile()
+
+        assert first is second
+        assert undertest.prompt_cache_info()["hits"] == 1
+        assert undertest.prompt_cache_info()["misses"] == 1
+
+    def test_default_mode_shares_entry_with_resolved_mode(self):
+        self.compile(OutputMode.DEFAULT)
+        self.compile(OutputMode.SCORE)
+
+        assert undertest.prompt_cache_info()["size"] == 1
+
+    @pytest.mark.parametrize(
+        "first,second",
+        [
+            ({"mode": OutputMode.SCORE}, {"mode": OutputMode.EXPLAINED_SCORE}),
+            ({"rubric_keys": ["rubric1"]}, {"rubric_keys": ["rubric2"]}),
+            ({"instrument": "a"}, {"instrument": "b"}),
+        ],
+    )
+    def test_distinct_keys_are_distinct_entries(self, first, second):
+        self.compile(**first)
+        self.compile(**second)
+
+        assert undertest.prompt_cache_info()["size"] == 2
+
+    def test_cache_is_bounded(self, monkeypatch):
+        monkeypatch.setattr(undertest.data_handler._PROMPT_CACHE, "maxsize", 2)
+
+        for name in ["a", "b", "c"]:
+            self.compile(instrument=name)
+
+        assert undertest.prompt_cache_info()["size"] == 2
+
+
+class TestCompileSections:
+    SAMPLE = {
+        "summary": "excluded",
+        "medications": {"1": "aspirin", "2": "heparin", "3": "insulin"},
+        "orders": {},
+        "procedures": ["CT", "MRI", "EKG"],
+        "notes": {"n1": "note text"},
+    }
+
+    def legacy(self, sample, exclude, joined):
+        """The original quadratic implementation, for equivalence."""
+        data = ""
+        for key in sample.keys():
+            if key == exclude or not sample[key]:
+                continue
+            data += f"{key}:\n"
+            if key == joined:
+                data += ", ".join(sample[key])
+            else:
+                for id in sample[key]:
+                    data += f"[{id}] = {sample[key][id]}\n"
+        return data
+
+    def test_matches_original_without_budget(self):
+        expected = self.legacy(self.SAMPLE, "summary", "procedures")
+
+        actual = undertest.compile_sections(self.SAMPLE, exclude=("summary",), joined_keys=("procedures",))
+
+        assert actual == expected
+
+    def test_int_budget_applies_to_every_section(self):
+        actual = undertest.compile_sections(
+            self.SAMPLE, exclude=("summary",), joined_keys=("procedures",), section_budget=30
+        )
+
+        assert "medications:\n[1] = aspirin\n[2] = heparin\n[... 1 more entry omitted]\n" in actual
+        assert "procedures:\nCT, MRI, EKG" in actual
+        assert "[n1] = note text\n" in actual
+
+    def test_dict_budget_only_limits_named_sections(self):
+        actual = undertest.compile_sections(
+            self.SAMPLE,
+            exclude=("summary",),
+            joined_keys=("procedures",),
+            section_budget={"procedures": 5},
+        )
+
+        assert "[3] = insulin\n" in actual
+        assert "procedures:\nCT, [... 2 more entries omitted]" in actual
+
+    def test_zero_budget_omits_all_entries(self):
+        actual = undertest.compile_sections({"notes": {"a": "x"}}, section_budget=0)
+
+        assert actual == "notes:\n[... 1 more entry omitted]\n"
+
+    def test_length_fn_measures_budget(self):
+        words = lambda text: len(text.split())  # noqa: E731
+
+        actual = undertest.compile_sections(
+            {"notes": {"a": "one two", "b": "three four"}}, section_budget=8, length_fn=words
+        )
+
+        assert actual == "notes:\n[a] = one two\n[b] = three four\n"
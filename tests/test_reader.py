@@ -0,0 +1,166 @@
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+import pandas as pd
+import pytest
+
+from evaluation_instruments import Evaluation
+from evaluation_instruments.prep import JsonReader, json_from_column
+from evaluation_instruments.prep.reader import read_ahead
+
+
+def write_case(directory, name, content):
+    path = directory / f"{name}.json"
+    path.write_text(json.dumps(content))
+    return path
+
+
+@pytest.fixture
+def reader():
+    with JsonReader(maxsize=2, read_ahead=1, max_workers=2) as reader:
+        yield reader
+
+
+class Test_JsonReader:
+    def test_read_parses_file(self, reader, tmp_path):
+        path = write_case(tmp_path, "a", {"key": "value"})
+
+        assert reader.read(path) == {"key": "value"}
+
+    def test_missing_file_is_empty(self, reader, tmp_path):
+        assert reader.read(tmp_path / "missing.json") == {}
+
+    def test_repeat_read_is_cached(self, reader, tmp_path):
+        path = write_case(tmp_path, "a", {"key": "value"})
+
+        reader.read(path)
+        reader.read(path)
+
+        stats = reader.stats()
+        assert stats["loads"] == 1
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+
+    def test_modified_file_is_reloaded(self, reader, tmp_path):
+        path = write_case(tmp_path, "a", {"version": 1})
+        reader.read(path)
+
+        write_case(tmp_path, "a", {"version": 2})
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+        assert reader.read(path) == {"version": 2}
+        assert reader.stats()["loads"] == 2
+
+    def test_cache_is_bounded(self, reader, tmp_path):
+        for name in "abc":
+            reader.read(write_case(tmp_path, name, {}))
+
+        assert reader.stats()["size"] == 2
+
+    def test_prefetch_loads_in_background(self, reader, tmp_path):
+        paths = [write_case(tmp_path, name, {"name": name}) for name in "ab"]
+
+        reader.prefetch(paths)
+        results = [reader.read(path) for path in paths]
+
+        assert results == [{"name": "a"}, {"name": "b"}]
+        stats = reader.stats()
+        assert stats["prefetched"] == 2
+        assert stats["loads"] == 2
+        assert stats["hits"] == 2
+
+    def test_edits_do_not_reach_cache(self, reader, tmp_path):
+        path = write_case(tmp_path, "a", {"notes": ["one"]})
+
+        reader.read(path)["notes"].append("two")
+
+        assert reader.read(path) == {"notes": ["one"]}
+
+    def test_concurrent_reads_load_once(self, reader, tmp_path, monkeypatch):
+        path = write_case(tmp_path, "a", {"name": "a"})
+        started, release = threading.Event(), threading.Event()
+        load = JsonReader._load
+
+        def slow_load(self, *args):
+            started.set()
+            release.wait(5)
+            return load(self, *args)
+
+        monkeypatch.setattr(JsonReader, "_load", slow_load)
+        with ThreadPoolExecutor(2) as executor:
+            first = executor.submit(reader.read, path)
+            started.wait(5)
+            second = executor.submit(reader.read, path)
+            time.sleep(0.05)
+            release.set()
+
+            assert first.result() == second.result() == {"name": "a"}
+        assert reader.stats()["loads"] == 1
+
+    def test_prefetch_skips_cached_and_missing(self, reader, tmp_path):
+        path = write_case(tmp_path, "a", {})
+        reader.read(path)
+
+        reader.prefetch([path, tmp_path / "missing.json"])
+
+        assert reader.stats()["prefetched"] == 0
+
+
+def test_read_ahead_prefetches_depth_rows_early():
+    seen = []
+    prefetch = seen.append
+
+    for row in read_ahead(range(5), prefetch, depth=2):
+        assert seen[-1] == min(row + 2, 4)
+
+    assert seen == [0, 1, 2, 3, 4]
+
+
+class Test_JsonFromColumnReader:
+    def test_reads_through_reader(self, reader, tmp_path):
+        write_case(tmp_path, "a", {"key": "value"})
+        Sample = namedtuple("Sample", ["guid"])
+
+        @json_from_column(namedtuple_key="guid", data_path=tmp_path, reader=reader)
+        def to_prompt(raw_json):
+            return raw_json
+
+        assert to_prompt(Sample("a")) == {"key": "value"}
+        assert to_prompt(Sample("a")) == {"key": "value"}
+        assert reader.stats()["loads"] == 1
+
+    def test_no_reader_exposes_no_prefetch(self):
+        @json_from_column(namedtuple_key="guid")
+        def to_prompt(raw_json):
+            return raw_json
+
+        assert not hasattr(to_prompt, "prefetch")
+
+    def test_evaluation_prefetches_upcoming_rows(self, tmp_path):
+        reader = JsonReader(maxsize=8, read_ahead=2)
+        for name in "abcd":
+            write_case(tmp_path, name, {"name": name})
+
+        @json_from_column(namedtuple_key="guid", data_path=tmp_path, reader=reader)
+        def to_prompt(raw_json):
+            return raw_json["name"]
+
+        evaluation = Evaluation(
+            prep_fn=to_prompt,
+            completion_fn=MagicMock(return_value={}),
+            post_process_fn=lambda ix, raw: ({}, {"total_tokens": 1}),
+            log_enabled=False,
+        )
+
+        outputs, _ = evaluation.run_dataset(pd.DataFrame({"guid": list("abcd")}))
+
+        reader.close()
+        assert len(outputs) == 4
+        assert reader.stats()["prefetched"] >= 2
+        assert reader.stats()["loads"] == 4
@@ -0,0 +1,228 @@
+import threading
+from collections import Counter
+from unittest.mock import MagicMock
+
+import pandas as pd
+import pytest
+
+from evaluation_instruments import Router
+from evaluation_instruments._evaluation import Evaluation
+
+USAGE = {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def backend(name):
+    return MagicMock(side_effect=lambda **kwargs: name)
+
+
+def failing(error=RuntimeError("down")):
+    return MagicMock(side_effect=error)
+
+
+class TestRouter:
+    def test_weighted_spread(self):
+        router = Router({"a": backend("a"), "b": backend("b")}, weights={"a": 3})
+
+        counts = Counter(router(model="m", messages=[]) for _ in range(8))
+
+        assert counts == {"a": 6, "b": 2}
+
+    def test_passes_arguments(self):
+        only = backend("a")
+        Router({"a": only})(model="m", messages=["x"], temperature=0)
+
+        only.assert_called_once_with(model="m", messages=["x"], temperature=0)
+
+    def test_least_outstanding(self):
+        release = threading.Event()
+        started = threading.Event()
+
+        def slow(**kwargs):
+            started.set()
+            release.wait(5)
+            return "slow"
+
+        router = Router({"slow": slow, "fast": backend("fast")})
+        thread = threading.Thread(target=router, kwargs={"model": "m"})
+        thread.start()
+        started.wait(5)
+
+        # the slow backend is busy, so every request goes to the idle one
+        assert [router(model="m") for _ in range(3)] == ["fast"] * 3
+        release.set()
+        thread.join()
+
+    def test_latency(self):
+        clock = FakeClock()
+
+        def timed(name, seconds):
+            def completion(**kwargs):
+                clock.now += seconds
+                return name
+
+            return completion
+
+        router = Router({"slow": timed("slow", 2.0), "fast": timed("fast", 0.5)}, strategy="latency", clock=clock)
+
+        responses = [router(model="m") for _ in range(5)]
+
+        # each backend is probed once, then the faster one is preferred
+        assert sorted(responses[:2]) == ["fast", "slow"]
+        assert responses[2:] == ["fast"] * 3
+        assert router.report()["slow"]["latency"] == 2.0
+
+    def test_failover(self):
+        down = failing()
+        router = Router({"down": down, "up": backend("up")})
+
+        assert [router(model="m") for _ in range(4)] == ["up"] * 4
+        # tried until the breaker opens after the default three failures
+        assert down.call_count == 3
+        assert router.report()["down"]["state"] == "open"
+
+    def test_all_failing_raises_last_error(self):
+        router = Router({"a": failing(RuntimeError("a")), "b": failing(RuntimeError("b"))})
+
+        with pytest.raises(RuntimeError, match="b"):
+            router(model="m")
+
+    def test_unretried_error(self):
+        second = backend("b")
+        router = Router({"a": failing(KeyError("bad request")), "b": second}, retry_on=ConnectionError)
+
+        with pytest.raises(KeyError):
+            router(model="m")
+        assert not second.called
+        assert router.report()["a"] == {
+            "state": "closed",
+            "weight": 1.0,
+            "requests": 1,
+            "failures": 0,
+            "outstanding": 0,
+            "latency": None,
+        }
+
+    def test_circuit_breaker(self):
+        clock = FakeClock()
+        flaky = MagicMock(side_effect=RuntimeError("down"))
+        backends = {"flaky": flaky, "up": backend("up")}
+        router = Router(backends, weights={"flaky": 100}, failure_threshold=2, cooldown=10, clock=clock)
+
+        for _ in range(2):
+            router(model="m")
+        assert router.report()["flaky"]["state"] == "open"
+
+        # ejected: requests skip the backend entirely
+        router(model="m")
+        assert flaky.call_count == 2
+
+        # after the cooldown a trial request is let through, and success restores the backend
+        clock.now = 10
+        assert router.report()["flaky"]["state"] == "half_open"
+        flaky.side_effect = lambda **kwargs: "flaky"
+        assert router(model="m") == "flaky"
+        assert router.report()["flaky"]["state"] == "closed"
+
+    def test_failed_trial_reopens(self):
+        clock = FakeClock()
+        flaky = failing()
+        backends = {"flaky": flaky, "up": backend("up")}
+        router = Router(backends, weights={"flaky": 100}, failure_threshold=2, cooldown=10, clock=clock)
+        for _ in range(2):
+            router(model="m")
+
+        clock.now = 10
+        assert router(model="m") == "up"
+        assert flaky.call_count == 3
+        assert router.report()["flaky"]["state"] == "open"
+
+        clock.now = 15
+        router(model="m")
+        assert flaky.call_count == 3
+
+    def test_all_ejected_still_tries(self):
+        clock = FakeClock()
+        flaky = failing()
+        router = Router({"flaky": flaky}, failure_threshold=1, clock=clock)
+        with pytest.raises(RuntimeError):
+            router(model="m")
+
+        flaky.side_effect = lambda **kwargs: "back"
+        assert router(model="m") == "back"
+
+    def test_failover_skips_ejected(self):
+        clock = FakeClock()
+        up, down = failing(), failing()
+        router = Router({"up": up, "down": down}, failure_threshold=2, cooldown=10, clock=clock)
+        router.backends["down"].state = "open"
+        router.backends["down"].opened_at = 0.0
+
+        clock.now = 5
+        with pytest.raises(RuntimeError):
+            router(model="m")
+        assert up.call_count == 1
+        assert not down.called
+
+    def test_fallback_keeps_cooldown(self):
+        clock = FakeClock()
+        flaky = failing()
+        router = Router({"flaky": flaky}, failure_threshold=1, cooldown=10, clock=clock)
+        with pytest.raises(RuntimeError):
+            router(model="m")
+
+        clock.now = 5
+        with pytest.raises(RuntimeError):
+            router(model="m")  # a fallback during the cooldown
+        clock.now = 10
+        assert router.report()["flaky"]["state"] == "half_open"
+
+    def test_fallback_skips_trial_in_flight(self):
+        clock = FakeClock()
+        trial, cooling = backend("trial"), backend("cooling")
+        router = Router({"trial": trial, "cooling": cooling}, cooldown=10, clock=clock)
+        for name, opened_at in [("trial", 0.0), ("cooling", 5.0)]:
+            router.backends[name].state = "open"
+            router.backends[name].opened_at = opened_at
+        router.backends["trial"].state = "half_open"
+        router.backends["trial"].outstanding = 1
+
+        clock.now = 10
+        assert router(model="m") == "cooling"
+        assert not trial.called
+
+    def test_none_available_raises(self):
+        clock = FakeClock()
+        trial = backend("trial")
+        router = Router({"trial": trial}, cooldown=10, clock=clock)
+        router.backends["trial"].state = "half_open"
+        router.backends["trial"].outstanding = 1
+
+        with pytest.raises(RuntimeError, match="No completion backend is available"):
+            router(model="m")
+        assert not trial.called
+
+    @pytest.mark.parametrize("kwargs", [{"backends": {}}, {"strategy": "random"}, {"weights": {"a": 0}}])
+    def test_invalid(self, kwargs):
+        with pytest.raises(ValueError):
+            Router(**{"backends": {"a": backend("a")}, **kwargs})
+
+    def test_as_completion_fn(self):
+        router = Router({"down": failing(), "up": MagicMock(side_effect=lambda model, messages: {"a": messages})})
+        evaluation = Evaluation(
+            prep_fn=lambda sample: sample.Index,
+            completion_fn=router,
+            post_process_fn=lambda sample_ix, raw: (raw, USAGE),
+            log_enabled=False,
+        )
+
+        outputs, _ = evaluation.run_dataset(pd.DataFrame({"x": range(3)}), model="m")
+
+        assert outputs == {0: {"a": 0}, 1: {"a": 1}, 2: {"a": 2}}
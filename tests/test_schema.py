@@ -0,0 +1,262 @@
+import json
+
+import pandas as pd
+import pytest
+
+from evaluation_instruments._evaluation import Evaluation
+from evaluation_instruments.model import PromptSet
+from evaluation_instruments.prep import (
+    OutputMode,
+    packed_schema,
+    response_format,
+    rubric_grades,
+    rubric_schema,
+    schema_max_tokens,
+    split_rubrics,
+    to_user_messages,
+    validate_response,
+    with_response_schema,
+)
+
+RUBRIC = """
+<clear>
+DESCRIPTION: Is the summary clear?
+A score of 1 = unclear, with no examples.
+GRADES:
+1 = Not at all
+2 = Somewhat
+3 = Very
+<\\clear>
+
+<synthesized>
+DESCRIPTION: Does the summary synthesize?
+GRADES:
+NA = Nothing to synthesize
+1 = No
+2 = Yes
+<\\synthesized>
+"""
+
+USAGE = {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+
+
+def completion_response(content):
+    return {"choices": [{"message": {"content": content}}], "usage": USAGE}
+
+
+class TestRubricGrades:
+    def test_grades_after_header(self):
+        assert rubric_grades(RUBRIC) == {"clear": [1, 2, 3], "synthesized": ["NA", 1, 2]}
+
+    def test_library_values(self):
+        clear, synthesized = RUBRIC.split("<synthesized>")
+        library = {"clear": clear, "synthesized": "<synthesized>" + synthesized}
+
+        assert rubric_grades(library.values()) == rubric_grades(RUBRIC)
+
+
+class TestRubricSchema:
+    def test_score(self):
+        schema = rubric_schema(rubric_grades(RUBRIC), OutputMode.SCORE)
+
+        assert schema["required"] == ["clear", "synthesized"]
+        assert schema["additionalProperties"] is False
+        assert schema["properties"]["synthesized"] == {"enum": ["NA", 1, 2]}
+
+    def test_default_mode(self):
+        schema = rubric_schema(["clear"], default_mode=OutputMode.EXPLAINED_SCORE)
+
+        assert schema["properties"]["clear"] == {
+            "type": "object",
+            "properties": {"explanation": {"type": "string"}, "score": {"type": "integer"}},
+            "required": ["explanation", "score"],
+            "additionalProperties": False,
+        }
+
+    def test_response_format(self):
+        schema = rubric_schema(["clear"])
+
+        assert response_format(schema)["json_schema"] == {"name": "rubric_grades", "schema": schema, "strict": True}
+
+
+class TestValidateResponse:
+    schema = rubric_schema(rubric_grades(RUBRIC), OutputMode.EXPLAINED_SCORE)
+
+    def test_valid(self):
+        response = {"clear": {"explanation": "ok", "score": 3}, "synthesized": {"explanation": "", "score": "NA"}}
+
+        assert validate_response(response, self.schema) == []
+
+    @pytest.mark.parametrize(
+        "response,error",
+        [
+            ({"clear": {"explanation": "ok", "score": 3}}, "$: missing 'synthesized'"),
+            (
+                {"clear": {"explanation": "ok", "score": 4}, "synthesized": {"explanation": "", "score": 1}},
+                "$.clear.score: 4 is not one of [1, 2, 3]",
+            ),
+            (
+                {"clear": {"explanation": "ok", "score": True}, "synthesized": {"explanation": "", "score": 1}},
+                "$.clear.score: True is not one of [1, 2, 3]",
+            ),
+            (
+                {"clear": {"explanation": 1, "score": 1}, "synthesized": {"explanation": "", "score": 1}},
+                "$.clear.explanation: expected a string",
+            ),
+            (
+                {"clear": {"explanation": "", "score": 1}, "synthesized": {"explanation": "", "score": 1}, "x": 1},
+                "$: unexpected 'x'",
+            ),
+            ([], "$: expected an object"),
+        ],
+    )
+    def test_invalid(self, response, error):
+        assert validate_response(response, self.schema) == [error]
+
+
+class TestSchemaMaxTokens:
+    def test_explanations_dominate(self):
+        keys = ["clear", "synthesized"]
+        scores = schema_max_tokens(rubric_schema(keys, OutputMode.SCORE))
+        explained = schema_max_tokens(rubric_schema(keys, OutputMode.EXPLAINED_SCORE), explanation_tokens=100)
+
+        assert scores < 20
+        assert explained > 2 * 100
+
+
+class TestEvaluationResponseSchema:
+    schema = rubric_schema(rubric_grades(RUBRIC), OutputMode.SCORE)
+
+    def evaluation(self, content, calls, model_args=None):
+        def completion(model, messages, **kwargs):
+            calls.append(kwargs)
+            return completion_response(content)
+
+        return Evaluation(
+            prep_fn=lambda sample: [],
+            completion_fn=completion,
+            log_enabled=False,
+            model_args=model_args,
+            response_schema=self.schema,
+        )
+
+    def test_request_args(self):
+        calls = []
+        runner = self.evaluation(json.dumps({"clear": 1, "synthesized": "NA"}), calls)
+
+        outputs, _ = runner.run_dataset(pd.DataFrame({"x": [0]}))
+
+        assert outputs == {0: {"clear": 1, "synthesized": "NA"}}
+        assert calls[0]["response_format"] == response_format(self.schema)
+        assert calls[0]["max_tokens"] == schema_max_tokens(self.schema)
+        assert runner.schema_violations == {}
+
+    def test_model_args_kept(self):
+        calls = []
+        model_args = {"max_tokens": 7, "response_format": {"type": "json_object"}}
+        runner = self.evaluation("{}", calls, model_args)
+
+        runner.run_dataset(pd.DataFrame({"x": [0]}))
+
+        assert calls[0] == {"max_tokens": 7, "response_format": {"type": "json_object"}}
+
+    @pytest.mark.parametrize(
+        "content",
+        [
+            'Sure! {"clear": 1, "synthesized": 2}',  # repaired by the free-text path, rejected here
+            '{"clear": 1}',
+            '{"clear": 1, "synthesized": 3}',
+        ],
+    )
+    def test_no_repair(self, content):
+        runner = self.evaluation(content, [])
+
+        outputs, usage = runner.run_dataset(pd.DataFrame({"x": [0]}))
+
+        assert outputs == {0: {}}
+        assert usage.total_tokens == 15
+        assert runner.schema_violations[0]
+
+
+@split_rubrics(rubric_groups=[["clear"], ["synthesized"]])
+@with_response_schema(schema_fn=lambda sample, rubric_keys=None: rubric_schema(rubric_keys))
+@to_user_messages
+def grouped_prompt(sample, rubric_keys=None):
+    return ",".join(rubric_keys)
+
+
+class TestPromptSchema:
+    schema = rubric_schema(["clear", "synthesized"])
+
+    def evaluation(self, prep_fn, calls, **kwargs):
+        def completion(model, messages, **request):
+            calls.append(request)
+            keys = messages[-1]["content"].split(",")
+            return completion_response(json.dumps({key: 1 for key in keys}))
+
+        return Evaluation(
+            prep_fn=prep_fn, completion_fn=completion, log_enabled=False, response_schema=self.schema, **kwargs
+        )
+
+    def test_with_response_schema(self):
+        prompt = grouped_prompt(None)
+
+        assert [part.metadata["response_schema"] for part in prompt] == [
+            rubric_schema(["clear"]),
+            rubric_schema(["synthesized"]),
+        ]
+
+    def test_parts_use_own_schema(self):
+        calls = []
+        runner = self.evaluation(grouped_prompt, calls)
+
+        outputs, _ = runner.run_dataset(pd.DataFrame({"x": [0]}))
+
+        assert outputs == {0: {"clear": 1, "synthesized": 1}}
+        assert runner.schema_violations == {}
+        assert sorted(call["response_format"]["json_schema"]["schema"]["required"] for call in calls) == [
+            ["clear"],
+            ["synthesized"],
+        ]
+
+    def test_parts_without_schema_rejected(self):
+        parts = PromptSet([[{"content": "clear"}], [{"content": "synthesized"}]], lambda responses: {})
+        runner = self.evaluation(lambda sample: parts, [])
+
+        with pytest.raises(ValueError, match="PromptSet"):
+            runner.run_dataset(pd.DataFrame({"x": [0]}))
+
+    def test_packed_prompt(self):
+        calls = []
+
+        @with_response_schema(schema_fn=lambda batch: packed_schema(rubric_schema(["clear"]), len(batch)))
+        def packed_prompt(batch):
+            return [{"content": "case_1,case_2"}]
+
+        runner = self.evaluation(lambda sample: [], calls, batch_prep_fn=packed_prompt, cases_per_request=2)
+        runner.completion_fn = lambda model, messages, **request: completion_response(
+            json.dumps({"case_1": {"clear": 1}, "case_2": {"clear": 2}})
+        )
+
+        outputs, _ = runner.run_dataset(pd.DataFrame({"x": [0, 1]}))
+
+        assert outputs == {0: {"clear": 1}, 1: {"clear": 2}}
+        assert runner.schema_violations == {}
+
+    def test_packed_prompt_without_schema_rejected(self):
+        runner = self.evaluation(
+            lambda sample: [], [], batch_prep_fn=lambda batch: [{"content": "x"}], cases_per_request=2
+        )
+
+        with pytest.raises(ValueError, match="packed"):
+            runner.run_dataset(pd.DataFrame({"x": [0, 1]}))
+
+    def test_explain_prompts_without_schema_rejected(self):
+        runner = self.evaluation(lambda sample: [{"content": "clear,synthesized"}], [])
+
+        with pytest.raises(ValueError, match="run_two_phase"):
+            runner.run_two_phase(
+                pd.DataFrame({"x": [0]}),
+                lambda sample, rubric_keys: [{"content": ",".join(rubric_keys)}],
+                predicate=lambda key, score: True,
+            )
@@ -0,0 +1,188 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from evaluation_instruments._evaluation import Evaluation
+from evaluation_instruments._streaming import JsonObjectDetector, consume_stream
+from evaluation_instruments.prep import TokenCounter
+
+
+def chunk(text=None, usage=None):
+    payload = {"choices": [{"delta": {"content": text}}] if text is not None else []}
+    if usage is not None:
+        payload["usage"] = usage
+    return payload
+
+
+class Stream:
+    """A stream of chunks that records how far it was read and whether it was closed."""
+
+    def __init__(self, pieces, usage=None):
+        self.pieces = pieces
+        self.usage = usage
+        self.read = 0
+        self.closed = False
+
+    def __iter__(self):
+        for piece in self.pieces:
+            self.read += 1
+            yield chunk(piece)
+        if self.usage is not None:
+            yield chunk(usage=self.usage)
+
+    def close(self):
+        self.closed = True
+
+
+class TestJsonObjectDetector:
+    def test_split_across_pieces(self):
+        detector = JsonObjectDetector(["a", "b"])
+
+        assert detector.feed('{"a": 1, ') is None
+        assert detector.feed('"b": {"score": 2}}') == {"a": 1, "b": {"score": 2}}
+        assert detector.span == (0, len('{"a": 1, "b": {"score": 2}}'))
+
+    def test_braces_in_strings(self):
+        detector = JsonObjectDetector()
+        text = '{"a": "a } brace and \\" quote {"}'
+
+        assert detector.feed(text) == {"a": 'a } brace and " quote {'}
+
+    def test_skips_reasoning_and_partial_examples(self):
+        detector = JsonObjectDetector(["a", "b"])
+        text = '<think>maybe {like this} or {"a": 1}</think>\n{"a": 4, "b": 5} trailing'
+
+        assert detector.feed(text) == {"a": 4, "b": 5}
+        assert text[slice(*detector.span)] == '{"a": 4, "b": 5}'
+
+    @pytest.mark.parametrize("prose", ["Scores {see below:\n", "{\n", "a set {of criteria, "])
+    def test_stray_brace_before_object(self, prose):
+        detector = JsonObjectDetector(["a"])
+        text = prose + '{"a": 4} done'
+
+        assert [detector.feed(piece) for piece in text][-1] == {"a": 4}
+        assert text[slice(*detector.span)] == '{"a": 4}'
+        assert detector.text == prose + '{"a": 4}'
+
+    def test_missing_keys_never_complete(self):
+        detector = JsonObjectDetector(["a", "b"])
+
+        assert detector.feed('{"a": 1}') is None
+        assert detector.result is None
+
+    @pytest.mark.parametrize("pieces", [list('{"x": [1, {"y": 2}]}'), ['{"x": [1, {"y": 2}]}']])
+    def test_chunking_invariant(self, pieces):
+        detector = JsonObjectDetector(["x"])
+        results = [detector.feed(piece) for piece in pieces]
+
+        assert results[-1] == {"x": [1, {"y": 2}]}
+        assert all(result is None for result in results[:-1])
+
+
+class TestConsumeStream:
+    def test_cancels_once_complete(self):
+        stream = Stream(["<think>", "hmm</think>", '{"a": ', "1}", " and some more", " text"])
+        ticks = iter(range(100))
+
+        result = consume_stream(stream, ["a"], start=0, clock=lambda: next(ticks))
+
+        assert stream.read == 4
+        assert stream.closed
+        assert result.cancelled
+        assert result.content == '{"a": 1}'
+        assert result.usage is None
+        assert result.time_to_first_token < result.time_to_result
+
+    def test_reads_to_end_without_object(self):
+        stream = Stream(["no", " json"], usage={"prompt_tokens": 1, "completion_tokens": 2, "total_tokens": 3})
+
+        result = consume_stream(stream, ["a"])
+
+        assert not result.cancelled
+        assert not stream.closed
+        assert result.content == "no json"
+        assert result.usage == {"prompt_tokens": 1, "completion_tokens": 2, "total_tokens": 3}
+
+    def test_empty_stream(self):
+        result = consume_stream(iter([]))
+
+        assert result.time_to_first_token is None
+        assert result.content == ""
+
+
+class TestEvaluationStreaming:
+    def test_streamed_run(self):
+        streams = []
+
+        def completion(model, messages, stream=False, stream_options=None):
+            assert stream
+            assert stream_options == {"include_usage": True}
+            streams.append(Stream(['{"a": ', messages[0]["content"], ', "b": 2}', " extra"]))
+            return streams[-1]
+
+        runner = Evaluation(
+            prep_fn=lambda sample: [{"role": "user", "content": str(sample.Index)}],
+            completion_fn=completion,
+            log_enabled=False,
+            stream=True,
+            expected_keys=["a", "b"],
+            token_counter=TokenCounter(chars_per_token=1),
+        )
+
+        outputs, usage = runner.run_dataset(pd.DataFrame({"x": range(2)}))
+
+        assert outputs == {0: {"a": 0, "b": 2}, 1: {"a": 1, "b": 2}}
+        assert all(stream.closed and stream.read == 3 for stream in streams)
+        assert set(runner.stream_stats) == {0, 1}
+        assert runner.stream_stats[0]["cancelled"]
+        assert runner.stream_stats[0]["estimated_usage"]
+        assert runner.stream_stats[0]["time_to_first_token"] <= runner.stream_stats[0]["time_to_result"]
+        # estimated from the text received, one character per token
+        received = len('{"a": 0, "b": 2}')
+        assert usage.completion_tokens == 2 * received
+
+    def test_reported_usage_kept(self):
+        usage = {"prompt_tokens": 7, "completion_tokens": 3, "total_tokens": 10}
+
+        def completion(model, messages, stream=False, **kwargs):
+            # some providers report usage ahead of the content
+            return iter([chunk(usage=usage), chunk('{"a": 1}')])
+
+        runner = Evaluation(prep_fn=lambda sample: [], completion_fn=completion, log_enabled=False, stream=True)
+        outputs, total = runner.run_dataset(pd.DataFrame({"x": [0]}))
+
+        assert outputs == {0: {"a": 1}}
+        assert total.total_tokens == 10
+        assert not runner.stream_stats[0]["estimated_usage"]
+
+    def test_abandoned_stream_closed(self):
+        release = threading.Event()
+
+        class SlowStream(Stream):
+            def __iter__(self):
+                yield chunk("thinking")
+                release.wait(5)
+                yield from super().__iter__()
+
+        stream = SlowStream(['{"a": ', "1}"])
+        runner = Evaluation(
+            prep_fn=lambda sample: [],
+            completion_fn=lambda model, messages, **kwargs: stream,
+            log_enabled=False,
+            stream=True,
+            request_timeout=0.1,
+        )
+
+        outputs, _ = runner.run_dataset(pd.DataFrame({"x": [0]}))
+        release.set()
+
+        assert outputs == {}
+        assert runner.unfinished == [0]
+        deadline = time.monotonic() + 2
+        while not stream.closed and time.monotonic() < deadline:
+            time.sleep(0.01)
+        # closed at the first chunk after the timeout, without reading the rest
+        assert stream.closed
+        assert stream.read == 1
@@ -0,0 +1,71 @@
+import io
+
+import pytest
+
+from evaluation_instruments.prep import PromptTemplate
+
+
+class Test_PromptTemplate:
+    def test_render_matches_format(self):
+        pattern = "Notes:\n{notes}\nSummary {{literal}}: {summary}\n"
+
+        actual = PromptTemplate(pattern).render(notes="a", summary="b")
+
+        assert actual == pattern.format(notes="a", summary="b")
+
+    def test_fields_in_order_without_duplicates(self):
+        template = PromptTemplate("{b} {a} {b} {{c}}")
+
+        assert template.fields == ("b", "a")
+
+    def test_values_with_braces_are_opaque(self):
+        template = PromptTemplate("<{value}>")
+
+        assert template.render(value='{"score": 1} {other}') == '<{"score": 1} {other}>'
+
+    def test_missing_value_raises(self):
+        with pytest.raises(KeyError):
+            PromptTemplate("{a} {b}").render(a="x")
+
+    @pytest.mark.parametrize("pattern", ["{a!r}", "{a:>5}", "{a.attr}", "{a[0]}", "{}"])
+    def test_unsupported_fields_raise(self, pattern):
+        with pytest.raises(ValueError, match="Unsupported template field"):
+            PromptTemplate(pattern)
+
+    def test_partial_leaves_remaining_slots(self):
+        template = PromptTemplate("{a}-{b}").partial(a="{b}")
+
+        assert template.fields == ("b",)
+        assert template.render(b="2") == "{b}-2"
+
+    def test_doubly_resolved_matches_two_format_passes(self):
+        pattern = "Grade the {OUTPUT}.\n<{OUTPUT}>\n{{output}}\n<\\{OUTPUT}>\n{RUBRIC_SET}\n{{{{literal}}}}"
+        first = {"OUTPUT": "SUMMARY", "RUBRIC_SET": "rubric"}
+
+        expected = pattern.format(**first).format(output="text")
+        actual = PromptTemplate.doubly_resolved(pattern, **first).render(output="text")
+
+        assert actual == expected
+
+    def test_doubly_resolved_does_not_reparse_values(self):
+        template = PromptTemplate.doubly_resolved("{RUBRIC_SET}\n{{output}}", RUBRIC_SET='{"example": 1}')
+
+        assert template.fields == ("output",)
+        assert template.render(output="x") == '{"example": 1}\nx'
+
+    def test_iterable_values_stream(self):
+        template = PromptTemplate("[{notes}]")
+        notes = (f"<{i}>" for i in range(3))
+
+        assert list(template.iter_render(notes=notes)) == ["[", "<0>", "<1>", "<2>", "]"]
+
+    def test_render_bytes(self):
+        assert PromptTemplate("é {a}").render_bytes(a="ü") == "é ü".encode("utf-8")
+
+    @pytest.mark.parametrize("encoding,stream", [(None, io.StringIO()), ("utf-8", io.BytesIO())])
+    def test_write_to_stream(self, encoding, stream):
+        written = PromptTemplate("a{b}c").write(stream, encoding=encoding, b="B")
+
+        assert written == 3
+        value = stream.getvalue()
+        assert (value if encoding is None else value.decode(encoding)) == "aBc"
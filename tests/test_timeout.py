@@ -0,0 +1,191 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from evaluation_instruments._budget import Budget
+from evaluation_instruments._evaluation import Evaluation
+from evaluation_instruments._timeout import call_with_timeout
+from evaluation_instruments.model import PromptSet, TokenUsage
+
+USAGE = {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+
+
+def evaluation(completion_fn, **kwargs):
+    return Evaluation(
+        prep_fn=lambda sample: sample.Index,
+        completion_fn=completion_fn,
+        post_process_fn=lambda sample_ix, raw: ({"a": raw["a"]} if "a" in raw else raw, USAGE),
+        log_enabled=False,
+        **kwargs,
+    )
+
+
+class TestCallWithTimeout:
+    def test_returns(self):
+        assert call_with_timeout(lambda: 1, 1.0) == 1
+        assert call_with_timeout(lambda: 2, None) == 2
+
+    def test_raises(self):
+        def failing():
+            raise KeyError("bad")
+
+        with pytest.raises(KeyError):
+            call_with_timeout(failing, 1.0)
+
+    def test_hung_call_abandoned(self):
+        hang = threading.Event()
+        start = time.monotonic()
+
+        with pytest.raises(TimeoutError, match="within 0.1s"):
+            call_with_timeout(lambda: hang.wait(5), 0.1)
+        assert time.monotonic() - start < 1
+        hang.set()
+
+
+class TestRequestTimeout:
+    def test_hung_row_unfinished(self):
+        hang = threading.Event()
+
+        def completion(model, messages):
+            if messages == 1:
+                hang.wait(5)
+            return {"a": messages}
+
+        runner = evaluation(completion, request_timeout=0.1)
+        outputs, usage = runner.run_dataset(pd.DataFrame({"x": range(3)}))
+        hang.set()
+
+        assert outputs == {0: {"a": 0}, 2: {"a": 2}}
+        assert usage == TokenUsage(20, 10, 30)
+        assert runner.unfinished == [1]
+
+    def test_abandoned_request_charged(self):
+        hang = threading.Event()
+
+        def completion(model, messages):
+            if messages == 1:
+                hang.wait(5)
+            return {"a": messages, "usage": USAGE}
+
+        budget = Budget(1_000)
+        runner = evaluation(completion, request_timeout=0.1, budget=budget)
+        outputs, usage = runner.run_dataset(pd.DataFrame({"x": range(2)}))
+
+        assert list(outputs) == [0]
+        assert usage == TokenUsage(10, 5, 15)
+        # the abandoned request is still billed, and charged once it completes
+        hang.set()
+        deadline = time.monotonic() + 2
+        while budget.usage.total_tokens < 30 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert budget.usage == TokenUsage(20, 10, 30)
+
+    def test_abandoned_request_charged_during_run(self):
+        release = threading.Event()
+
+        def completion(model, messages):
+            if messages == 0:
+                release.wait(5)
+            elif messages == 1:
+                release.set()
+                time.sleep(0.05)
+            return {"a": messages, "usage": USAGE}
+
+        runner = evaluation(completion, request_timeout=0.1)
+        outputs, usage = runner.run_dataset(pd.DataFrame({"x": range(3)}))
+
+        assert list(outputs) == [1, 2]
+        assert usage == TokenUsage(30, 15, 45)
+
+    def test_completed_parts_charged(self):
+        hang = threading.Event()
+
+        def completion(model, messages):
+            if messages == "slow":
+                hang.wait(5)
+            return {}
+
+        runner = evaluation(completion, request_timeout=0.1)
+        runner.prep_fn = lambda sample: PromptSet(["fast", "slow", "fast"], lambda responses: {})
+        outputs, usage = runner.run_dataset(pd.DataFrame({"x": range(1)}))
+        hang.set()
+
+        assert outputs == {}
+        assert runner.unfinished == [0]
+        # the two parts that completed are billed, although the row is unfinished
+        assert usage == TokenUsage(20, 10, 30)
+
+    def test_packed_request_unfinished(self):
+        hang = threading.Event()
+
+        def completion(model, messages):
+            hang.wait(5)
+            return {}
+
+        runner = evaluation(
+            completion, request_timeout=0.1, batch_prep_fn=lambda batch: [s.Index for s in batch], cases_per_request=2
+        )
+        outputs, _ = runner.run_dataset(pd.DataFrame({"x": range(2)}))
+        hang.set()
+
+        assert outputs == {}
+        assert runner.unfinished == [0, 1]
+
+
+class TestDeadline:
+    def test_stops_dispatch(self):
+        def completion(model, messages):
+            time.sleep(0.05)
+            return {"a": messages}
+
+        runner = evaluation(completion)
+        outputs, usage = runner.run_dataset(pd.DataFrame({"x": range(50)}), deadline=0.3)
+
+        assert 0 < len(outputs) < 50
+        assert usage.total_tokens == 15 * len(outputs)
+        # every row is either evaluated or unfinished, in order
+        assert list(outputs) + runner.unfinished == list(range(50))
+
+    def test_in_flight_request_cut_short(self):
+        hang = threading.Event()
+
+        def completion(model, messages):
+            if messages == 1:
+                hang.wait(5)
+            return {"a": messages}
+
+        runner = evaluation(completion)
+        start = time.monotonic()
+        outputs, _ = runner.run_dataset(pd.DataFrame({"x": range(3)}), deadline=0.2)
+        hang.set()
+
+        assert time.monotonic() - start < 1
+        assert outputs == {0: {"a": 0}}
+        assert runner.unfinished == [1, 2]
+
+    def test_lazy_input_left_unread(self):
+        read = []
+
+        def records():
+            for ix in range(50):
+                read.append(ix)
+                yield {"x": ix}
+
+        def completion(model, messages):
+            time.sleep(0.05)
+            return {"a": messages}
+
+        runner = evaluation(completion)
+        outputs, _ = runner.run_dataset(records(), deadline=0.3)
+
+        assert len(read) < 50
+        assert list(outputs) + runner.unfinished == read
+
+    def test_no_deadline(self):
+        runner = evaluation(lambda model, messages: {"a": 1})
+        outputs, _ = runner.run_dataset(pd.DataFrame({"x": range(3)}))
+
+        assert len(outputs) == 3
+        assert runner.unfinished == []
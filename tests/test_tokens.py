@@ -0,0 +1,104 @@
+from unittest.mock import MagicMock
+
+import pandas as pd
+import pytest
+
+from evaluation_instruments import Budget, Evaluation, TokenCounter
+from evaluation_instruments.model import TokenUsage
+from evaluation_instruments.prep import PromptTemplate
+
+
+def word_tokenizer(text):
+    return text.split()
+
+
+class Test_TokenCounter:
+    @pytest.mark.parametrize("text,expected", [("", 0), ("abcd", 1), ("abcde", 2), ("a" * 400, 100)])
+    def test_heuristic(self, text, expected):
+        assert TokenCounter().count(text) == expected
+
+    def test_chars_per_token(self):
+        assert TokenCounter(chars_per_token=2).count("abcdef") == 3
+
+    @pytest.mark.parametrize("tokenizer", [word_tokenizer, lambda text: len(text.split())])
+    def test_tokenizer_sequence_or_int(self, tokenizer):
+        assert TokenCounter(tokenizer).count("one two three") == 3
+
+    def test_segments_are_cached(self):
+        tokenizer = MagicMock(side_effect=word_tokenizer)
+        counter = TokenCounter(tokenizer)
+        rubric = "static rubric text"
+
+        counter.count(f"{rubric}\n\ncase one")
+        counter.count(f"{rubric}\n\ncase two")
+
+        tokenized = [call.args[0] for call in tokenizer.call_args_list]
+        assert tokenized.count(rubric) == 1
+        assert counter.cache_info()["hits"] >= 1
+
+    def test_segmented_count_matches_whole(self):
+        counter = TokenCounter(word_tokenizer)
+
+        assert counter.count("a b\n\nc d e") == 5
+
+    def test_count_segments_from_template(self):
+        counter = TokenCounter(word_tokenizer)
+        template = PromptTemplate("Grade this: {case} now")
+
+        assert counter.count_segments(template.iter_render(case="one two")) == 5
+
+    def test_count_messages_adds_overhead(self):
+        counter = TokenCounter(word_tokenizer, message_overhead=3)
+        messages = [{"role": "system", "content": "be brief"}, {"role": "user", "content": "one two three"}]
+
+        assert counter.count_messages(messages) == 2 + 3 + 3 + 3
+
+    def test_count_multipart_content(self):
+        counter = TokenCounter(word_tokenizer, message_overhead=0)
+        messages = [{"role": "user", "content": [{"type": "text", "text": "one two"}]}]
+
+        assert counter.count_messages(messages) == 2
+
+    def test_estimate(self):
+        counter = TokenCounter(word_tokenizer, message_overhead=0)
+
+        assert counter.estimate("one two", completion_tokens=10) == TokenUsage(2, 10, 12)
+
+
+class Test_EvaluationEstimates:
+    def evaluation(self, **kwargs):
+        return Evaluation(
+            prep_fn=MagicMock(return_value=[{"role": "user", "content": "x" * 40}]),
+            completion_fn=MagicMock(return_value={}),
+            post_process_fn=MagicMock(return_value=({}, {"prompt_tokens": 10, "completion_tokens": 5})),
+            log_enabled=False,
+            **kwargs,
+        )
+
+    def test_no_counter_no_estimate(self):
+        assert self.evaluation().estimate_usage([{"role": "user", "content": "x"}]) is None
+
+    def test_estimate_includes_max_tokens(self):
+        evaluation = self.evaluation(token_counter=TokenCounter(message_overhead=0), model_args={"max_tokens": 50})
+
+        assert evaluation.estimate_usage([{"role": "user", "content": "x" * 40}]) == TokenUsage(10, 50, 60)
+
+    def test_estimate_holds_back_request_before_dispatch(self):
+        evaluation = self.evaluation(
+            token_counter=TokenCounter(message_overhead=0), model_args={"max_tokens": 50}, max_tokens=100
+        )
+
+        outputs, usage = evaluation.run_dataset(pd.DataFrame({"id": range(5)}))
+
+        # 15 used per request, but 60 reserved at admission; the fourth would be 45 + 60 > 100
+        assert len(outputs) == 3
+        assert evaluation.completion_fn.call_count == 3
+        assert usage.total_tokens == 45
+
+    def test_estimate_drives_per_minute_quota(self):
+        budget = Budget(tokens_per_minute=100)
+        evaluation = self.evaluation(token_counter=TokenCounter(message_overhead=0), budget=budget)
+
+        evaluation.run_dataset(pd.DataFrame({"id": range(3)}))
+
+        assert budget.usage.total_tokens == 45
@@ -0,0 +1,79 @@
+from unittest.mock import MagicMock
+
+import pandas as pd
+import pytest
+
+from evaluation_instruments._evaluation import Evaluation
+from evaluation_instruments.model import TokenUsage
+
+USAGE = {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+SCORES = {0: {"accurate": 5, "thorough": 2}, 1: {"accurate": 4, "thorough": 4}, 2: {"accurate": 1, "thorough": 1}}
+
+
+def explained(criteria):
+    return {key: {"score": 3, "explanation": f"why {key}"} for key in criteria}
+
+
+@pytest.fixture
+def evaluation():
+    def post_fn(sample_ix, raw_output):
+        return raw_output, USAGE
+
+    def completion(model, messages):
+        sample_ix, rubric_keys = messages
+        return SCORES[sample_ix] if rubric_keys is None else explained(rubric_keys)
+
+    return Evaluation(
+        prep_fn=lambda sample: (sample.Index, None),
+        completion_fn=MagicMock(side_effect=completion),
+        post_process_fn=post_fn,
+        log_enabled=False,
+        max_tokens=1000,
+    )
+
+
+def explain_prep(sample, rubric_keys=None):
+    return sample.Index, rubric_keys
+
+
+def is_low(criterion, score):
+    return score <= 2
+
+
+def test_only_flagged_rows_and_criteria_are_explained(evaluation):
+    outputs, usage = evaluation.run_two_phase(pd.DataFrame({"a": range(3)}), explain_prep, is_low)
+
+    assert outputs == {
+        0: {"accurate": {"score": 5}, "thorough": {"score": 3, "explanation": "why thorough"}},
+        1: {"accurate": {"score": 4}, "thorough": {"score": 4}},
+        2: explained(["accurate", "thorough"]),
+    }
+    # 3 scoring requests and 2 explaining requests
+    assert evaluation.completion_fn.call_count == 5
+    assert usage == TokenUsage(50, 25, 75)
+    assert evaluation.completion_fn.call_args_list[4].kwargs["messages"] == (2, ["accurate", "thorough"])
+
+
+def test_nothing_flagged_skips_phase_two(evaluation):
+    outputs, usage = evaluation.run_two_phase(pd.DataFrame({"a": range(2)}), explain_prep, lambda key, score: False)
+
+    assert evaluation.completion_fn.call_count == 2
+    assert outputs[1] == {"accurate": {"score": 4}, "thorough": {"score": 4}}
+    assert usage.total_tokens == 30
+
+
+def test_capacity_spans_both_phases(evaluation):
+    outputs, usage = evaluation.run_two_phase(pd.DataFrame({"a": range(3)}), explain_prep, is_low, capacity=50)
+
+    # scoring uses 45, leaving 5: the first explanation crosses it and the second is abandoned
+    assert evaluation.completion_fn.call_count == 4
+    assert "explanation" in outputs[0]["thorough"]
+    assert outputs[2]["accurate"] == {"score": 1}
+    assert usage.total_tokens == 60
+
+
+def test_exhausted_capacity_skips_phase_two(evaluation):
+    outputs, usage = evaluation.run_two_phase(pd.DataFrame({"a": range(3)}), explain_prep, is_low, capacity=45)
+
+    assert evaluation.completion_fn.call_count == 3
+    assert outputs[2]["thorough"] == {"score": 1}